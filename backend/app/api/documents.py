@@ -0,0 +1,77 @@
+"""Document ingestion API endpoints."""
+
+from fastapi import APIRouter, HTTPException
+from app.models.schemas import IngestRequest, IngestResponse
+from app.services.executor import (
+    SearchRejectedError,
+    SearchTimeoutError,
+    get_search_executor,
+    run_delete_documents,
+    run_upsert_documents,
+)
+
+router = APIRouter()
+
+
+@router.post("/documents", response_model=IngestResponse)
+async def upsert_documents(request: IngestRequest):
+    """
+    Add documents to the index, replacing documents with the same ID.
+    
+    Ingested documents are not written to ``DOCUMENTS_PATH``. With
+    ``PERSIST_INDEX`` they are recorded in the ingestion journal next to the
+    index and applied again when the index is rebuilt; without it they only
+    live in the worker that received them until it restarts.
+    
+    Args:
+        request: IngestRequest with the documents to add or replace
+        
+    Returns:
+        IngestResponse with counts and ingestion throughput
+    """
+    try:
+        executor = get_search_executor()
+        result = await executor.submit(
+            run_upsert_documents,
+            [document.model_dump(exclude_none=True) for document in request.documents]
+        )
+        return IngestResponse(**result)
+        
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ingestion failed: {str(e)}"
+        )
+
+
+@router.delete("/documents/{doc_id}", response_model=IngestResponse)
+async def delete_document(doc_id: str):
+    """
+    Remove a document from the index.
+    
+    Args:
+        doc_id: ID of the document to delete
+        
+    Returns:
+        IngestResponse with the number of deleted documents
+    """
+    try:
+        executor = get_search_executor()
+        result = await executor.submit(run_delete_documents, [doc_id])
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Deletion failed: {str(e)}"
+        )
+    
+    if not result["deleted"]:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+    return IngestResponse(**result)
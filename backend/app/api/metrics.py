@@ -0,0 +1,26 @@
+"""Metrics API endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.services.executor import get_search_executor, run_index_stats
+from app.services.metrics import CONTENT_TYPE, service_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Service metrics in the Prometheus text format.
+    
+    Request, search and stage metrics are collected in the API process
+    and cover all executor workers; index gauges come from the worker
+    that answers.
+    """
+    try:
+        executor = get_search_executor()
+        index_stats = await executor.submit(run_index_stats)
+    except Exception:
+        # Still expose the request metrics while the pool is saturated
+        index_stats = None
+    return Response(content=service_metrics.render(index_stats), media_type=CONTENT_TYPE)
@@ -1,8 +1,20 @@
 """Search API endpoint."""
 
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import SearchRequest, SearchResponse
-from app.services.search_engine import get_search_engine
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import BatchSearchRequest, BatchSearchResponse, SearchRequest, SearchResponse, SuggestResponse
+from app.services.executor import (
+    SearchRejectedError,
+    SearchTimeoutError,
+    get_search_executor,
+    run_cache_stats,
+    run_search,
+    run_search_batch,
+    run_suggest,
+)
+from app.services.metrics import service_metrics
+from app.services.search_engine import SearchModeError
 
 router = APIRouter()
 
@@ -13,19 +25,23 @@ async def search_documents(request: SearchRequest):
     Search documents using NLP-based semantic search.
     
     Args:
-        request: SearchRequest with query and optional max_results
+        request: SearchRequest with query, optional max_results and search mode
         
     Returns:
         SearchResponse with matching documents and relevance scores
     """
     try:
-        engine = get_search_engine()
-        results = engine.search(
-            query=request.query,
-            max_results=request.max_results
-        )
+        executor = get_search_executor()
+        results = await executor.submit(run_search, request.query, request.max_results, request.search_options())
+        service_metrics.observe_search(results)
         return SearchResponse(**results)
         
+    except SearchModeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -33,6 +49,93 @@ async def search_documents(request: SearchRequest):
         )
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest):
+    """
+    Run many searches in one request.
+    
+    Args:
+        request: BatchSearchRequest with a list of search requests
+        
+    Returns:
+        BatchSearchResponse with one SearchResponse per request, in order
+    """
+    try:
+        start_time = time.time()
+        executor = get_search_executor()
+        results = await executor.submit(
+            run_search_batch,
+            [(item.query, item.max_results, item.search_options()) for item in request.requests]
+        )
+        service_metrics.observe_searches(results)
+        return BatchSearchResponse(
+            results=[SearchResponse(**result) for result in results],
+            total_queries=len(results),
+            execution_time=round(time.time() - start_time, 4)
+        )
+        
+    except SearchModeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch search failed: {str(e)}"
+        )
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=200, description="Typed query prefix"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Number of completions (default and cap SUGGEST_TOP_K)")
+):
+    """
+    Complete a partially typed query from the corpus terms, phrases and titles.
+    
+    Args:
+        prefix: Typed text; a trailing space completes the next word
+        limit: Number of completions
+        
+    Returns:
+        SuggestResponse with the most frequent completions
+    """
+    try:
+        executor = get_search_executor()
+        return SuggestResponse(**await executor.submit(run_suggest, prefix, limit))
+        
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Suggest failed: {str(e)}"
+        )
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Result cache size and hit/miss counters (of the worker that answers)."""
+    try:
+        executor = get_search_executor()
+        return await executor.submit(run_cache_stats)
+        
+    except SearchRejectedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SearchTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+@router.get("/timings")
+async def stage_timings():
+    """Search latency summaries overall and per stage, across all workers."""
+    return service_metrics.stage_timings.stats()
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
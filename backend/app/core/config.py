@@ -1,5 +1,6 @@
 """Application configuration."""
 
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 
@@ -11,6 +12,10 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     DEBUG: bool = True
     
+    # Logging (per-search details are logged at DEBUG)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"  # "json" emits one JSON object per line
+    
     # CORS
     ALLOWED_ORIGINS: list = [
         "http://localhost:5173",
@@ -23,12 +28,77 @@ class Settings(BaseSettings):
     
     # Data paths
     DOCUMENTS_PATH: str = "data/dataset_news.json"
+    INDEX_PATH: str = "data/index"  # Snapshot directory for the built index
+    PERSIST_INDEX: bool = True  # Reuse the snapshot unless corpus/config changed
     
     # NLP Configuration
     MAX_RESULTS: int = 10
     MIN_SIMILARITY_THRESHOLD: float = 0.05  # Lower threshold for news articles
     TFIDF_MAX_FEATURES: int = 5000  # Increased for larger dataset
     USE_WORD2VEC: bool = True  # Can disable for faster startup
+    USE_DYNAMIC_PRUNING: bool = False  # MaxScore pruning for the lexical candidate stage
+    
+    # Text preprocessing of documents and queries
+    PREPROCESSING: Literal["basic", "advanced"] = "basic"  # "advanced": acronyms, contractions, stop words, spaCy lemmas
+    SPACY_MODEL: str = "en_core_web_sm"  # Lemmatizer of "advanced" (optional; without it lemmas are skipped)
+    PREPROCESS_CACHE_PATH: str = "data/preprocess_cache.sqlite"  # Preprocessed texts by content hash ("" disables)
+    PREPROCESS_BATCH_SIZE: int = 256  # Texts per nlp.pipe batch
+    PREPROCESS_WORKERS: int = 0  # spaCy processes for large batches; 0 = one per CPU
+    
+    # Hybrid search: lexical and semantic candidate lists retrieved separately, then fused
+    HYBRID_FUSION: Literal["linear", "rrf"] = "linear"  # Weighted score mean or reciprocal-rank fusion
+    LEXICAL_DEPTH: int = 100  # Lexical candidates per query
+    SEMANTIC_DEPTH: int = 100  # Semantic (embedding) candidates per query; 0 rescores lexical candidates only
+    LEXICAL_WEIGHT: float = 0.7
+    SEMANTIC_WEIGHT: float = 0.3
+    RRF_K: int = 60  # Rank offset of reciprocal-rank fusion
+    RECENCY_WEIGHT: float = 0.0  # Share of the fused score that decays with age (0 disables the boost)
+    RECENCY_HALF_LIFE_DAYS: float = 30.0  # Age, counted back from the newest document, halving that share
+    
+    # Query spell correction (symmetric-delete index over the dictionary words found in the corpus)
+    SPELL_CORRECTION: Literal["off", "suggest", "auto"] = "auto"  # "suggest" only fills did_you_mean; "auto" also searches the correction
+    SPELL_DICTIONARY_PATH: str = "../frequency_dictionary_en_82_765.txt"  # "word count" lines; no index is built if missing
+    SPELL_MAX_EDIT_DISTANCE: int = 2  # Largest edit distance corrected
+    SPELL_PREFIX_LENGTH: int = 7  # Characters of a word its deletes are generated from
+    
+    # Type-ahead suggestions (GET /api/suggest)
+    SUGGEST_TOP_K: int = 10  # Completions precomputed per prefix (the most a request gets)
+    
+    # Semantic retrieval: IVF nearest-neighbour index over the document embeddings
+    ANN_INDEX: bool = True  # Build the index with the snapshot; otherwise semantic search scans exactly
+    ANN_NLIST: int = 0  # k-means clusters (inverted lists); 0 picks about 4 * sqrt(documents)
+    ANN_NPROBE: int = 32  # Lists scanned per query: higher raises recall and latency
+    
+    # Embedding storage (document embeddings, their ANN lists and the word vectors)
+    EMBEDDING_STORAGE: Literal["float32", "float16", "int8", "pq"] = "float32"
+    PQ_SUBVECTORS: int = 50  # Bytes per vector with "pq"; must divide the vector size (100)
+    EMBEDDING_RERANK: int = 0  # Re-rank rerank * k encoded semantic matches with float32 vectors (0 disables)
+    
+    # Search execution (keeps CPU-bound scoring off the event loop)
+    SEARCH_EXECUTOR: Literal["thread", "process"] = "thread"
+    SEARCH_WORKERS: int = 4  # Pool size
+    SEARCH_QUEUE_DEPTH: int = 64  # Requests allowed to wait for a worker before 503
+    SEARCH_TIMEOUT: float = 10.0  # Seconds before a search returns 504 (0 disables)
+    BLAS_THREADS: int = 1  # NumPy/BLAS threads per worker
+    
+    # Query result cache
+    QUERY_CACHE_SIZE: int = 1024  # Max cached queries (0 disables the cache)
+    QUERY_CACHE_TTL: float = 300.0  # Seconds before a cached result expires
+    RESULT_SET_CACHE_SIZE: int = 256  # Ranked match lists kept for paging (0 rescores every page)
+    RESULT_SET_CACHE_TTL: float = 600.0  # Seconds a ranked match list stays pageable without rescoring
+    MAX_RESULT_DEPTH: int = 10000  # Deepest rank a page may reach (offset + max_results)
+    
+    # Lexical ranking
+    LEXICAL_SCORER: Literal["tfidf", "bm25"] = "tfidf"
+    BM25_K1: float = 1.2  # Term-frequency saturation
+    BM25_B: float = 0.75  # Document-length normalization strength
+    BM25_TITLE_WEIGHT: float = 2.0  # BM25F weight of the title field
+    BM25_CONTENT_WEIGHT: float = 1.0  # BM25F weight of the content field
+    
+    # Incremental ingestion
+    SEGMENT_REFRESH_INTERVAL: float = 1.0  # Seconds between checks for segments written by other workers
+    SEGMENT_MERGE_FACTOR: int = 8  # Merge delta segments once there are more than this many
+    SEGMENT_BASE_MERGE_RATIO: float = 0.1  # Merge into the base once deltas + deletes exceed this share of it
     
     class Config:
         env_file = ".env"
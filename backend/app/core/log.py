@@ -0,0 +1,76 @@
+"""Structured, level-gated logging for the application."""
+
+import json
+import logging
+import sys
+from typing import Any, Dict
+
+LOGGER_NAME = "app"
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Render a record's message followed by its structured fields.
+
+    Fields are passed as ``logger.debug("msg", extra={"fields": {...}})`` and
+    rendered as ``key=value`` pairs, or as one JSON object per line when
+    ``json_output`` is set.
+    """
+
+    def __init__(self, json_output: bool = False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = getattr(record, "fields", None) or {}
+        if self.json_output:
+            entry = {
+                "time": round(record.created, 6),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        line = record.getMessage()
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        if record.levelno >= logging.WARNING:
+            line = f"{record.levelname}: {line}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _format_value(value: Any) -> str:
+    """Format a field value for text output."""
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    if isinstance(value, str) and (" " in value or not value):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def configure_logging(level: str = "INFO", log_format: str = "text") -> None:
+    """
+    Configure the ``app`` logger hierarchy.
+
+    Safe to call more than once (e.g. in every pool worker); the handler is
+    replaced rather than duplicated.
+
+    Args:
+        level: Minimum level name (DEBUG, INFO, WARNING, ...)
+        log_format: "text" or "json"
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper())
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter(json_output=log_format == "json"))
+    logger.addHandler(handler)
+    # uvicorn configures the root logger; keep our records out of it
+    logger.propagate = False
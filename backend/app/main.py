@@ -4,20 +4,31 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import search
+from app.core.log import configure_logging
+from app.api import documents, metrics, search
+from app.services.metrics import MetricsMiddleware, service_metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup/shutdown."""
     # Startup
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
     print(f"Starting {settings.APP_NAME} v{settings.VERSION}")
-    from app.services.search_engine import get_search_engine
-    get_search_engine()
-    print("Search engine initialized")
+    from app.services.executor import get_search_executor, limit_blas_threads, shutdown_search_executor
+    limit_blas_threads(settings.BLAS_THREADS)
+    executor = get_search_executor()
+    if executor.kind == "process":
+        # Each worker process loads its own engine
+        executor.warm_up()
+    else:
+        from app.services.search_engine import get_search_engine
+        get_search_engine()
+    print(f"Search engine initialized ({executor.kind} pool, {executor.max_workers} workers)")
     yield
-    # Shutdown (if needed)
+    # Shutdown
     print("Shutting down...")
+    shutdown_search_executor()
 
 
 # Create FastAPI app
@@ -38,8 +49,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count requests and latency per endpoint
+app.add_middleware(MetricsMiddleware, metrics=service_metrics)
+
 # Include routers
 app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(documents.router, prefix="/api", tags=["documents"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
 
 
 @app.get("/")
@@ -51,6 +67,9 @@ async def root():
         "status": "running",
         "endpoints": {
             "search": "/api/search",
+            "suggest": "/api/suggest",
+            "documents": "/api/documents",
+            "metrics": "/api/metrics",
             "health": "/api/health",
             "docs": "/docs"
         }
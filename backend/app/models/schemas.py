@@ -1,6 +1,7 @@
 """Pydantic models for API request/response schemas."""
 
-from typing import List, Optional
+import datetime
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -8,7 +9,56 @@ class SearchRequest(BaseModel):
     """Search request model."""
     
     query: str = Field(..., min_length=1, description="Search query text")
-    max_results: Optional[int] = Field(10, ge=1, le=100, description="Maximum number of results")
+    max_results: Optional[int] = Field(10, ge=1, le=100, description="Maximum number of results (page size)")
+    offset: int = Field(0, ge=0, description="Ranked matches to skip (below MAX_RESULT_DEPTH)")
+    cursor: Optional[str] = Field(
+        None, max_length=64, description="next_cursor of the previous page of the same query; overrides offset"
+    )
+    mode: Literal["hybrid", "semantic"] = Field(
+        "hybrid", description="hybrid: lexical and semantic candidates fused; semantic: nearest documents by embedding only"
+    )
+    nprobe: Optional[int] = Field(
+        None, ge=0, le=65536, description="Inverted lists scanned for semantic candidates (default ANN_NPROBE, 0 for exact)"
+    )
+    fusion: Optional[Literal["linear", "rrf"]] = Field(
+        None, description="Hybrid: weighted score mean or reciprocal-rank fusion (default HYBRID_FUSION)"
+    )
+    lexical_depth: Optional[int] = Field(
+        None, ge=0, le=10000, description="Hybrid: lexical candidates retrieved (default LEXICAL_DEPTH)"
+    )
+    semantic_depth: Optional[int] = Field(
+        None, ge=0, le=10000, description="Hybrid: semantic candidates retrieved (default SEMANTIC_DEPTH)"
+    )
+    lexical_weight: Optional[float] = Field(
+        None, ge=0.0, description="Hybrid: weight of the lexical list (default LEXICAL_WEIGHT)"
+    )
+    semantic_weight: Optional[float] = Field(
+        None, ge=0.0, description="Hybrid: weight of the semantic list (default SEMANTIC_WEIGHT)"
+    )
+    categories: Optional[List[str]] = Field(
+        None, max_length=100, description="Only return documents of these categories (case-insensitive)"
+    )
+    exclude_categories: Optional[List[str]] = Field(
+        None, max_length=100, description="Never return documents of these categories (case-insensitive)"
+    )
+    date_from: Optional[datetime.date] = Field(None, description="Only documents published on or after this date")
+    date_to: Optional[datetime.date] = Field(None, description="Only documents published on or before this date")
+    within_days: Optional[int] = Field(
+        None, ge=1, le=100000, description="Only documents of the last N days, counted back from the newest document"
+    )
+    recency_weight: Optional[float] = Field(
+        None, ge=0.0, le=1.0, description="Hybrid: share of the score that decays with age (default RECENCY_WEIGHT)"
+    )
+    recency_half_life: Optional[float] = Field(
+        None, gt=0.0, description="Hybrid: days after which the decaying share halves (default RECENCY_HALF_LIFE_DAYS)"
+    )
+    spelling: Optional[Literal["off", "suggest", "auto"]] = Field(
+        None, description="Correct misspelled words: suggest only, or also search the correction (default SPELL_CORRECTION)"
+    )
+    
+    def search_options(self) -> Dict[str, Any]:
+        """Keyword options for ``SearchEngine.search`` beyond the query and result count."""
+        return self.model_dump(exclude={"query", "max_results"}, exclude_none=True)
 
 
 class SearchResultItem(BaseModel):
@@ -19,6 +69,7 @@ class SearchResultItem(BaseModel):
     content: str = Field(..., description="Document content")
     score: float = Field(..., ge=0.0, le=1.0, description="Relevance score (0-1)")
     category: Optional[str] = Field(None, description="Document category")
+    date: Optional[str] = Field(None, description="Publication date (YYYY-MM-DD)")
 
 
 class SearchResponse(BaseModel):
@@ -27,9 +78,74 @@ class SearchResponse(BaseModel):
     query: str = Field(..., description="Original search query")
     results: List[SearchResultItem] = Field(default_factory=list, description="List of search results")
     total_results: int = Field(..., ge=0, description="Total number of results")
+    offset: int = Field(0, ge=0, description="Rank of the first result, counted from 0")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page; null on the last page")
+    facets: Dict[str, int] = Field(
+        default_factory=dict, description="Matching documents per category, most frequent first"
+    )
+    did_you_mean: Optional[str] = Field(None, description="Spelling correction of the (preprocessed) query, if any")
+    corrected: bool = Field(False, description="Whether the results are for did_you_mean instead of the query")
     execution_time: float = Field(..., ge=0.0, description="Query execution time in seconds")
 
 
+class BatchSearchRequest(BaseModel):
+    """Batch search request model."""
+    
+    requests: List[SearchRequest] = Field(..., min_length=1, max_length=10000, description="Search requests to run")
+
+
+class BatchSearchResponse(BaseModel):
+    """Batch search response model."""
+    
+    results: List[SearchResponse] = Field(default_factory=list, description="Search responses in request order")
+    total_queries: int = Field(..., ge=0, description="Number of queries in the batch")
+    execution_time: float = Field(..., ge=0.0, description="Batch execution time in seconds")
+
+
+class Suggestion(BaseModel):
+    """Single prefix completion."""
+    
+    text: str = Field(..., description="Completed text (the original title for titles)")
+    kind: Literal["term", "phrase", "title"] = Field(..., description="Vocabulary term, vocabulary bigram or document title")
+    weight: int = Field(..., ge=0, description="Documents containing the term (or sharing the title)")
+
+
+class SuggestResponse(BaseModel):
+    """Prefix completion response model."""
+    
+    prefix: str = Field(..., description="Typed prefix")
+    suggestions: List[Suggestion] = Field(default_factory=list, description="Completions, most frequent first")
+    execution_time: float = Field(..., ge=0.0, description="Lookup time in seconds")
+
+
+class DocumentInput(BaseModel):
+    """Document to ingest."""
+    
+    id: Optional[str] = Field(None, min_length=1, description="Document ID (generated if omitted; an existing ID is replaced)")
+    title: str = Field(..., min_length=1, description="Document title")
+    content: str = Field("", description="Document content")
+    category: Optional[str] = Field(None, description="Document category")
+    date: Optional[datetime.date] = Field(None, description="Publication date")
+
+
+class IngestRequest(BaseModel):
+    """Document ingestion request model."""
+    
+    documents: List[DocumentInput] = Field(..., min_length=1, max_length=10000, description="Documents to add or replace")
+
+
+class IngestResponse(BaseModel):
+    """Document ingestion response model."""
+    
+    added: int = Field(..., ge=0, description="Number of new documents")
+    updated: int = Field(..., ge=0, description="Number of replaced documents")
+    deleted: int = Field(..., ge=0, description="Number of deleted documents")
+    total_documents: int = Field(..., ge=0, description="Searchable documents after the change")
+    segments: int = Field(..., ge=1, description="Index segments after the change")
+    execution_time: float = Field(..., ge=0.0, description="Ingestion time in seconds")
+    docs_per_second: float = Field(..., ge=0.0, description="Ingestion throughput")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     
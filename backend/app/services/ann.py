@@ -0,0 +1,269 @@
+"""Approximate nearest-neighbour search over document embeddings (IVF)."""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.services.quantization import EmbeddingMatrix, load_embeddings
+from app.services.scoring import top_k
+
+# Below this many documents an exact scan is as fast as probing lists
+MIN_DOCUMENTS = 1000
+
+# Training vectors sampled per list for k-means
+SAMPLE_PER_LIST = 32
+
+# Rows scored against the centroids at once while assigning (bounds memory)
+ASSIGN_CHUNK = 8192
+
+
+def default_nlist(num_documents: int) -> int:
+    """Number of inverted lists for a corpus size (about 4 * sqrt(n))."""
+    return max(1, min(num_documents, int(round(4 * math.sqrt(num_documents)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the most similar centroid of every vector and its similarity."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    centroids_t = np.ascontiguousarray(centroids.T)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        block = np.asarray(vectors[start:start + ASSIGN_CHUNK], dtype=np.float32) @ centroids_t
+        labels[start:start + len(block)] = block.argmax(axis=1)
+        similarity[start:start + len(block)] = block[np.arange(len(block)), labels[start:start + len(block)]]
+    return labels, similarity
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    num_clusters: int,
+    iterations: int = 10,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity.
+
+    Centroids start at random vectors; a cluster that runs empty is
+    re-seeded with the vector its current centroid fits worst.
+
+    Args:
+        vectors: L2-normalized float32 vectors
+        num_clusters: Number of clusters
+        iterations: Lloyd iterations
+        seed: Random seed
+
+    Returns:
+        L2-normalized float32 centroids of shape (num_clusters, dim)
+    """
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(len(vectors), num_clusters, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        labels, similarity = _assign(vectors, centroids)
+        membership = sparse.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (labels, np.arange(len(vectors)))),
+            shape=(num_clusters, len(vectors))
+        )
+        centroids = _normalize_rows(np.asarray(membership @ vectors, dtype=np.float32))
+        empty = np.flatnonzero(np.diff(membership.indptr) == 0)
+        if len(empty):
+            worst = np.argsort(similarity, kind="stable")[:len(empty)]
+            centroids[empty] = vectors[worst]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index with k-means coarse quantization.
+
+    Documents are grouped into the lists of their nearest centroid. A query
+    is compared with all centroids, and only the documents of the
+    ``nprobe`` closest lists are scored exactly against the query, so the
+    work per query is about ``nlist + nprobe * n / nlist`` dot products
+    instead of ``n``. More probes raise recall at the cost of latency.
+
+    The embeddings are stored again in list order, so every probed list is
+    one contiguous block scored with a single matrix-vector product rather
+    than a gather of scattered rows. They may be stored compressed (see
+    ``app.services.quantization``), in which case lists are scored on the
+    codes and the similarities are approximate.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_ids: np.ndarray,
+        list_vectors: EmbeddingMatrix
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            centroids: L2-normalized centroids, one per list
+            list_offsets: Start of every list in ``list_ids`` (length nlist + 1)
+            list_ids: Document ids grouped by list, ascending within a list
+            list_vectors: (Encoded) embeddings aligned with ``list_ids``
+        """
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.list_vectors = list_vectors
+        self._centroids_t = np.ascontiguousarray(np.asarray(centroids, dtype=np.float32).T)
+
+    @property
+    def nlist(self) -> int:
+        """Number of inverted lists."""
+        return len(self.centroids)
+
+    def expected_scan(self, nprobe: int) -> int:
+        """Documents scored per query on average when ``nprobe`` lists are probed."""
+        return len(self.list_ids) * min(nprobe, self.nlist) // max(1, self.nlist)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        nlist: int = 0,
+        centroids: Optional[np.ndarray] = None,
+        vectors: Optional[EmbeddingMatrix] = None,
+        iterations: int = 10,
+        seed: int = 0
+    ) -> Optional["IVFIndex"]:
+        """
+        Cluster the document embeddings and fill the inverted lists.
+
+        Documents with an all-zero embedding can never match a query and
+        are left out.
+
+        Args:
+            embeddings: L2-normalized document embeddings
+            nlist: Number of lists; 0 picks ``default_nlist``
+            centroids: Reuse these centroids instead of training new ones
+                (only the documents are assigned, as after a merge)
+            vectors: Encoded copy of ``embeddings`` to store in the lists
+                (float32 if None)
+            iterations: k-means iterations
+            seed: Random seed for sampling and initialization
+
+        Returns:
+            The index, or None if there are too few documents to need one
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        doc_ids = np.flatnonzero(np.any(embeddings != 0, axis=1))
+        if len(doc_ids) < MIN_DOCUMENTS:
+            return None
+
+        if centroids is None:
+            nlist = min(nlist or default_nlist(len(doc_ids)), len(doc_ids))
+            rng = np.random.default_rng(seed)
+            sample_size = min(len(doc_ids), nlist * SAMPLE_PER_LIST)
+            sample = embeddings[np.sort(rng.choice(doc_ids, sample_size, replace=False))]
+            centroids = spherical_kmeans(sample, nlist, iterations=iterations, seed=seed)
+        centroids = np.asarray(centroids, dtype=np.float32)
+
+        labels, _ = _assign(embeddings[doc_ids], centroids)
+        # Stable, so ids stay ascending within each list
+        order = np.argsort(labels, kind="stable")
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=len(centroids)))))
+        list_ids = doc_ids[order]
+        list_vectors = vectors.take(list_ids) if vectors is not None else EmbeddingMatrix(embeddings[list_ids])
+        return cls(centroids, list_offsets.astype(np.int64), list_ids.astype(np.int32), list_vectors)
+
+    def arrays(self, prefix: str = "ann_") -> Dict[str, np.ndarray]:
+        """Arrays to persist the index with (see ``from_arrays``)."""
+        return {
+            f"{prefix}centroids": self.centroids,
+            f"{prefix}list_offsets": self.list_offsets,
+            f"{prefix}list_ids": self.list_ids,
+            **self.list_vectors.arrays(f"{prefix}list_"),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "ann_") -> Optional["IVFIndex"]:
+        """Attach to persisted index arrays; None if the snapshot has no index."""
+        if f"{prefix}centroids" not in arrays:
+            return None
+        return cls(
+            np.asarray(arrays[f"{prefix}centroids"]),
+            np.asarray(arrays[f"{prefix}list_offsets"]),
+            np.asarray(arrays[f"{prefix}list_ids"]),
+            load_embeddings(arrays, f"{prefix}list_")
+        )
+
+    def _probe(self, query_matrix: np.ndarray, nprobe: int) -> np.ndarray:
+        """Return the ``nprobe`` closest lists of every query, shape (Q, nprobe)."""
+        similarity = query_matrix @ self._centroids_t
+        nprobe = min(nprobe, self.nlist)
+        if nprobe == self.nlist:
+            return np.broadcast_to(np.arange(self.nlist), (len(query_matrix), self.nlist))
+        return np.argpartition(-similarity, nprobe - 1, axis=1)[:, :nprobe]
+
+    def _scan(
+        self,
+        lists: np.ndarray,
+        query_embedding: np.ndarray,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every document of the given lists (allowed by ``mask``); return (doc_ids, scores)."""
+        starts = self.list_offsets[lists]
+        lengths = self.list_offsets[lists + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Positions of all probed lists in one index array; every list is a contiguous run
+        rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        doc_ids = self.list_ids[rows]
+        if mask is not None:
+            keep = mask[doc_ids]
+            rows, doc_ids = rows[keep], doc_ids[keep]
+        scores = self.list_vectors.dot_rows(query_embedding[np.newaxis, :], rows)[:, 0]
+        return doc_ids.astype(np.int64), scores
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the approximate k nearest documents of a query.
+
+        Args:
+            query_embedding: L2-normalized query embedding
+            k: Number of documents to return
+            nprobe: Number of lists to scan
+            mask: Documents that may be returned (all if None); the others
+                are skipped before scoring
+
+        Returns:
+            Tuple of (doc_ids, cosine similarities) sorted by descending similarity
+        """
+        return self.search_batch(query_embedding[np.newaxis, :], k, nprobe, mask)[0]
+
+    def search_batch(
+        self,
+        query_matrix: np.ndarray,
+        k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the approximate k nearest documents of every query row.
+
+        The centroids are scored for all queries in one matrix product.
+        """
+        query_matrix = np.asarray(query_matrix, dtype=np.float32)
+        return [
+            top_k(*self._scan(lists, query_embedding, mask), k)
+            for query_embedding, lists in zip(query_matrix, self._probe(query_matrix, nprobe))
+        ]
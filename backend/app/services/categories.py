@@ -0,0 +1,108 @@
+"""Category filters and facet counts over per-segment category codes."""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CategoryFilter(NamedTuple):
+    """Categories a search is restricted to and categories it leaves out (case-insensitive)."""
+
+    include: Tuple[str, ...]
+    exclude: Tuple[str, ...]
+
+    @classmethod
+    def resolve(
+        cls,
+        categories: Optional[Sequence[str]] = None,
+        exclude_categories: Optional[Sequence[str]] = None
+    ) -> Optional["CategoryFilter"]:
+        """Normalize the requested categories; None when nothing is filtered."""
+        include = tuple(sorted({name.casefold() for name in categories or ()}))
+        exclude = tuple(sorted({name.casefold() for name in exclude_categories or ()}))
+        if not include and not exclude:
+            return None
+        return cls(include, exclude)
+
+
+class CategoryIndex:
+    """
+    Category of every document of a segment as a small integer code.
+
+    The ids of every category are also kept as one sorted array, grouped
+    by code (``doc_ids[offsets[c]:offsets[c + 1]]``), so a filter mask is
+    built by writing the few selected id ranges instead of comparing
+    strings document by document.
+    """
+
+    def __init__(self, names: List[str], codes: np.ndarray):
+        """
+        Args:
+            names: Category names, sorted; codes index into them
+            codes: Category code of every document
+        """
+        self.names = names
+        self.codes = codes
+        self.doc_ids = np.argsort(codes, kind="stable").astype(np.int32)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(names)))))
+        self._lookup: Dict[str, List[int]] = {}
+        for code, name in enumerate(names):
+            self._lookup.setdefault(name.casefold(), []).append(code)
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[str]]) -> "CategoryIndex":
+        """Encode the category of every document (missing categories become "")."""
+        values = ["" if value is None else str(value) for value in values]
+        names, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+        dtype = np.int16 if len(names) <= np.iinfo(np.int16).max else np.int32
+        return cls([str(name) for name in names], codes.astype(dtype))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _ids(self, names: Iterable[str]) -> List[np.ndarray]:
+        """Sorted id arrays of the given casefolded category names."""
+        return [
+            self.doc_ids[self.offsets[code]:self.offsets[code + 1]]
+            for name in names
+            for code in self._lookup.get(name, ())
+        ]
+
+    def allowed(self, category_filter: CategoryFilter) -> np.ndarray:
+        """Mask of the documents that pass the filter."""
+        if category_filter.include:
+            mask = np.zeros(len(self), dtype=bool)
+            for doc_ids in self._ids(category_filter.include):
+                mask[doc_ids] = True
+        else:
+            mask = np.ones(len(self), dtype=bool)
+        for doc_ids in self._ids(category_filter.exclude):
+            mask[doc_ids] = False
+        return mask
+
+
+def merge_categories(indexes: Sequence[CategoryIndex]) -> Tuple[List[str], np.ndarray]:
+    """
+    Combine the category codes of several segments.
+
+    Returns:
+        Tuple of (sorted names over all segments, code of every document of
+        the segments in order, indexing those names)
+    """
+    names = sorted({name for index in indexes for name in index.names})
+    position = {name: code for code, name in enumerate(names)}
+    dtype = np.int16 if len(names) <= np.iinfo(np.int16).max else np.int32
+    parts = [
+        np.array([position[name] for name in index.names], dtype=dtype)[index.codes]
+        if len(index.names) else np.empty(0, dtype=dtype)
+        for index in indexes
+    ]
+    return names, np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+
+def facet_counts(names: List[str], codes: np.ndarray, doc_ids: np.ndarray) -> Dict[str, int]:
+    """Number of the given documents per category, most frequent first."""
+    counts = np.bincount(np.asarray(codes[doc_ids], dtype=np.intp), minlength=len(names))
+    present = np.flatnonzero(counts)
+    order = present[np.argsort(-counts[present], kind="stable")]
+    return {names[code]: int(counts[code]) for code in order}
@@ -0,0 +1,173 @@
+"""Publication dates as day numbers: date-range filters and recency boosts."""
+
+import datetime
+from typing import Any, Iterable, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+# Day number of documents without a (parseable) date; sorts before every real date
+MISSING_DAY = np.iinfo(np.int32).min
+
+EPOCH = datetime.date(1970, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def parse_day(value: Any) -> Optional[str]:
+    """Normalize a date, datetime or ISO string to "YYYY-MM-DD"; None if it is not a date."""
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, str) and len(value) >= 10:
+        try:
+            return datetime.date.fromisoformat(value[:10]).isoformat()
+        except ValueError:
+            return None
+    return None
+
+
+def to_day_numbers(values: Iterable[Optional[str]]) -> np.ndarray:
+    """Days since 1970-01-01 of every date string (``MISSING_DAY`` for missing or invalid dates)."""
+    values = [parse_day(value) for value in values]
+    days = np.full(len(values), MISSING_DAY, dtype=np.int32)
+    present = np.flatnonzero([value is not None for value in values])
+    if len(present):
+        parsed = np.array([values[i] for i in present], dtype="datetime64[D]")
+        days[present] = parsed.astype(np.int64)
+    return days
+
+
+def day_number(value: Union[datetime.date, str]) -> int:
+    """
+    Days since 1970-01-01 of a date or ISO date string.
+
+    Raises:
+        ValueError: If the value is not a date
+    """
+    day = parse_day(value)
+    if day is None:
+        raise ValueError(f"Invalid date {value!r}; use YYYY-MM-DD")
+    return (datetime.date.fromisoformat(day) - EPOCH).days
+
+
+def day_string(day: int) -> Optional[str]:
+    """Inverse of ``day_number``: "YYYY-MM-DD" of a day number, None for ``MISSING_DAY``."""
+    if day == MISSING_DAY:
+        return None
+    return datetime.date.fromordinal(_EPOCH_ORDINAL + int(day)).isoformat()
+
+
+class DateRange(NamedTuple):
+    """Inclusive range of day numbers a search is restricted to (None leaves a side open)."""
+
+    start: Optional[int]
+    end: Optional[int]
+
+    @classmethod
+    def resolve(
+        cls,
+        date_from: Union[datetime.date, str, None] = None,
+        date_to: Union[datetime.date, str, None] = None,
+        within_days: Optional[int] = None,
+        latest_day: Optional[int] = None
+    ) -> Optional["DateRange"]:
+        """
+        Turn the requested bounds into day numbers; None when nothing is filtered.
+
+        Like every date filter, ``within_days`` never matches undated
+        documents: without a ``latest_day`` it still yields a range (open on
+        both sides), which then matches nothing.
+
+        Args:
+            date_from: First publication date to include
+            date_to: Last publication date to include
+            within_days: Only the last ``within_days`` days up to ``latest_day``
+            latest_day: Day number of the newest document
+
+        Raises:
+            ValueError: If a bound is not a date or ``within_days`` is not positive
+        """
+        if within_days is not None and within_days < 1:
+            raise ValueError("within_days must be at least 1")
+        start = None if date_from is None else day_number(date_from)
+        end = None if date_to is None else day_number(date_to)
+        if within_days is not None and latest_day is not None:
+            recent = latest_day - within_days + 1
+            start = recent if start is None else max(start, recent)
+        if start is None and end is None and within_days is None:
+            return None
+        return cls(start, end)
+
+
+class DateIndex:
+    """
+    Publication day of every document of a segment, plus a sorted date index.
+
+    ``order`` lists the document ids by ascending day, so the documents of
+    a date range are one contiguous slice of it, found with two binary
+    searches over ``sorted_days``.
+    """
+
+    def __init__(self, days: np.ndarray):
+        """
+        Args:
+            days: Day number of every document (``MISSING_DAY`` if unknown)
+        """
+        self.days = days
+        self.order = np.argsort(days, kind="stable").astype(np.int32)
+        self.sorted_days = days[self.order]
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[str]]) -> "DateIndex":
+        """Index the date string of every document."""
+        return cls(to_day_numbers(values))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def latest_day(self) -> Optional[int]:
+        """Day number of the newest dated document, None if no document has a date."""
+        if not len(self) or self.sorted_days[-1] == MISSING_DAY:
+            return None
+        return int(self.sorted_days[-1])
+
+    def allowed(self, date_range: DateRange) -> np.ndarray:
+        """Mask of the documents published within the range (undated documents never are)."""
+        start = MISSING_DAY + 1 if date_range.start is None else date_range.start
+        lo = np.searchsorted(self.sorted_days, start, side="left")
+        hi = (
+            len(self) if date_range.end is None
+            else np.searchsorted(self.sorted_days, date_range.end, side="right")
+        )
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.order[lo:hi]] = True
+        return mask
+
+
+def recency_boost(
+    days: np.ndarray,
+    latest_day: Optional[int],
+    weight: float,
+    half_life: float
+) -> np.ndarray:
+    """
+    Score multiplier of every document from its age.
+
+    The multiplier is ``(1 - weight) + weight * 0.5 ** (age / half_life)``, with
+    the age in days counted back from ``latest_day``. The newest documents
+    keep their score, and the oldest and undated ones keep ``1 - weight`` of it.
+    """
+    boost = np.full(len(days), 1.0 - weight, dtype=np.float64)
+    if latest_day is None:
+        return boost
+    dated = days != MISSING_DAY
+    age = np.maximum(latest_day - days[dated].astype(np.float64), 0.0)
+    boost[dated] += weight * np.exp2(-age / half_life)
+    return boost
+
+
+def merge_days(indexes: Sequence[DateIndex]) -> np.ndarray:
+    """Day numbers of the documents of several segments, in order."""
+    parts = [index.days for index in indexes]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
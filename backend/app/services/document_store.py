@@ -0,0 +1,212 @@
+"""Columnar document store: ids, titles and content as packed buffers, categories and dates as codes."""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.categories import CategoryIndex
+from app.services.dates import DateIndex, day_string, to_day_numbers
+from app.services.packed_strings import pack_strings, unpack_string
+
+DOCUMENTS_PREFIX = "documents_"
+
+# Text columns, each a UTF-8 byte buffer plus the start offset of every document (and the end)
+TEXT_COLUMNS = ("id", "title", "content")
+
+
+class DocumentStore:
+    """
+    Sequence of documents stored column by column.
+
+    Ids, titles and content are each one UTF-8 byte buffer with offsets,
+    categories are small integer codes into a sorted name list and dates
+    are day numbers, so a store holds a handful of arrays instead of a
+    dict and several strings per document. Snapshot stores are
+    memory-mapped: filters read the category and date columns, and a
+    document's text is only sliced and decoded when it is accessed, i.e.
+    for the results actually returned.
+    """
+
+    def __init__(
+        self,
+        buffers: Dict[str, np.ndarray],
+        offsets: Dict[str, np.ndarray],
+        category_names: List[str],
+        category_codes: np.ndarray,
+        days: np.ndarray
+    ):
+        """
+        Args:
+            buffers: UTF-8 bytes of every column in ``TEXT_COLUMNS``
+            offsets: Start of every document in the column's buffer (plus the end)
+            category_names: Category names, sorted ("" for documents without one)
+            category_codes: Index into ``category_names`` of every document
+            days: Day number of every document (``MISSING_DAY`` if undated)
+        """
+        # Plain views of memory-mapped columns: slicing an ``np.memmap`` costs
+        # several times more than the decoding of a short string
+        self.buffers = {column: _plain(array) for column, array in buffers.items()}
+        self.offsets = {column: _plain(array) for column, array in offsets.items()}
+        self.category_names = category_names
+        self.category_codes = _plain(category_codes)
+        self.days = _plain(days)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict[str, Any]]) -> "DocumentStore":
+        """
+        Encode document dictionaries column by column.
+
+        Documents without an id get their position as id, as results
+        always reported them.
+        """
+        documents = list(documents)
+        ids = (doc.get("id") for doc in documents)
+        columns = {
+            "id": [str(position if doc_id is None else doc_id) for position, doc_id in enumerate(ids)],
+            "title": [doc.get("title") or "" for doc in documents],
+            "content": [doc.get("content") or "" for doc in documents],
+        }
+        buffers, offsets = {}, {}
+        for column, values in columns.items():
+            buffers[column], offsets[column] = pack_strings(values)
+        categories = CategoryIndex.from_values(doc.get("category") for doc in documents)
+        days = to_day_numbers(doc.get("date") for doc in documents)
+        return cls(buffers, offsets, categories.names, categories.codes, days)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence[Sequence[Any]]) -> "DocumentStore":
+        """
+        Build one store from rows of several stores, without decoding any text.
+
+        Args:
+            parts: (store, local ids) pairs, in the order the rows are stored
+        """
+        parts = [(store, np.asarray(rows, dtype=np.int64)) for store, rows in parts]
+        buffers, offsets = {}, {}
+        for column in TEXT_COLUMNS:
+            chunks, lengths = [np.empty(0, dtype=np.uint8)], [np.zeros(1, dtype=np.int64)]
+            for store, rows in parts:
+                starts, ends = store.offsets[column][rows], store.offsets[column][rows + 1]
+                chunks.extend(store.buffers[column][start:end] for start, end in zip(starts, ends))
+                lengths.append(ends - starts)
+            buffers[column] = np.concatenate(chunks)
+            offsets[column] = np.cumsum(np.concatenate(lengths))
+
+        names = sorted({name for store, _ in parts for name in store.category_names})
+        dtype = np.int16 if len(names) <= np.iinfo(np.int16).max else np.int32
+        codes, days = [np.empty(0, dtype=dtype)], [np.empty(0, dtype=np.int32)]
+        for store, rows in parts:
+            # Codes of the store's names within the merged name list
+            recode = np.array([names.index(name) for name in store.category_names], dtype=dtype)
+            codes.append(recode[store.category_codes[rows]])
+            days.append(store.days[rows])
+        return cls(buffers, offsets, names, np.concatenate(codes), np.concatenate(days))
+
+    def arrays(self, prefix: str = DOCUMENTS_PREFIX) -> Dict[str, np.ndarray]:
+        """Arrays to persist the store with (see ``from_arrays``)."""
+        arrays = {
+            f"{prefix}category_names": np.array(self.category_names, dtype=str),
+            f"{prefix}category_codes": self.category_codes,
+            f"{prefix}days": self.days,
+        }
+        for column in TEXT_COLUMNS:
+            arrays[f"{prefix}{column}_buffer"] = self.buffers[column]
+            arrays[f"{prefix}{column}_offsets"] = self.offsets[column]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = DOCUMENTS_PREFIX) -> "DocumentStore":
+        """Attach to persisted store arrays."""
+        return cls(
+            {column: arrays[f"{prefix}{column}_buffer"] for column in TEXT_COLUMNS},
+            {column: arrays[f"{prefix}{column}_offsets"] for column in TEXT_COLUMNS},
+            [str(name) for name in arrays[f"{prefix}category_names"]],
+            arrays[f"{prefix}category_codes"],
+            arrays[f"{prefix}days"]
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Size of all columns in bytes."""
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def text(self, column: str, index: int) -> str:
+        """Decode one document's value of a text column."""
+        return unpack_string(self.buffers[column], self.offsets[column], index)
+
+    def category(self, index: int) -> Optional[str]:
+        """Category of a document, None if it has none."""
+        return self.category_names[self.category_codes.item(index)] or None
+
+    def date(self, index: int) -> Optional[str]:
+        """Publication day of a document as "YYYY-MM-DD", None if undated."""
+        return day_string(self.days.item(index))
+
+    def ids(self) -> List[str]:
+        """Ids of all documents."""
+        return [self.text("id", index) for index in range(len(self))]
+
+    def titles(self) -> Iterator[str]:
+        """Titles of all documents (content is never read)."""
+        for index in range(len(self)):
+            yield self.text("title", index)
+
+    def categories(self) -> CategoryIndex:
+        """Category index over the stored codes."""
+        return CategoryIndex(self.category_names, self.category_codes)
+
+    def dates(self) -> DateIndex:
+        """Date index over the stored day numbers."""
+        return DateIndex(self.days)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("document index out of range")
+        return {
+            "id": self.text("id", index),
+            "title": self.text("title", index),
+            "content": self.text("content", index),
+            "category": self.category(index),
+            "date": self.date(index),
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _plain(array: np.ndarray) -> np.ndarray:
+    """View an array (memory-mapped or not) as a plain ``np.ndarray``."""
+    return np.asarray(array).view(np.ndarray)
+
+
+def write_documents(directory: Path, documents: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write documents as the ``.npy`` columns of a ``DocumentStore``.
+
+    Args:
+        directory: Snapshot directory
+        documents: A document store or normalized documents
+
+    Returns:
+        Number of documents written
+    """
+    store = documents if isinstance(documents, DocumentStore) else DocumentStore.from_documents(documents)
+    for name, array in store.arrays().items():
+        np.save(directory / f"{name}.npy", np.asarray(array))
+    return len(store)
+
+
+def load_documents(directory: Path) -> DocumentStore:
+    """Memory-map the document columns written by ``write_documents``."""
+    return DocumentStore.from_arrays({
+        path.stem: np.load(path, mmap_mode="r")
+        for path in directory.glob(f"{DOCUMENTS_PREFIX}*.npy")
+    })
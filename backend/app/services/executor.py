@@ -0,0 +1,201 @@
+"""Dedicated executor that keeps CPU-bound search work off the event loop."""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log import configure_logging
+
+
+class SearchRejectedError(RuntimeError):
+    """Raised when the executor queue is full."""
+
+
+class SearchTimeoutError(RuntimeError):
+    """Raised when a search does not finish within the configured timeout."""
+
+
+def limit_blas_threads(num_threads: int) -> None:
+    """
+    Cap the NumPy/BLAS/OpenMP thread pools of the current process.
+
+    Every executor worker runs its own matrix products, so letting BLAS
+    spawn one thread per core in each of them oversubscribes the CPU.
+    """
+    if num_threads <= 0:
+        return
+    for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(num_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=num_threads)
+    except ImportError:
+        pass
+
+
+def _initialize_worker() -> None:
+    """Process-pool initializer: configure logging, cap BLAS threads and load the index."""
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    limit_blas_threads(settings.BLAS_THREADS)
+    from app.services.search_engine import get_search_engine
+    get_search_engine()
+
+
+def run_search(query: str, max_results: Optional[int], options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run a single search on the engine of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().search(query=query, max_results=max_results, **(options or {}))
+
+
+def run_search_batch(queries: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    """Run a batch search on the engine of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().search_batch(queries)
+
+
+def run_suggest(prefix: str, limit: Optional[int]) -> Dict[str, Any]:
+    """Complete a query prefix on the engine of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().suggest(prefix, limit)
+
+
+def run_upsert_documents(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Ingest documents on the engine of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().upsert_documents(documents)
+
+
+def run_delete_documents(doc_ids: List[str]) -> Dict[str, Any]:
+    """Delete documents on the engine of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().delete_documents(doc_ids)
+
+
+def run_cache_stats() -> Dict[str, Any]:
+    """Return the result cache counters of the current process (and of its pageable result sets)."""
+    from app.services.search_engine import get_search_engine
+    engine = get_search_engine()
+    return {**engine.result_cache.stats(), "result_sets": engine.result_sets.stats()}
+
+
+def run_index_stats() -> Dict[str, Any]:
+    """Return the index size counters of the current process."""
+    from app.services.search_engine import get_search_engine
+    return get_search_engine().index_stats()
+
+
+class SearchExecutor:
+    """
+    Bounded thread or process pool for search requests.
+
+    At most ``max_workers`` searches run at a time and at most
+    ``queue_depth`` more wait for a worker; further requests are rejected
+    immediately instead of piling up behind a saturated pool.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 4,
+        queue_depth: int = 64,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            kind: "thread" or "process"
+            max_workers: Number of pool workers
+            queue_depth: Maximum number of requests waiting for a worker
+            timeout: Seconds to wait for a result (0 disables the timeout)
+        """
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._pool: Executor = self._create_pool()
+
+    def _create_pool(self) -> Executor:
+        """Create the underlying pool."""
+        if self.kind == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=_initialize_worker)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="search")
+
+    def warm_up(self) -> None:
+        """Start all process workers so they load the index before traffic arrives."""
+        if self.kind == "process":
+            futures = [self._pool.submit(run_cache_stats) for _ in range(self.max_workers)]
+            for future in futures:
+                future.result()
+
+    async def submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run ``func(*args)`` on the pool without blocking the event loop.
+
+        Raises:
+            SearchRejectedError: If the pool and its queue are full
+            SearchTimeoutError: If the call exceeds the timeout
+        """
+        if self.in_flight >= self.max_workers + self.queue_depth:
+            self.rejected += 1
+            raise SearchRejectedError("Search queue is full")
+
+        self.in_flight += 1
+        future = self._pool.submit(func, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout or None
+            )
+        except asyncio.TimeoutError:
+            # A queued call is dropped; a running one finishes in the background
+            future.cancel()
+            self.timed_out += 1
+            raise SearchTimeoutError(f"Search exceeded {self.timeout} seconds")
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool configuration and load counters."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool, dropping queued work."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Global executor instance
+search_executor = None
+
+
+def get_search_executor() -> SearchExecutor:
+    """Get or create the search executor instance."""
+    global search_executor
+    if search_executor is None:
+        search_executor = SearchExecutor(
+            kind=settings.SEARCH_EXECUTOR,
+            max_workers=settings.SEARCH_WORKERS,
+            queue_depth=settings.SEARCH_QUEUE_DEPTH,
+            timeout=settings.SEARCH_TIMEOUT,
+        )
+    return search_executor
+
+
+def shutdown_search_executor() -> None:
+    """Shut down the global executor, if it was created."""
+    global search_executor
+    if search_executor is not None:
+        search_executor.shutdown()
+        search_executor = None
@@ -0,0 +1,34 @@
+"""Document restrictions applied before retrieval."""
+
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.services.categories import CategoryFilter
+from app.services.dates import DateRange
+
+# Per-request restrictions accepted by ``SearchEngine.search``, in argument order
+REQUEST_OPTIONS = ("categories", "exclude_categories", "date_from", "date_to", "within_days")
+
+
+class SearchFilter(NamedTuple):
+    """Category and publication-date restrictions of a search (either may be None)."""
+
+    categories: Optional[CategoryFilter]
+    dates: Optional[DateRange]
+
+    @classmethod
+    def combine(
+        cls,
+        categories: Optional[CategoryFilter] = None,
+        dates: Optional[DateRange] = None
+    ) -> Optional["SearchFilter"]:
+        """Combine the restrictions; None when nothing is filtered."""
+        if categories is None and dates is None:
+            return None
+        return cls(categories, dates)
+
+    def as_fields(self) -> Dict[str, Any]:
+        """Filter as log fields."""
+        return {
+            "categories": None if self.categories is None else self.categories._asdict(),
+            "dates": None if self.dates is None else self.dates._asdict(),
+        }
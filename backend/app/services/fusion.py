@@ -0,0 +1,154 @@
+"""Fusion of independently retrieved lexical and semantic candidate lists."""
+
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+# Per-request overrides accepted by ``FusionOptions.resolve``, in argument order
+REQUEST_OPTIONS = (
+    "fusion", "lexical_depth", "semantic_depth", "lexical_weight", "semantic_weight",
+    "recency_weight", "recency_half_life",
+)
+
+
+class FusionOptions(NamedTuple):
+    """How the candidate lists of a hybrid search are retrieved and merged."""
+
+    method: str  # "linear" or "rrf"
+    lexical_depth: int  # Lexical candidates retrieved
+    semantic_depth: int  # Semantic candidates retrieved (0 disables the semantic list)
+    lexical_weight: float
+    semantic_weight: float
+    recency_weight: float  # Share of the fused score that decays with document age (0 disables)
+    recency_half_life: float  # Days after which the decaying share halves
+
+    @classmethod
+    def resolve(
+        cls,
+        fusion: Optional[str] = None,
+        lexical_depth: Optional[int] = None,
+        semantic_depth: Optional[int] = None,
+        lexical_weight: Optional[float] = None,
+        semantic_weight: Optional[float] = None,
+        recency_weight: Optional[float] = None,
+        recency_half_life: Optional[float] = None
+    ) -> "FusionOptions":
+        """
+        Fill unset options from the settings.
+
+        Raises:
+            ValueError: If the fusion method is unknown, no weight is positive
+                or the recency options are out of range
+        """
+        options = cls(
+            fusion or settings.HYBRID_FUSION,
+            settings.LEXICAL_DEPTH if lexical_depth is None else lexical_depth,
+            settings.SEMANTIC_DEPTH if semantic_depth is None else semantic_depth,
+            settings.LEXICAL_WEIGHT if lexical_weight is None else lexical_weight,
+            settings.SEMANTIC_WEIGHT if semantic_weight is None else semantic_weight,
+            settings.RECENCY_WEIGHT if recency_weight is None else recency_weight,
+            settings.RECENCY_HALF_LIFE_DAYS if recency_half_life is None else recency_half_life,
+        )
+        if options.method not in ("linear", "rrf"):
+            raise ValueError(f"Unknown fusion method {options.method!r}; use 'linear' or 'rrf'")
+        if options.lexical_weight < 0 or options.semantic_weight < 0 or options.total_weight <= 0:
+            raise ValueError("Fusion weights must be non-negative and not both 0")
+        if not 0.0 <= options.recency_weight <= 1.0 or options.recency_half_life <= 0:
+            raise ValueError("Recency weight must be in [0, 1] and its half-life positive")
+        return options
+
+    @property
+    def total_weight(self) -> float:
+        return self.lexical_weight + self.semantic_weight
+
+    def as_fields(self) -> Dict[str, Any]:
+        """Options as log fields."""
+        return {"fusion": self.method, **{key: value for key, value in self._asdict().items() if key != "method"}}
+
+
+def candidate_union(*ranked_lists: np.ndarray) -> np.ndarray:
+    """Union of document id lists, in order of first appearance."""
+    doc_ids = np.concatenate(ranked_lists) if ranked_lists else np.empty(0, dtype=np.int64)
+    _, first = np.unique(doc_ids, return_index=True)
+    return doc_ids[np.sort(first)]
+
+
+def aligned_scores(union: np.ndarray, doc_ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Scores of ``doc_ids`` laid out along ``union``; 0 for documents not in ``doc_ids``."""
+    aligned = np.zeros(len(union), dtype=np.float64)
+    if len(doc_ids):
+        order = np.argsort(doc_ids, kind="stable")
+        positions = np.searchsorted(doc_ids, union, sorter=order)
+        positions = np.minimum(positions, len(doc_ids) - 1)
+        found = doc_ids[order[positions]] == union
+        aligned[found] = scores[order[positions[found]]]
+    return aligned
+
+
+def linear_fusion(columns: Sequence[np.ndarray], weights: Sequence[float]) -> np.ndarray:
+    """
+    Weighted mean of per-retriever scores.
+
+    Weights are normalized to sum to 1, so scores in [0, 1] stay in [0, 1]
+    and remain comparable with ``MIN_SIMILARITY_THRESHOLD``.
+    """
+    total = float(sum(weights))
+    fused = np.zeros(len(columns[0]), dtype=np.float64)
+    for column, weight in zip(columns, weights):
+        if weight:
+            fused += (weight / total) * np.asarray(column, dtype=np.float64)
+    return fused
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[np.ndarray],
+    weights: Sequence[float],
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reciprocal-rank fusion: every list adds ``weight / (k + rank)`` to its documents.
+
+    Only ranks matter, so retrievers with incomparable score scales merge
+    without calibration. Scores are divided by the best achievable score
+    (first in every weighted list), which puts them in [0, 1].
+
+    Args:
+        ranked_lists: Document ids of every retriever, best first
+        weights: Weight of every list
+        k: Rank offset damping the influence of the top ranks
+
+    Returns:
+        Tuple of (union of the lists in order of first appearance, fused scores)
+    """
+    union = candidate_union(*ranked_lists)
+    fused = np.zeros(len(union), dtype=np.float64)
+    for doc_ids, weight in zip(ranked_lists, weights):
+        if weight and len(doc_ids):
+            ranks = np.arange(1, len(doc_ids) + 1, dtype=np.float64)
+            fused += aligned_scores(union, doc_ids, weight / (k + ranks))
+    best = sum(weight for doc_ids, weight in zip(ranked_lists, weights) if weight) / (k + 1)
+    return union, fused / best if best else fused
+
+
+def rank_fused(
+    doc_ids: np.ndarray,
+    scores: np.ndarray,
+    k: int,
+    min_score: float = 0.0,
+    boost: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the k best fused documents scoring at least ``min_score``.
+
+    ``boost`` multiplies the scores of the kept documents before ranking
+    (the threshold applies to the unboosted scores, so boosting reorders
+    the matches without changing which documents match). Ties keep their
+    order in ``doc_ids`` (lexical candidates first).
+    """
+    keep = np.flatnonzero(scores >= min_score)
+    ranked = scores[keep] if boost is None else scores[keep] * boost[keep]
+    order = np.argsort(-ranked, kind="stable")[:k]
+    return doc_ids[keep[order]], ranked[order]
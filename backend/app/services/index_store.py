@@ -0,0 +1,461 @@
+"""
+Persistence of built search indexes as on-disk snapshots.
+
+A snapshot is a directory of plain ``.npy`` arrays plus a small manifest.
+Everything is opened memory-mapped and read-only, so all worker processes
+attached to the same snapshot share one copy of the index in the OS page
+cache instead of each holding its own.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+from gensim.models import KeyedVectors
+from app.core.config import settings
+from app.services.document_store import DocumentStore, load_documents, write_documents
+from app.services.quantization import CompressedWordVectors, load_embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds are not coordinated
+    fcntl = None
+
+# Bump whenever the snapshot layout or the index-time hyperparameters change
+INDEX_FORMAT_VERSION = 11
+
+MANIFEST_FILE = "manifest.json"
+VOCABULARY_FILE = "vocabulary.json"
+WORD_VECTORS_FILE = "word_vectors.kv"
+WORD_KEYS_FILE = "word_keys.json"
+WORD_VECTORS_PREFIX = "word_vectors_"
+SEGMENTS_DIR = "segments"
+SEGMENTS_STATE_FILE = "segments.json"
+SEGMENT_META_FILE = "segment.json"
+
+SPARSE_FORMATS = {"csr": sparse.csr_matrix, "csc": sparse.csc_matrix}
+
+
+def index_settings() -> Dict[str, Any]:
+    """Return the settings that influence how the index is built."""
+    return {
+        "TFIDF_MAX_FEATURES": settings.TFIDF_MAX_FEATURES,
+        "USE_WORD2VEC": settings.USE_WORD2VEC,
+        "PREPROCESSING": settings.PREPROCESSING,
+        "SPACY_MODEL": settings.SPACY_MODEL,
+        "BM25_B": settings.BM25_B,
+        "BM25_TITLE_WEIGHT": settings.BM25_TITLE_WEIGHT,
+        "BM25_CONTENT_WEIGHT": settings.BM25_CONTENT_WEIGHT,
+        "ANN_INDEX": settings.ANN_INDEX,
+        "ANN_NLIST": settings.ANN_NLIST,
+        "EMBEDDING_STORAGE": settings.EMBEDDING_STORAGE,
+        "PQ_SUBVECTORS": settings.PQ_SUBVECTORS,
+        "SPELL_DICTIONARY_PATH": settings.SPELL_DICTIONARY_PATH,
+        "SPELL_MAX_EDIT_DISTANCE": settings.SPELL_MAX_EDIT_DISTANCE,
+        "SPELL_PREFIX_LENGTH": settings.SPELL_PREFIX_LENGTH,
+        "SUGGEST_TOP_K": settings.SUGGEST_TOP_K,
+    }
+
+
+def compute_fingerprint(documents_path: str) -> str:
+    """
+    Hash the corpus contents together with the index-time settings.
+
+    Args:
+        documents_path: Path to the documents file
+
+    Returns:
+        Hex digest identifying the corpus/config combination
+    """
+    digest = hashlib.sha256()
+    digest.update(f"format={INDEX_FORMAT_VERSION}\n".encode("utf-8"))
+    digest.update(json.dumps(index_settings(), sort_keys=True).encode("utf-8"))
+
+    file_path = Path(documents_path)
+    if file_path.exists():
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    else:
+        digest.update(b"<missing>")
+
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def build_lock(index_path: str) -> Iterator[None]:
+    """
+    Hold an exclusive file lock while the snapshot at ``index_path`` is built.
+
+    When several workers start against a missing or stale snapshot, one of
+    them builds it while the others wait here and then attach to the result.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    lock_path = Path(f"{index_path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_sparse(directory: Path, name: str, matrix: sparse.spmatrix) -> Dict[str, Any]:
+    """Save a CSR/CSC matrix as data/indices/indptr arrays; return its metadata."""
+    fmt = "csc" if sparse.isspmatrix_csc(matrix) else "csr"
+    matrix = SPARSE_FORMATS[fmt](matrix)
+    matrix.sort_indices()
+    np.save(directory / f"{name}_data.npy", matrix.data)
+    np.save(directory / f"{name}_indices.npy", matrix.indices)
+    np.save(directory / f"{name}_indptr.npy", matrix.indptr)
+    return {"format": fmt, "shape": list(matrix.shape)}
+
+
+def _load_sparse(directory: Path, name: str, meta: Dict[str, Any]) -> sparse.spmatrix:
+    """Attach to a matrix written by ``_save_sparse`` without copying it."""
+    matrix = SPARSE_FORMATS[meta["format"]](
+        (
+            np.load(directory / f"{name}_data.npy", mmap_mode="r"),
+            np.load(directory / f"{name}_indices.npy", mmap_mode="r"),
+            np.load(directory / f"{name}_indptr.npy", mmap_mode="r"),
+        ),
+        shape=tuple(meta["shape"]),
+    )
+    # Indices were sorted when saved; sorting again would write to read-only memory
+    matrix.has_sorted_indices = True
+    return matrix
+
+
+def write_arrays(
+    directory: Path,
+    arrays: Dict[str, Optional[np.ndarray]],
+    matrices: Dict[str, Optional[sparse.spmatrix]],
+) -> Dict[str, Any]:
+    """
+    Save dense arrays and sparse matrices as ``.npy`` files.
+
+    Args:
+        directory: Target directory
+        arrays: Dense arrays by name; None entries are skipped
+        matrices: Sparse matrices by name, stored in their own CSR/CSC
+            format; None entries are skipped
+
+    Returns:
+        Metadata to pass to ``read_arrays``
+    """
+    array_names = []
+    for name, array in arrays.items():
+        if array is not None:
+            np.save(directory / f"{name}.npy", np.asarray(array))
+            array_names.append(name)
+
+    matrix_meta = {}
+    for name, matrix in matrices.items():
+        if matrix is not None:
+            matrix_meta[name] = _save_sparse(directory, name, matrix)
+
+    return {"arrays": array_names, "matrices": matrix_meta}
+
+
+def read_arrays(directory: Path, meta: Dict[str, Any]):
+    """Memory-map the arrays and matrices written by ``write_arrays``."""
+    arrays = {
+        name: np.load(directory / f"{name}.npy", mmap_mode="r")
+        for name in meta["arrays"]
+    }
+    matrices = {
+        name: _load_sparse(directory, name, matrix_meta)
+        for name, matrix_meta in meta["matrices"].items()
+    }
+    return arrays, matrices
+
+
+def read_manifest(index_path: str) -> Optional[Dict[str, Any]]:
+    """Read the snapshot manifest, or None if there is no valid snapshot."""
+    manifest_path = Path(index_path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_index(
+    index_path: str,
+    fingerprint: str,
+    documents: Union[DocumentStore, List[Dict[str, Any]]],
+    vocabulary: Dict[str, int],
+    arrays: Dict[str, Optional[np.ndarray]],
+    matrices: Dict[str, Optional[sparse.spmatrix]],
+    word_vectors: Optional[Union[KeyedVectors, CompressedWordVectors]] = None,
+    segment_state: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Write an index snapshot.
+
+    The snapshot is written to a temporary directory first and then swapped
+    into place so a concurrently starting process never sees a partial index.
+
+    Args:
+        index_path: Snapshot directory
+        fingerprint: Corpus/config fingerprint the snapshot was built from
+        documents: Document store, or the normalized documents to store
+        vocabulary: Fitted TF-IDF vocabulary (term -> column)
+        arrays: Dense arrays by name; None entries are skipped
+        matrices: Sparse matrices by name, stored in their own CSR/CSC
+            format; None entries are skipped
+        word_vectors: Trained word vectors, if any; compressed vectors are
+            stored as their encoded arrays plus the word list
+        segment_state: Segment state to start the snapshot with; its
+            ``base_created_at`` is set to the new manifest's timestamp
+    """
+    target = Path(index_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.parent / f".{target.name}.tmp-{os.getpid()}"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir()
+
+    num_documents = write_documents(staging, documents)
+
+    terms = [None] * len(vocabulary)
+    for term, column in vocabulary.items():
+        terms[column] = term
+    with open(staging / VOCABULARY_FILE, "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+    compressed_word_vectors = isinstance(word_vectors, CompressedWordVectors)
+    if compressed_word_vectors:
+        with open(staging / WORD_KEYS_FILE, "w", encoding="utf-8") as f:
+            json.dump(word_vectors.index_to_key, f, ensure_ascii=False)
+        arrays = {**arrays, **word_vectors.matrix.arrays(WORD_VECTORS_PREFIX)}
+    elif word_vectors is not None:
+        # Store the vectors as a separate .npy so they can be memory-mapped
+        word_vectors.save(str(staging / WORD_VECTORS_FILE), separately=["vectors"])
+
+    array_meta = write_arrays(staging, arrays, matrices)
+
+    manifest = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "created_at": time.time(),
+        "settings": index_settings(),
+        "num_documents": num_documents,
+        **array_meta,
+        "has_word_vectors": word_vectors is not None,
+        "compressed_word_vectors": compressed_word_vectors,
+    }
+    with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    if segment_state is not None:
+        segment_state = dict(segment_state, base_created_at=manifest["created_at"])
+        with open(staging / SEGMENTS_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump(segment_state, f)
+
+    previous = target.parent / f".{target.name}.old-{os.getpid()}"
+    if target.exists():
+        target.rename(previous)
+    staging.rename(target)
+    if previous.exists():
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_index(index_path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Attach to an index snapshot if it matches the given fingerprint.
+
+    Documents, dense arrays, sparse matrices and word vectors are all
+    memory-mapped read-only; only the vocabulary is read into memory.
+
+    Args:
+        index_path: Snapshot directory
+        fingerprint: Expected corpus/config fingerprint
+
+    Returns:
+        Dictionary with the snapshot contents, or None if missing or stale
+    """
+    manifest = read_manifest(index_path)
+    if not manifest:
+        return None
+    if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+    if manifest.get("fingerprint") != fingerprint:
+        return None
+
+    root = Path(index_path)
+    with open(root / VOCABULARY_FILE, "r", encoding="utf-8") as f:
+        terms = json.load(f)
+    vocabulary = {term: column for column, term in enumerate(terms)}
+
+    arrays, matrices = read_arrays(root, manifest)
+
+    word_vectors = None
+    if manifest.get("compressed_word_vectors"):
+        with open(root / WORD_KEYS_FILE, "r", encoding="utf-8") as f:
+            word_vectors = CompressedWordVectors(json.load(f), load_embeddings(arrays, WORD_VECTORS_PREFIX))
+    elif manifest.get("has_word_vectors"):
+        word_vectors = KeyedVectors.load(str(root / WORD_VECTORS_FILE), mmap="r")
+
+    return {
+        "manifest": manifest,
+        "documents": load_documents(root),
+        "vocabulary": vocabulary,
+        "arrays": arrays,
+        "matrices": matrices,
+        "word_vectors": word_vectors,
+    }
+
+
+def save_segment(
+    index_path: str,
+    name: str,
+    documents: Union[DocumentStore, List[Dict[str, Any]]],
+    arrays: Dict[str, Optional[np.ndarray]],
+    matrices: Dict[str, Optional[sparse.spmatrix]],
+) -> None:
+    """
+    Write a delta segment of ingested documents next to the base snapshot.
+
+    Segments are immutable once written; they only become part of the
+    index when a new segment state listing them is written.
+
+    Args:
+        index_path: Snapshot directory
+        name: Segment name
+        documents: Document store of the segment
+        arrays: Dense arrays by name
+        matrices: Sparse matrices by name
+    """
+    root = Path(index_path) / SEGMENTS_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    staging = root / f".{name}.tmp-{os.getpid()}"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir()
+
+    meta = {"num_documents": write_documents(staging, documents)}
+    meta.update(write_arrays(staging, arrays, matrices))
+    with open(staging / SEGMENT_META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    staging.rename(root / name)
+
+
+def load_segment(index_path: str, name: str) -> Dict[str, Any]:
+    """Attach to a delta segment written by ``save_segment``."""
+    directory = Path(index_path) / SEGMENTS_DIR / name
+    with open(directory / SEGMENT_META_FILE, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays, matrices = read_arrays(directory, meta)
+    return {
+        "documents": load_documents(directory),
+        "arrays": arrays,
+        "matrices": matrices,
+    }
+
+
+def remove_segments(index_path: str, names: List[str]) -> None:
+    """Delete segment directories that are no longer referenced."""
+    for name in names:
+        shutil.rmtree(Path(index_path) / SEGMENTS_DIR / name, ignore_errors=True)
+
+
+def read_segment_state(index_path: str) -> Optional[Dict[str, Any]]:
+    """Read the segment state, or None if nothing was ingested into the snapshot."""
+    state_path = Path(index_path) / SEGMENTS_STATE_FILE
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_segment_state(index_path: str, state: Dict[str, Any]) -> None:
+    """Atomically replace the segment state."""
+    state_path = Path(index_path) / SEGMENTS_STATE_FILE
+    staging = state_path.with_name(f".{state_path.name}.tmp-{os.getpid()}")
+    with open(staging, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(staging, state_path)
+
+
+def segment_state_mtime(index_path: str) -> Optional[int]:
+    """Modification time of the segment state, used to poll for changes."""
+    try:
+        return os.stat(Path(index_path) / SEGMENTS_STATE_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def journal_path(index_path: str) -> Path:
+    """Ingestion journal of an index; it lives next to the snapshot so rebuilds keep it."""
+    return Path(f"{index_path}.journal.jsonl")
+
+
+def append_journal(index_path: str, entries: List[Dict[str, Any]]) -> None:
+    """
+    Append ingestion changes to the journal.
+
+    Args:
+        index_path: Snapshot directory
+        entries: ``{"upsert": document}`` or ``{"delete": id}`` per change, in order
+    """
+    path = journal_path(index_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+
+
+def read_journal(index_path: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Fold the journal into its net effect.
+
+    Returns:
+        Tuple of (last version of every upserted document that is still
+        live, ids deleted last); a torn last line is skipped
+    """
+    documents: Dict[str, Dict[str, Any]] = {}
+    deleted: Dict[str, None] = {}
+    try:
+        with open(journal_path(index_path), "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return [], []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "upsert" in entry:
+            doc = entry["upsert"]
+            deleted.pop(doc["id"], None)
+            documents.pop(doc["id"], None)
+            documents[doc["id"]] = doc
+        elif "delete" in entry:
+            documents.pop(entry["delete"], None)
+            deleted[entry["delete"]] = None
+    return list(documents.values()), list(deleted)
+
+
+def write_journal(index_path: str, documents: List[Dict[str, Any]], deleted: List[str]) -> None:
+    """Atomically replace the journal with its folded form (see ``read_journal``)."""
+    path = journal_path(index_path)
+    staging = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    with open(staging, "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps({"upsert": doc}, ensure_ascii=False) + "\n")
+        for doc_id in deleted:
+            f.write(json.dumps({"delete": doc_id}, ensure_ascii=False) + "\n")
+    os.replace(staging, path)
@@ -0,0 +1,221 @@
+"""In-process service metrics rendered in the Prometheus text format."""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.tracing import LATENCY_BUCKETS, LatencyHistogram, StageTimings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bucket bounds for per-search candidate and result counts
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Current resident set size of this process, or the peak if only that is known."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    """Render a label set as ``{key="value",...}``."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_number(value: float) -> str:
+    """Render a sample value."""
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _render_histogram(name: str, histogram: LatencyHistogram, labels: Dict[str, str]) -> List[str]:
+    """Render one histogram's cumulative buckets, sum and count."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=_format_number(bound))} {cumulative}")
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f"{name}_sum{_labels(**labels)} {_format_number(histogram.sum)}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+class ServiceMetrics:
+    """
+    Counters and histograms of the API process.
+
+    Searches report their stage timings and candidate counts back with
+    their results, so these metrics cover every executor worker, whether
+    the pool runs threads or processes. Recording a request or a search
+    is a few integer updates under one short lock; histograms and label
+    sets are created once per endpoint, never per observation.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.request_latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.stage_timings = StageTimings()
+        self.searches = 0
+        self.cache_hits = 0
+        self.candidates = LatencyHistogram(COUNT_BUCKETS)
+        self.results = LatencyHistogram(COUNT_BUCKETS)
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, endpoint: str, status: int, seconds: float) -> None:
+        """Record one finished HTTP request."""
+        with self._lock:
+            key = (method, endpoint, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.request_latency.get((method, endpoint))
+            if histogram is None:
+                histogram = self.request_latency[(method, endpoint)] = LatencyHistogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def observe_search(self, result: Dict[str, Any]) -> None:
+        """Record one search from the result dictionary returned by the engine."""
+        spans = result.get("stage_timings") or {}
+        # execution_time is rounded to 0.1 ms; the spans keep full resolution
+        self.stage_timings.record(spans, sum(spans.values()) or result.get("execution_time", 0.0))
+        with self._lock:
+            self.searches += 1
+            if result.get("cached"):
+                self.cache_hits += 1
+            else:
+                self.candidates.observe(result.get("candidates", 0))
+            self.results.observe(result.get("total_results", 0))
+
+    def observe_searches(self, results: Iterable[Dict[str, Any]]) -> None:
+        """Record every search of a batch."""
+        for result in results:
+            self.observe_search(result)
+
+    def render(self, index_stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            index_stats: Index gauges (``SearchEngine.index_stats``), if available
+        """
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("search_http_requests_total", "counter", "HTTP requests by endpoint and status.")
+            for (method, endpoint, status), count in sorted(self.requests.items()):
+                labels = _labels(method=method, endpoint=endpoint, status=status)
+                lines.append(f"search_http_requests_total{labels} {count}")
+
+            header("search_http_request_duration_seconds", "histogram", "HTTP request latency by endpoint.")
+            for (method, endpoint), histogram in sorted(self.request_latency.items()):
+                lines.extend(_render_histogram(
+                    "search_http_request_duration_seconds", histogram, {"method": method, "endpoint": endpoint}
+                ))
+
+            header("search_queries_total", "counter", "Search queries executed, batch queries included.")
+            lines.append(f"search_queries_total {self.searches}")
+            header("search_cache_hits_total", "counter", "Search queries answered from the result cache.")
+            lines.append(f"search_cache_hits_total {self.cache_hits}")
+
+            header("search_candidates", "histogram", "Fused lexical and semantic candidates scored per uncached query.")
+            lines.extend(_render_histogram("search_candidates", self.candidates, {}))
+            header("search_results", "histogram", "Results returned per query.")
+            lines.extend(_render_histogram("search_results", self.results, {}))
+
+        with self.stage_timings.lock:
+            header("search_query_duration_seconds", "histogram", "Search latency inside the engine.")
+            lines.extend(_render_histogram("search_query_duration_seconds", self.stage_timings.total, {}))
+            header("search_stage_duration_seconds", "histogram", "Search latency per pipeline stage.")
+            for stage, histogram in self.stage_timings.histograms.items():
+                lines.extend(_render_histogram("search_stage_duration_seconds", histogram, {"stage": stage}))
+
+        if index_stats:
+            gauges = (
+                ("search_index_documents", "documents", "Live (searchable) documents in the index."),
+                ("search_index_deleted_documents", "deleted_documents", "Deleted documents not merged away yet."),
+                ("search_index_segments", "segments", "Index segments (base plus deltas)."),
+                ("search_index_vocabulary_terms", "vocabulary_terms", "Terms in the TF-IDF vocabulary."),
+                ("search_index_embedding_terms", "embedding_terms", "Words with a Word2Vec vector."),
+                ("search_index_embedding_bytes", "embedding_bytes", "Memory of the (encoded) document embeddings."),
+                ("search_index_document_bytes", "document_bytes", "Size of the columnar document store."),
+                ("search_result_cache_entries", "cache_entries", "Entries in the result cache of the answering worker."),
+            )
+            for name, key, help_text in gauges:
+                if index_stats.get(key) is not None:
+                    header(name, "gauge", help_text)
+                    lines.append(f"{name} {_format_number(index_stats[key])}")
+
+        rss = resident_memory_bytes()
+        if rss is not None:
+            header("process_resident_memory_bytes", "gauge", "Resident memory of the API process.")
+            lines.append(f"process_resident_memory_bytes {rss}")
+        header("process_start_time_seconds", "gauge", "Start time of the API process since the Unix epoch.")
+        lines.append(f"process_start_time_seconds {_format_number(self.started_at)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts requests and their latency per endpoint.
+
+    Endpoints are labeled by their route template (``/api/documents/{doc_id}``),
+    so the number of label sets stays bounded.
+    """
+
+    def __init__(self, app, metrics: "ServiceMetrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            self.metrics.observe_request(scope["method"], endpoint, status, time.perf_counter() - start_time)
+
+
+# Global metrics instance
+service_metrics = ServiceMetrics()
@@ -0,0 +1,18 @@
+"""Strings packed into one UTF-8 byte buffer with offsets, for arrays that are persisted and memory-mapped."""
+
+from typing import Iterable, Tuple
+
+import numpy as np
+
+
+def pack_strings(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate UTF-8 strings into one byte buffer; return it with the start offset of every string (plus the end)."""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(), offsets
+
+
+def unpack_string(buffer: np.ndarray, offsets: np.ndarray, index: int) -> str:
+    """Decode string ``index`` of a buffer written by ``pack_strings``."""
+    return buffer[offsets.item(index):offsets.item(index + 1)].tobytes().decode("utf-8")
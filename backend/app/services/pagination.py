@@ -0,0 +1,78 @@
+"""Ranked result sets kept between result pages, and the cursors that address them."""
+
+import base64
+import binascii
+import hashlib
+from typing import Dict, Hashable, NamedTuple, Optional
+
+import numpy as np
+
+
+class ResultSet(NamedTuple):
+    """
+    Every match of a query ranked so far, kept so later pages are slices.
+
+    Hybrid result sets also keep the candidate union and its exact Word2Vec
+    similarities, so extending them to a deeper page only rescores the
+    candidates the deeper retrieval adds.
+    """
+
+    doc_ids: np.ndarray  # Ranked matches, best first
+    scores: np.ndarray
+    facets: Dict[str, int]  # Matches per category
+    candidates: int  # Candidates scored to rank them
+    complete: bool  # Retrieving deeper cannot add matches
+    scale: int = 1  # Hybrid: multiple of the requested depths retrieved
+    union: Optional[np.ndarray] = None  # Hybrid: candidate union
+    union_semantic_scores: Optional[np.ndarray] = None  # Linear hybrid: Word2Vec similarity of the union
+
+    def covers(self, end: int) -> bool:
+        """Whether the first ``end`` matches are known (or there are no more)."""
+        return self.complete or len(self.doc_ids) >= end
+
+
+def keep_served(result_set: ResultSet, previous: Optional[ResultSet], offset: int) -> ResultSet:
+    """
+    Put the first ``offset`` matches of ``previous`` back at the head of its deeper replacement.
+
+    Deeper candidate lists can lift documents above ones already served on
+    earlier pages. Keeping the served prefix in place means paging through
+    a query never repeats or skips a document.
+    """
+    if previous is None or offset == 0:
+        return result_set
+    served = previous.doc_ids[:offset]
+    rest = ~np.isin(result_set.doc_ids, served)
+    return result_set._replace(
+        doc_ids=np.concatenate((served, result_set.doc_ids[rest])),
+        scores=np.concatenate((previous.scores[:offset], result_set.scores[rest]))
+    )
+
+
+def result_set_id(key: Hashable) -> str:
+    """Short stable digest of a result set key (the same in every worker)."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(key: Hashable, offset: int) -> str:
+    """Opaque cursor of the page starting at ``offset`` of a result set."""
+    token = f"{offset}:{result_set_id(key)}".encode("ascii")
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key: Hashable) -> int:
+    """
+    Return the offset a cursor points to.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another query
+    """
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        offset, digest = token.split(":")
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Malformed cursor") from None
+    if digest != result_set_id(key) or offset < 0:
+        raise ValueError("Cursor does not belong to this query and its options")
+    return offset
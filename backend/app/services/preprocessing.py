@@ -0,0 +1,345 @@
+"""
+Text normalization of documents and queries.
+
+"basic" lowercases and strips punctuation. "advanced" ports the cleaning
+pipeline of the exploration notebook: acronym normalization, contraction
+expansion, stop-word removal and spaCy lemmatization that keeps proper
+nouns. Documents go through spaCy in batches (``nlp.pipe``, several
+processes, only the tagging and lemmatizing components loaded) with the
+results cached on disk by content hash. Queries are too short and too
+latency-sensitive for spaCy: they use the same rules plus a lemma table
+learned from the corpus, so both sides agree on every word the corpus
+contains.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+try:
+    import spacy
+except ImportError:  # Optional: without spaCy, "advanced" skips lemmatization
+    spacy = None
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the rules below change; cached texts of other versions are ignored
+PIPELINE_VERSION = 1
+
+# The same list as the TF-IDF vectorizer, on both the document and the query side
+STOP_WORDS = ENGLISH_STOP_WORDS
+
+# spaCy components the pipeline never reads (only tags and lemmas are used)
+UNUSED_COMPONENTS = ("parser", "ner", "senter", "textcat", "entity_ruler", "entity_linker")
+
+# Below this many texts per worker, extra processes cost more than they save
+MIN_TEXTS_PER_WORKER = 1000
+
+# Texts looked up in the cache per statement
+CACHE_CHUNK = 500
+
+CONTRACTIONS = {
+    "can't": "cannot",
+    "won't": "will not",
+    "don't": "do not",
+    "it's": "it is",
+    "i'm": "i am",
+    "they're": "they are",
+    "we're": "we are",
+    "isn't": "is not",
+    "aren't": "are not",
+    "wasn't": "was not",
+    "weren't": "were not",
+    "let's": "let us",
+}
+
+# Endings of the contractions not listed above
+CONTRACTION_SUFFIXES = {"n't": " not", "'re": " are", "'ve": " have", "'ll": " will", "'m": " am", "'d": " would"}
+
+_ACRONYM = re.compile(r"\b(?:[A-Z]\.){2,}")
+_SPACED_ACRONYM = re.compile(r"\b([A-Z])\s+([A-Z])\b")
+_CONTRACTION = re.compile(r"\b(" + "|".join(re.escape(word) for word in CONTRACTIONS) + r")(?![\w'])", re.IGNORECASE)
+_CONTRACTION_SUFFIX = re.compile(r"(?<=[a-z])(n't|'re|'ve|'ll|'m|'d)\b", re.IGNORECASE)
+_POSSESSIVE = re.compile(r"(?<=\w)'s\b", re.IGNORECASE)
+_TOKEN = re.compile(r"[A-Za-z0-9]+")
+_NON_WORD = re.compile(r"[^a-z0-9]")
+
+
+def normalize_text(text: str) -> str:
+    """Basic normalization: lowercase, drop everything but letters, digits and spaces."""
+    text = re.sub(r"[^a-z0-9\s]", "", text.lower())
+    return " ".join(text.split())
+
+
+def apply_rules(text: str) -> str:
+    """
+    Rewrite acronyms, contractions and possessives before tokenizing.
+
+    "U.S." and "U S" become "US", "can't" becomes "cannot", "they've"
+    becomes "they have", and possessive "'s" is dropped.
+    """
+    text = text.replace("’", "'")
+    text = _ACRONYM.sub(lambda match: match.group(0).replace(".", ""), text)
+    text = _SPACED_ACRONYM.sub(r"\1\2", text)
+    text = _CONTRACTION.sub(lambda match: CONTRACTIONS[match.group(0).lower()], text)
+    text = _CONTRACTION_SUFFIX.sub(lambda match: CONTRACTION_SUFFIXES[match.group(0).lower()], text)
+    return _POSSESSIVE.sub("", text)
+
+
+def token_key(token: str) -> str:
+    """Lemma table key of a token: acronyms keep their case ("US" is not "us"), other words are lowercased."""
+    token = re.sub(r"[^A-Za-z0-9]", "", token)
+    return token if len(token) > 1 and token.isupper() else token.lower()
+
+
+def content_word(token: str) -> str:
+    """Lowercased token; empty for stop words and numbers."""
+    word = _NON_WORD.sub("", token.lower())
+    return "" if not word or word in STOP_WORDS or word.isdigit() else word
+
+
+def default_word(token: str) -> str:
+    """
+    Normalized word of a token without a lemma.
+
+    Acronyms are taken for proper nouns and kept even when they spell a
+    stop word ("US"); other stop words and numbers are dropped.
+    """
+    if len(token) > 1 and token.isupper() and token.isalpha():
+        return token.lower()
+    return content_word(token)
+
+
+class PreprocessCache:
+    """
+    Processed texts by content hash, in a SQLite file.
+
+    Each entry also keeps the words the pipeline normalized differently
+    from the rules alone, so the lemma table can be rebuilt from cached
+    texts without running spaCy again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, text TEXT, changes TEXT)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection that commits on success and is always closed."""
+        # Several workers may ingest at once; wait for the writer instead of failing
+        connection = sqlite3.connect(self.path, timeout=30.0)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[str, List[List[str]]]]:
+        """Cached (text, changes) of the given keys that are present."""
+        found = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), CACHE_CHUNK):
+                chunk = keys[start:start + CACHE_CHUNK]
+                rows = connection.execute(
+                    f"SELECT key, text, changes FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                for key, text, changes in rows:
+                    found[key] = (text, json.loads(changes))
+        return found
+
+    def put_many(self, entries: Dict[str, Tuple[str, List[List[str]]]]) -> None:
+        """Store processed texts."""
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                ((key, text, json.dumps(changes)) for key, (text, changes) in entries.items())
+            )
+
+    def retain(self, keys: Iterable[str]) -> int:
+        """Delete every entry but the given keys; return the number deleted."""
+        with self._connect() as connection:
+            connection.execute("CREATE TEMP TABLE live (key TEXT PRIMARY KEY)")
+            connection.executemany("INSERT OR IGNORE INTO live VALUES (?)", ((key,) for key in keys))
+            deleted = connection.execute("DELETE FROM entries WHERE key NOT IN (SELECT key FROM live)").rowcount
+            connection.execute("DROP TABLE live")
+        return deleted
+
+
+class TextPreprocessor:
+    """
+    Normalizes document texts in batches and queries one at a time.
+
+    In "advanced" mode, document texts are lemmatized by spaCy when it and
+    the model are installed; words spaCy normalizes differently from the
+    plain rules (lemmas, and names spelled like stop words) are collected
+    into a lemma table for queries.
+    """
+
+    def __init__(
+        self,
+        mode: str = "basic",
+        spacy_model: str = "en_core_web_sm",
+        cache_path: Optional[str] = None,
+        batch_size: int = 256,
+        workers: int = 0,
+        lemmas: Optional[Dict[str, str]] = None
+    ):
+        """
+        Args:
+            mode: "basic" or "advanced"
+            spacy_model: spaCy pipeline used for lemmatization
+            cache_path: SQLite file of processed texts (no cache if empty)
+            batch_size: Texts per ``nlp.pipe`` batch
+            workers: spaCy processes; 0 uses one per CPU
+            lemmas: Lemma table by ``token_key`` (see ``arrays``)
+        """
+        self.mode = mode
+        self.spacy_model = spacy_model
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.lemmas: Dict[str, str] = lemmas or {}
+        self._nlp = None
+        self._nlp_loaded = False
+
+    def arrays(self, prefix: str = "preprocess_") -> Dict[str, np.ndarray]:
+        """Arrays to persist the lemma table with (see ``load_arrays``)."""
+        if not self.lemmas:
+            return {}
+        keys = sorted(self.lemmas)
+        return {
+            f"{prefix}lemma_keys": np.array([key.encode("ascii") for key in keys], dtype="S"),
+            f"{prefix}lemma_words": np.array([self.lemmas[key].encode("ascii") for key in keys], dtype="S"),
+        }
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray], prefix: str = "preprocess_") -> None:
+        """Restore the lemma table of a snapshot."""
+        keys = arrays.get(f"{prefix}lemma_keys")
+        words = arrays.get(f"{prefix}lemma_words")
+        self.lemmas = {} if keys is None else {
+            key.decode("ascii"): word.decode("ascii") for key, word in zip(keys.tolist(), words.tolist())
+        }
+
+    @property
+    def nlp(self):
+        """The spaCy pipeline, loaded on first use; None if spaCy or the model is missing."""
+        if not self._nlp_loaded:
+            self._nlp_loaded = True
+            if spacy is None:
+                logger.warning("⚠ spaCy is not installed; advanced preprocessing skips lemmatization")
+            else:
+                try:
+                    self._nlp = spacy.load(self.spacy_model, exclude=list(UNUSED_COMPONENTS))
+                    logger.info(f"✓ spaCy pipeline loaded: {self.spacy_model} {self._nlp.pipe_names}")
+                except OSError as e:
+                    logger.warning(f"⚠ spaCy model {self.spacy_model} unavailable ({e}); skipping lemmatization")
+        return self._nlp
+
+    def normalize_query(self, text: str) -> str:
+        """Normalize a query (or any text without spaCy) consistently with the documents."""
+        if self.mode == "basic":
+            return normalize_text(text)
+        words = []
+        for token in _TOKEN.findall(apply_rules(text)):
+            word = self.lemmas.get(token_key(token))
+            if word is None:
+                word = default_word(token)
+            if word:
+                words.append(word)
+        return " ".join(words)
+
+    def process(self, texts: List[str], prune: bool = False) -> List[str]:
+        """
+        Normalize document texts.
+
+        Args:
+            texts: Raw texts
+            prune: The texts are the whole corpus: rebuild the lemma table
+                from them and drop cache entries of texts no longer in it
+
+        Returns:
+            Normalized texts, aligned with ``texts``
+        """
+        if self.mode == "basic":
+            return [normalize_text(text) for text in texts]
+        if self.nlp is None:
+            self.lemmas = {}
+            return [self.normalize_query(text) for text in texts]
+
+        signature = f"{PIPELINE_VERSION}:{self.spacy_model}:{self.nlp.meta.get('version')}:{spacy.__version__}\0"
+        keys = [hashlib.blake2b((signature + text).encode("utf-8"), digest_size=16).hexdigest() for text in texts]
+        cache = PreprocessCache(self.cache_path) if self.cache_path else None
+        results = cache.get_many(sorted(set(keys))) if cache is not None else {}
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in results}
+        if missing:
+            fresh = dict(zip(missing, self._lemmatize(list(missing.values()))))
+            if cache is not None:
+                cache.put_many(fresh)
+            results.update(fresh)
+        logger.info(
+            f"✓ Preprocessed {len(texts)} texts",
+            extra={"fields": {"cached": len(set(keys)) - len(missing), "processed": len(missing)}}
+        )
+
+        if prune:
+            self.lemmas = self._lemma_table(texts, (results[key][1] for key in keys))
+            if cache is not None:
+                cache.retain(keys)
+        return [results[key][0] for key in keys]
+
+    def _lemmatize(self, texts: List[str]) -> List[Tuple[str, List[List[str]]]]:
+        """Run the rules and spaCy over texts; return every text with its words that differ from the rules."""
+        workers = max(1, min(self.workers, len(texts) // MIN_TEXTS_PER_WORKER))
+        docs = self.nlp.pipe((apply_rules(text) for text in texts), batch_size=self.batch_size, n_process=workers)
+        processed = []
+        for doc in docs:
+            words, changes = [], []
+            for token in doc:
+                key = token_key(token.text)
+                if not key:
+                    continue
+                if token.pos_ == "PROPN":
+                    # Names stay as written, even when they look like stop words ("US")
+                    word = _NON_WORD.sub("", token.text.lower())
+                elif content_word(token.text):
+                    word = _NON_WORD.sub("", token.lemma_.lower())
+                else:
+                    word = ""
+                if word != default_word(token.text):
+                    changes.append([key, word])
+                if word:
+                    words.append(word)
+            processed.append((" ".join(words), changes))
+        return processed
+
+    @staticmethod
+    def _lemma_table(texts: List[str], changes: Iterable[List[List[str]]]) -> Dict[str, str]:
+        """Keep the normalization spaCy chose for a token in most of its occurrences."""
+        chosen: Dict[str, Counter] = defaultdict(Counter)
+        for document_changes in changes:
+            for key, word in document_changes:
+                chosen[key][word] += 1
+        occurrences = Counter(
+            key for text in texts for key in map(token_key, _TOKEN.findall(apply_rules(text))) if key in chosen
+        )
+        table = {}
+        for key, words in chosen.items():
+            word, count = words.most_common(1)[0]
+            if 2 * count > occurrences[key]:
+                table[key] = word
+        return table
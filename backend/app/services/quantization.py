@@ -0,0 +1,463 @@
+"""Compressed storage of embedding matrices: float16, int8 scalar and product quantization."""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Rows decoded or scored at once by full scans (bounds temporary memory)
+CHUNK_ROWS = 65536
+
+# Vectors used to train product-quantization codebooks
+PQ_TRAINING_SAMPLE = 32768
+
+# Centroids per product-quantization sub-space (codes are one byte)
+PQ_CENTROIDS = 256
+
+
+class EmbeddingMatrix:
+    """
+    Read-only matrix of float32 embeddings.
+
+    Subclasses keep the rows in a compact encoding and score queries on
+    the codes directly; ``decode`` and row indexing only reconstruct the
+    (approximate) float32 rows that are asked for.
+    """
+
+    kind = "float32"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.vectors.shape
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the encoded rows and their parameters."""
+        return int(self.vectors.nbytes)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """Decode the given rows (an index array) as float32."""
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def decode(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Decode a contiguous range of rows as float32."""
+        return np.asarray(self.vectors[start:end], dtype=np.float32)
+
+    def dot(self, query_matrix: np.ndarray, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        Inner products of a row range with every query.
+
+        Args:
+            query_matrix: Q x dim float32 queries
+            start: First row
+            end: End of the row range (all rows if None)
+
+        Returns:
+            float32 scores of shape (rows, Q)
+        """
+        end = len(self) if end is None else end
+        if end - start <= CHUNK_ROWS:
+            return self._dot_range(query_matrix, start, end)
+        parts = [
+            self._dot_range(query_matrix, chunk_start, min(end, chunk_start + CHUNK_ROWS))
+            for chunk_start in range(start, end, CHUNK_ROWS)
+        ]
+        if not parts:
+            return np.empty((0, len(query_matrix)), dtype=np.float32)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _dot_range(self, query_matrix: np.ndarray, start: int, end: int) -> np.ndarray:
+        return self.decode(start, end) @ query_matrix.T
+
+    def dot_rows(self, query_matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Inner products of the given rows (an index array) with every query, shape (rows, Q)."""
+        return self[rows] @ query_matrix.T
+
+    def left_multiply(self, matrix: sparse.spmatrix) -> np.ndarray:
+        """Return ``matrix @ rows`` (e.g. word counts times word vectors) without decoding everything at once."""
+        matrix = sparse.csc_matrix(matrix)
+        result = np.zeros((matrix.shape[0], self.shape[1]), dtype=np.float32)
+        for start in range(0, len(self), CHUNK_ROWS):
+            end = min(len(self), start + CHUNK_ROWS)
+            block = matrix[:, start:end]
+            if block.nnz:
+                result += np.asarray(block @ self.decode(start, end), dtype=np.float32)
+        return result
+
+    def take(self, rows: np.ndarray) -> "EmbeddingMatrix":
+        """Return a matrix of the given rows in the same encoding."""
+        return type(self)(np.asarray(self.vectors[rows]))
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Arrays to persist the matrix with (see ``load_embeddings``)."""
+        return {f"{prefix}vectors": self.vectors}
+
+
+class Float16Embeddings(EmbeddingMatrix):
+    """Rows stored as float16: half the memory, about three significant digits."""
+
+    kind = "float16"
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray) -> "Float16Embeddings":
+        return cls(np.asarray(vectors, dtype=np.float16))
+
+
+def _center(vectors: np.ndarray) -> np.ndarray:
+    """Mean of the rows, computed in chunks."""
+    total = np.zeros(vectors.shape[1], dtype=np.float64)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        total += np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float64).sum(axis=0)
+    return (total / max(1, len(vectors))).astype(np.float32)
+
+
+class Int8Embeddings(EmbeddingMatrix):
+    """
+    Scalar quantization with one scale per row.
+
+    Rows are encoded relative to the mean row (``center``): averaged word
+    vectors share a large common component, and quantizing only what
+    differs between documents keeps the step size small. Every row is
+    stored as int8 codes and a float32 scale (the largest absolute
+    residual / 127); a row costs ``dim + 4`` bytes. Scores are computed on
+    the codes, multiplied by the row scales, and shifted by the query's
+    inner product with the center.
+    """
+
+    kind = "int8"
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, center: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+        self.center = center
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray) -> "Int8Embeddings":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        center = _center(vectors)
+        residuals = vectors - center
+        scales = np.abs(residuals).max(axis=1) / 127.0
+        safe = np.where(scales > 0, scales, 1.0)[:, np.newaxis]
+        codes = np.clip(np.rint(residuals / safe), -127, 127).astype(np.int8)
+        return cls(codes, scales.astype(np.float32), center)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scales.nbytes + self.center.nbytes)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        return self.codes[rows].astype(np.float32) * self.scales[rows][..., np.newaxis] + self.center
+
+    def decode(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        return self.codes[start:end].astype(np.float32) * self.scales[start:end, np.newaxis] + self.center
+
+    def _dot_range(self, query_matrix: np.ndarray, start: int, end: int) -> np.ndarray:
+        scores = self.codes[start:end].astype(np.float32) @ query_matrix.T
+        scores *= self.scales[start:end, np.newaxis]
+        scores += query_matrix @ self.center
+        return scores
+
+    def dot_rows(self, query_matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scores = self.codes[rows].astype(np.float32) @ query_matrix.T
+        scores *= self.scales[rows, np.newaxis]
+        scores += query_matrix @ self.center
+        return scores
+
+    def take(self, rows: np.ndarray) -> "Int8Embeddings":
+        return Int8Embeddings(np.asarray(self.codes[rows]), np.asarray(self.scales[rows]), self.center)
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}codes": self.codes, f"{prefix}scales": self.scales, f"{prefix}center": self.center}
+
+
+def _kmeans(vectors: np.ndarray, num_clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means; returns float32 centroids (empty clusters keep their centroid)."""
+    num_clusters = min(num_clusters, len(vectors))
+    centroids = np.array(vectors[rng.choice(len(vectors), num_clusters, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        # argmin ||x - c||^2 == argmax (x . c - ||c||^2 / 2)
+        labels = (vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1)).argmax(axis=1)
+        counts = np.bincount(labels, minlength=num_clusters)
+        membership = sparse.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (labels, np.arange(len(vectors)))),
+            shape=(num_clusters, len(vectors))
+        )
+        sums = np.asarray(membership @ vectors, dtype=np.float32)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+    return centroids
+
+
+class ProductQuantizedEmbeddings(EmbeddingMatrix):
+    """
+    Product quantization with asymmetric distance computation (ADC).
+
+    Vectors are split into ``m`` sub-vectors, and each sub-vector is
+    replaced by the id of its nearest of 256 k-means centroids trained for
+    that sub-space, so a row costs ``m`` bytes. As with int8, rows are
+    encoded relative to the mean row. A query is never quantized: its
+    inner products with all centroids of every sub-space are tabulated
+    once (``m x 256``), and a row's score is the sum of ``m`` table
+    lookups plus the query's inner product with the center.
+    """
+
+    kind = "pq"
+
+    def __init__(self, codes: np.ndarray, codebooks: np.ndarray, center: np.ndarray):
+        """
+        Args:
+            codes: uint8 centroid ids of shape (n, m)
+            codebooks: float32 centroids of shape (m, 256, dim / m)
+            center: Mean row the residuals are taken from
+        """
+        self.codes = codes
+        self.codebooks = codebooks
+        self.center = center
+
+    @classmethod
+    def encode(
+        cls,
+        vectors: np.ndarray,
+        num_subvectors: int,
+        iterations: int = 10,
+        seed: int = 0
+    ) -> "ProductQuantizedEmbeddings":
+        """
+        Train the codebooks on a sample and encode every row.
+
+        Raises:
+            ValueError: If ``num_subvectors`` does not divide the vector size
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dimension = vectors.shape[1]
+        if num_subvectors <= 0 or dimension % num_subvectors:
+            raise ValueError(f"PQ_SUBVECTORS={num_subvectors} must divide the vector size {dimension}")
+        width = dimension // num_subvectors
+        rng = np.random.default_rng(seed)
+        center = _center(vectors)
+        sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), PQ_TRAINING_SAMPLE), replace=False))]
+        sample = sample - center
+
+        codebooks = np.zeros((num_subvectors, PQ_CENTROIDS, width), dtype=np.float32)
+        for sub in range(num_subvectors):
+            centroids = _kmeans(sample[:, sub * width:(sub + 1) * width], PQ_CENTROIDS, iterations, rng)
+            codebooks[sub, :len(centroids)] = centroids
+            # Unused slots (tiny corpora) repeat the first centroid and are never chosen
+            codebooks[sub, len(centroids):] = centroids[0]
+
+        codes = np.empty((len(vectors), num_subvectors), dtype=np.uint8)
+        half_norms = 0.5 * (codebooks ** 2).sum(axis=2)
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            block = vectors[start:start + CHUNK_ROWS] - center
+            for sub in range(num_subvectors):
+                similarity = block[:, sub * width:(sub + 1) * width] @ codebooks[sub].T - half_norms[sub]
+                codes[start:start + len(block), sub] = similarity.argmax(axis=1)
+        return cls(codes, codebooks, center)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.codes.shape[0], self.codebooks.shape[0] * self.codebooks.shape[2])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.codebooks.nbytes + self.center.nbytes)
+
+    def _reconstruct(self, codes: np.ndarray) -> np.ndarray:
+        subvectors = self.codebooks[np.arange(self.codebooks.shape[0]), codes]
+        return subvectors.reshape(len(codes), -1) + self.center
+
+    def __getitem__(self, rows) -> np.ndarray:
+        return self._reconstruct(np.asarray(self.codes[rows]))
+
+    def decode(self, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        return self._reconstruct(np.asarray(self.codes[start:end]))
+
+    def _adc(self, query_matrix: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Score encoded rows against every query with per-query distance tables."""
+        num_subvectors, num_centroids, width = self.codebooks.shape
+        # Offsets into the flattened (m x 256) table: one gather per query scores every row
+        table_positions = codes.astype(np.intp) + np.arange(num_subvectors) * num_centroids
+        scores = np.empty((len(codes), len(query_matrix)), dtype=np.float32)
+        for column, query in enumerate(query_matrix):
+            # ADC table: query sub-vector . every centroid of its sub-space
+            table = np.einsum("mkw,mw->mk", self.codebooks, query.reshape(num_subvectors, width))
+            scores[:, column] = table.ravel()[table_positions].sum(axis=1)
+        scores += query_matrix @ self.center
+        return scores
+
+    def _dot_range(self, query_matrix: np.ndarray, start: int, end: int) -> np.ndarray:
+        return self._adc(query_matrix, np.asarray(self.codes[start:end]))
+
+    def dot_rows(self, query_matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return self._adc(query_matrix, self.codes[rows])
+
+    def take(self, rows: np.ndarray) -> "ProductQuantizedEmbeddings":
+        return ProductQuantizedEmbeddings(np.asarray(self.codes[rows]), self.codebooks, self.center)
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}codes": self.codes, f"{prefix}codebooks": self.codebooks, f"{prefix}center": self.center}
+
+
+def encode_embeddings(vectors: np.ndarray, kind: str, num_subvectors: int = 50) -> EmbeddingMatrix:
+    """
+    Encode float32 embeddings in the given storage.
+
+    Args:
+        vectors: float32 embeddings
+        kind: "float32", "float16", "int8" or "pq"
+        num_subvectors: PQ sub-vectors (bytes per row)
+    """
+    if kind == "float16":
+        return Float16Embeddings.encode(vectors)
+    if kind == "int8":
+        return Int8Embeddings.encode(vectors)
+    if kind == "pq":
+        return ProductQuantizedEmbeddings.encode(vectors, num_subvectors)
+    return EmbeddingMatrix(np.asarray(vectors, dtype=np.float32))
+
+
+def load_embeddings(arrays: Dict[str, np.ndarray], prefix: str) -> Optional[EmbeddingMatrix]:
+    """Attach to a matrix persisted with ``EmbeddingMatrix.arrays``; None if absent."""
+    # Plain ndarray views of memory-mapped files: slicing an np.memmap costs several times more
+    arrays = {key: np.asarray(value) for key, value in arrays.items() if key.startswith(prefix)}
+    if f"{prefix}codebooks" in arrays:
+        return ProductQuantizedEmbeddings(
+            arrays[f"{prefix}codes"], arrays[f"{prefix}codebooks"], arrays[f"{prefix}center"]
+        )
+    if f"{prefix}scales" in arrays:
+        return Int8Embeddings(arrays[f"{prefix}codes"], arrays[f"{prefix}scales"], arrays[f"{prefix}center"])
+    vectors = arrays.get(f"{prefix}vectors")
+    if vectors is None:
+        return None
+    if vectors.dtype == np.float16:
+        return Float16Embeddings(vectors)
+    return EmbeddingMatrix(vectors)
+
+
+def as_embedding_matrix(vectors) -> Optional[EmbeddingMatrix]:
+    """Wrap a plain float32 array; matrices and None pass through."""
+    if vectors is None or isinstance(vectors, EmbeddingMatrix):
+        return vectors
+    return EmbeddingMatrix(vectors)
+
+
+def _merge_top_k(
+    best: Optional[Tuple[np.ndarray, np.ndarray]],
+    scores: np.ndarray,
+    offset: int,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fold a (rows x Q) block of scores into the running per-column top k (values, row ids)."""
+    k_block = min(k, len(scores))
+    rows = np.argpartition(-scores, k_block - 1, axis=0)[:k_block]
+    values = np.take_along_axis(scores, rows, axis=0)
+    rows = rows + offset
+    if best is not None:
+        values = np.concatenate((best[0], values))
+        rows = np.concatenate((best[1], rows))
+    if len(values) > k:
+        keep = np.argpartition(-values, k - 1, axis=0)[:k]
+        values = np.take_along_axis(values, keep, axis=0)
+        rows = np.take_along_axis(rows, keep, axis=0)
+    return values, rows
+
+
+def agreement_report(
+    exact: np.ndarray,
+    encoded: EmbeddingMatrix,
+    k: int = 10,
+    num_queries: int = 100,
+    rerank: int = 0,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Compare an encoding with the exact float32 embeddings.
+
+    Queries are randomly chosen rows of ``exact``. Reports the memory of
+    both, the overlap of the top k by encoded and by exact scores
+    (``recall_at_k``), and the mean absolute score error. With ``rerank``,
+    also the recall after exactly re-scoring the encoded top
+    ``rerank * k`` (``reranked_recall_at_k``). Rows are scored in chunks,
+    so memory stays bounded at any corpus size.
+    """
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(exact[np.sort(rng.choice(len(exact), min(num_queries, len(exact)), replace=False))],
+                         dtype=np.float32)
+    k = min(k, len(exact))
+    depth = min(max(k, k * rerank), len(exact))
+
+    best_exact = best_encoded = None
+    absolute_error = 0.0
+    for start in range(0, len(exact), CHUNK_ROWS):
+        end = min(len(exact), start + CHUNK_ROWS)
+        exact_scores = np.asarray(exact[start:end], dtype=np.float32) @ queries.T
+        encoded_scores = encoded.dot(queries, start, end)
+        absolute_error += float(np.abs(exact_scores - encoded_scores).sum())
+        best_exact = _merge_top_k(best_exact, exact_scores, start, k)
+        best_encoded = _merge_top_k(best_encoded, encoded_scores, start, depth)
+
+    # The encoded top k are the k best encoded scores of the (deeper) short list
+    encoded_values, encoded_rows = best_encoded
+    order = np.argsort(-encoded_values, axis=0, kind="stable")[:k]
+    top_encoded = np.take_along_axis(encoded_rows, order, axis=0)
+    found = found_reranked = 0
+    for column in range(len(queries)):
+        found += len(np.intersect1d(best_exact[1][:, column], top_encoded[:, column]))
+        found_reranked += len(np.intersect1d(best_exact[1][:, column], encoded_rows[:, column]))
+
+    float32_bytes = int(len(exact) * exact.shape[1] * 4)
+    report = {
+        "storage": encoded.kind,
+        "bytes": encoded.nbytes,
+        "float32_bytes": float32_bytes,
+        "compression": round(float32_bytes / encoded.nbytes, 2) if encoded.nbytes else 0.0,
+        f"recall_at_{k}": round(found / (k * len(queries)), 4) if len(queries) else 0.0,
+        "mean_abs_error": round(absolute_error / (len(exact) * len(queries)), 6) if len(queries) else 0.0,
+    }
+    if rerank > 0:
+        report[f"reranked_recall_at_{k}"] = round(found_reranked / (k * len(queries)), 4) if len(queries) else 0.0
+    return report
+
+
+class CompressedWordVectors:
+    """
+    Word vectors in an ``EmbeddingMatrix``, looked up like gensim ``KeyedVectors``.
+
+    Supports what serving needs: membership tests, per-word lookups
+    (decoded to float32), ``key_to_index`` and ``len``.
+    """
+
+    def __init__(self, keys: Sequence[str], matrix: EmbeddingMatrix):
+        self.index_to_key = list(keys)
+        self.key_to_index = {key: index for index, key in enumerate(self.index_to_key)}
+        self.matrix = matrix
+
+    @classmethod
+    def from_keyed_vectors(cls, word_vectors, kind: str, num_subvectors: int = 20) -> "CompressedWordVectors":
+        return cls(word_vectors.index_to_key, encode_embeddings(word_vectors.vectors, kind, num_subvectors))
+
+    @property
+    def vector_size(self) -> int:
+        return self.matrix.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.index_to_key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_to_index
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.matrix[np.array([self.key_to_index[key]])][0]
+
+    def keys(self) -> List[str]:
+        return self.index_to_key
@@ -0,0 +1,468 @@
+"""Sparse lexical scoring over posting lists."""
+
+import copy
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+def top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k best-scoring documents.
+
+    Uses ``np.partition`` so only the selected documents are sorted. Ties
+    are broken by ascending document id to keep the ranking deterministic.
+
+    Args:
+        doc_ids: Document ids of the scored documents
+        scores: Scores aligned with ``doc_ids``
+        k: Number of documents to keep
+
+    Returns:
+        Tuple of (doc_ids, scores) sorted by descending score
+    """
+    if k <= 0 or len(scores) == 0:
+        return doc_ids[:0], scores[:0]
+    if len(scores) > k:
+        kth_best = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth_best)
+        # Fill the remaining slots with the lowest-id documents tied at the boundary
+        tied = np.flatnonzero(scores == kth_best)
+        tied = tied[np.argsort(doc_ids[tied], kind="stable")[:k - len(above)]]
+        selected = np.concatenate((above, tied))
+        doc_ids = doc_ids[selected]
+        scores = scores[selected]
+    order = np.lexsort((doc_ids, -scores))
+    return doc_ids[order], scores[order]
+
+
+def _max_values(data: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Return the largest stored value of every column of a CSC matrix (0 if empty)."""
+    max_values = np.zeros(len(indptr) - 1, dtype=np.float64)
+    non_empty = np.diff(indptr) > 0
+    if non_empty.any():
+        max_values[non_empty] = np.maximum.reduceat(data, indptr[:-1][non_empty])
+    return max_values
+
+
+class LexicalScorer:
+    """
+    Base class for term-at-a-time scorers over posting lists.
+
+    Subclasses provide the posting lists, the per-term score contribution
+    (impact) of a posting and the largest impact of every term.
+    """
+
+    num_documents: int = 0
+    max_impacts: np.ndarray
+    # True when scores are already in [0, 1] and comparable across queries
+    normalized: bool = True
+
+    def query_terms(self, query_vector: sparse.spmatrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the term ids and weights of a 1 x V query vector."""
+        query_vector = sparse.csr_matrix(query_vector)
+        return query_vector.indices, query_vector.data
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the sorted document ids and stored values of a term's posting list."""
+        raise NotImplementedError
+
+    def impacts(self, term: int, weight: float, values: np.ndarray) -> np.ndarray:
+        """Return the score contribution of the given posting values."""
+        raise NotImplementedError
+
+    def allowed_postings(self, term: int, mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return a term's posting list restricted to the documents allowed by ``mask`` (all if None)."""
+        doc_ids, values = self.postings(term)
+        if mask is not None:
+            keep = mask[doc_ids]
+            doc_ids, values = doc_ids[keep], values[keep]
+        return doc_ids, values
+
+    def score(
+        self,
+        query_vector: sparse.spmatrix,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every document that shares at least one term with the query.
+
+        Work is proportional to the posting-list lengths rather than to the
+        corpus size.
+
+        Args:
+            query_vector: 1 x V query vector
+            mask: Documents that may be scored; postings of the others are
+                skipped before any impact is computed (all if None)
+
+        Returns:
+            Tuple of (doc_ids, scores) for the matching documents, ids ascending
+        """
+        terms, weights = self.query_terms(query_vector)
+
+        if len(terms) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        if len(terms) == 1:
+            doc_ids, values = self.allowed_postings(terms[0], mask)
+            return doc_ids, self.impacts(terms[0], weights[0], values)
+
+        doc_id_parts = []
+        score_parts = []
+        for term, weight in zip(terms, weights):
+            doc_ids, values = self.allowed_postings(term, mask)
+            doc_id_parts.append(doc_ids)
+            score_parts.append(self.impacts(term, weight, values))
+
+        doc_ids, positions = np.unique(np.concatenate(doc_id_parts), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(score_parts), minlength=len(doc_ids))
+        return doc_ids, scores
+
+    def top_k(
+        self,
+        query_vector: sparse.spmatrix,
+        k: int,
+        prune: bool = False,
+        min_score: float = 0.0,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k best-scoring documents for a query.
+
+        Args:
+            query_vector: 1 x V query vector
+            k: Number of documents to return
+            prune: Use MaxScore dynamic pruning instead of exhaustive scoring
+            min_score: Scores below this are never needed by the caller; with
+                pruning enabled it seeds the pruning threshold
+            mask: Documents that may be returned (all if None); the others
+                are never scored
+
+        Returns:
+            Tuple of (doc_ids, scores) sorted by descending score
+        """
+        if prune:
+            doc_ids, scores = self._max_score(query_vector, k, min_score, mask)
+        else:
+            doc_ids, scores = self.score(query_vector, mask)
+        return top_k(doc_ids, scores, k)
+
+    def top_k_batch(
+        self,
+        query_matrix: sparse.spmatrix,
+        k: int,
+        prune: bool = False,
+        min_score: float = 0.0,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the k best-scoring documents for every row of a query matrix.
+
+        Args:
+            query_matrix: Q x V query matrix
+            k: Number of documents to return per query
+            prune: Use MaxScore dynamic pruning instead of exhaustive scoring
+            min_score: See ``top_k``
+            mask: See ``top_k``; applies to every query
+
+        Returns:
+            List of (doc_ids, scores) tuples in query order
+        """
+        query_matrix = sparse.csr_matrix(query_matrix)
+        return [
+            self.top_k(query_matrix[row], k, prune=prune, min_score=min_score, mask=mask)
+            for row in range(query_matrix.shape[0])
+        ]
+
+    def _max_score(
+        self,
+        query_vector: sparse.spmatrix,
+        k: int,
+        min_score: float,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Term-at-a-time MaxScore.
+
+        Terms are processed in decreasing order of their upper-bound impact.
+        Once the upper bounds of the remaining terms add up to less than the
+        current k-th best partial score, no unseen document can enter the top
+        k: the remaining posting lists are only probed for the existing
+        candidates, and candidates that cannot reach the threshold are dropped.
+        The surviving candidates carry their exact scores, so the top k is
+        identical to exhaustive scoring. Documents outside ``mask`` are
+        skipped in every posting list; the upper bounds stay valid.
+        """
+        query_terms, query_weights = self.query_terms(query_vector)
+        if len(query_terms) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+        upper_bounds = query_weights * self.max_impacts[query_terms]
+        order = np.argsort(-upper_bounds, kind="stable")
+        terms, weights, upper_bounds = query_terms[order], query_weights[order], upper_bounds[order]
+        # remaining[i] bounds the score a document can still gain from terms i onwards
+        remaining = np.append(np.cumsum(upper_bounds[::-1])[::-1], 0.0)
+
+        doc_ids = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float64)
+        threshold = min_score
+
+        for i, (term, weight) in enumerate(zip(terms, weights)):
+            posting_ids, values = self.allowed_postings(term, mask)
+            # Partial sums are accumulated in a different order than the final
+            # scores, so compare with a little slack to keep exact ties
+            cutoff = threshold - 1e-9 * max(1.0, abs(threshold))
+
+            if remaining[i] >= cutoff and len(doc_ids) == 0:
+                doc_ids = posting_ids
+                scores = np.asarray(self.impacts(term, weight, values), dtype=np.float64)
+            elif remaining[i] >= cutoff:
+                # Unseen documents may still qualify: merge the whole posting list
+                merged_ids, positions = np.unique(
+                    np.concatenate((doc_ids, posting_ids)), return_inverse=True
+                )
+                scores = np.bincount(
+                    positions,
+                    weights=np.concatenate((scores, self.impacts(term, weight, values))),
+                    minlength=len(merged_ids),
+                )
+                doc_ids = merged_ids
+            else:
+                # Only existing candidates can qualify: probe the posting list for them
+                if len(doc_ids) == 0:
+                    break
+                hits, positions = self._probe(posting_ids, doc_ids)
+                scores[hits] += self.impacts(term, weight, values[positions])
+
+            if len(scores) >= k:
+                kth_best = np.partition(scores, len(scores) - k)[len(scores) - k]
+                threshold = max(threshold, kth_best)
+                cutoff = threshold - 1e-9 * max(1.0, abs(threshold))
+
+            if remaining[i + 1] < cutoff:
+                keep = scores + remaining[i + 1] >= cutoff
+                doc_ids, scores = doc_ids[keep], scores[keep]
+
+        # Recompute the survivors' scores in query-term order so they are
+        # bit-identical to exhaustive scoring and ties resolve the same way
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        for term, weight in zip(query_terms, query_weights):
+            posting_ids, values = self.postings(term)
+            hits, positions = self._probe(posting_ids, doc_ids)
+            scores[hits] += self.impacts(term, weight, values[positions])
+        return doc_ids, scores
+
+    @staticmethod
+    def _probe(posting_ids: np.ndarray, doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up sorted document ids in a sorted posting list.
+
+        Returns:
+            Tuple of (mask over ``doc_ids`` of documents in the posting list,
+            posting positions of those documents)
+        """
+        if len(posting_ids) == 0:
+            return np.zeros(len(doc_ids), dtype=bool), np.empty(0, dtype=np.intp)
+        positions = np.searchsorted(posting_ids, doc_ids)
+        positions[positions == len(posting_ids)] = 0
+        hits = posting_ids[positions] == doc_ids
+        return hits, positions[hits]
+
+
+class TfidfScorer(LexicalScorer):
+    """Term-at-a-time TF-IDF cosine scorer over a CSC view of the index."""
+
+    def __init__(self, tfidf_matrix: sparse.spmatrix):
+        """
+        Build the posting lists and per-term upper-bound impacts.
+
+        Documents and queries are L2-normalized by the vectorizer, so the dot
+        product accumulated over the posting lists is the cosine similarity.
+        A CSC matrix with sorted indices (such as a memory-mapped snapshot)
+        is used as-is without copying.
+
+        Args:
+            tfidf_matrix: L2-normalized document-term TF-IDF matrix
+        """
+        postings = sparse.csc_matrix(tfidf_matrix)
+        if not postings.has_sorted_indices:
+            postings.sort_indices()
+        self.num_documents, self.num_terms = postings.shape
+        self.indptr = postings.indptr
+        self.indices = postings.indices
+        self.data = postings.data
+        self.max_impacts = _max_values(self.data, self.indptr)
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the sorted document ids and weights of a term's posting list."""
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def impacts(self, term: int, weight: float, values: np.ndarray) -> np.ndarray:
+        """Return the query-weighted TF-IDF products of the given postings."""
+        return values * weight
+
+    def top_k_batch(
+        self,
+        query_matrix: sparse.spmatrix,
+        k: int,
+        prune: bool = False,
+        min_score: float = 0.0,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Score all queries with one sparse (Q x V) . (V x N) product.
+
+        The posting lists are the CSR form of the transposed index, so the
+        product touches only documents sharing a term with some query.
+        Pruned or filtered retrieval falls back to per-query term-at-a-time
+        scoring, which skips the postings of documents outside ``mask``.
+        """
+        if prune or mask is not None:
+            return super().top_k_batch(query_matrix, k, prune=prune, min_score=min_score, mask=mask)
+
+        term_document = sparse.csr_matrix(
+            (self.data, self.indices, self.indptr), shape=(self.num_terms, self.num_documents)
+        )
+        scores = sparse.csr_matrix(query_matrix) @ term_document
+        scores.sort_indices()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(top_k(scores.indices[start:end], scores.data[start:end], k))
+        return results
+
+
+def bm25_idf(field_counts: List[sparse.spmatrix]) -> np.ndarray:
+    """
+    Compute BM25 idf weights from per-field term-count matrices.
+
+    A document contains a term if the term occurs in any of its fields. Uses
+    the non-negative variant ``log(1 + (N - df + 0.5) / (df + 0.5))``.
+
+    Args:
+        field_counts: Document-term count matrices, one per field
+
+    Returns:
+        float32 idf weight per term
+    """
+    combined = sparse.csc_matrix(sum(field_counts))
+    combined.eliminate_zeros()
+    return bm25_idf_weights(np.diff(combined.indptr), combined.shape[0])
+
+
+def bm25_idf_weights(document_frequency: np.ndarray, num_documents: int) -> np.ndarray:
+    """Compute float32 BM25 idf weights from per-term document frequencies."""
+    document_frequency = np.asarray(document_frequency, dtype=np.float64)
+    idf = np.log1p((num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+    return idf.astype(np.float32)
+
+
+def bm25_postings(
+    field_counts: List[sparse.spmatrix],
+    doc_lengths: np.ndarray,
+    field_weights: List[float],
+    b: float = 0.75,
+    average_lengths: Optional[np.ndarray] = None,
+) -> sparse.csc_matrix:
+    """
+    Combine per-field term counts into BM25F pseudo term frequencies.
+
+    Field term frequencies are length-normalized per field and summed with
+    the field weights, before saturation.
+
+    Args:
+        field_counts: Document-term count matrices, one per field
+        doc_lengths: Array of shape (n_docs, n_fields) with field lengths
+        field_weights: Weight of every field
+        b: Document-length normalization strength
+        average_lengths: Average field lengths to normalize against;
+            defaults to the averages of ``doc_lengths``. Delta segments pass
+            the averages of the base index so their scores stay comparable.
+
+    Returns:
+        float32 CSC document-term matrix of pseudo term frequencies
+    """
+    lengths = np.asarray(doc_lengths, dtype=np.float64)
+    if average_lengths is None:
+        average_lengths = lengths.mean(axis=0) if len(lengths) else np.ones(lengths.shape[1])
+    average_lengths = np.array(average_lengths, dtype=np.float64)
+    average_lengths[average_lengths == 0] = 1.0
+    field_norms = (1.0 - b + b * lengths / average_lengths).astype(np.float32)
+
+    pseudo_tf = None
+    for field, (counts, weight) in enumerate(zip(field_counts, field_weights)):
+        scaled = sparse.diags(weight / field_norms[:, field]) @ sparse.csr_matrix(counts)
+        pseudo_tf = scaled if pseudo_tf is None else pseudo_tf + scaled
+
+    postings = sparse.csc_matrix(pseudo_tf, dtype=np.float32)
+    postings.eliminate_zeros()
+    postings.sort_indices()
+    return postings
+
+
+class BM25Scorer(LexicalScorer):
+    """
+    Term-at-a-time BM25F scorer.
+
+    Every term has one posting list of pseudo term frequencies (see
+    ``bm25_postings``), so query-time scoring is a gather of idf and
+    postings followed by the saturation.
+    """
+
+    normalized = False
+
+    def __init__(self, postings: sparse.spmatrix, idf: np.ndarray, k1: float = 1.2):
+        """
+        Attach to the pseudo term-frequency posting lists.
+
+        Args:
+            postings: Document-term matrix of pseudo term frequencies; a CSC
+                matrix with sorted indices is used without copying
+            idf: Per-term BM25 idf weights
+            k1: Term-frequency saturation parameter
+        """
+        self.k1 = k1
+
+        postings = sparse.csc_matrix(postings)
+        if not postings.has_sorted_indices:
+            postings.sort_indices()
+        self.num_documents, self.num_terms = postings.shape
+        self.indptr = postings.indptr
+        self.indices = postings.indices
+        self.data = postings.data
+
+        self.max_tf = _max_values(self.data, self.indptr)
+        self._weight(idf)
+
+    def with_idf(self, idf: np.ndarray) -> "BM25Scorer":
+        """
+        Return a scorer over the same posting lists with other idf weights.
+
+        This scorer is left unchanged, so searches using it keep idf weights
+        and upper-bound impacts that belong together.
+        """
+        scorer = copy.copy(self)
+        scorer._weight(idf)
+        return scorer
+
+    def _weight(self, idf: np.ndarray) -> None:
+        """Set the idf weights and the upper-bound impacts derived from them (before publishing)."""
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.max_impacts = self.idf * self.max_tf * (self.k1 + 1.0) / (self.max_tf + self.k1)
+
+    def query_terms(self, query_vector: sparse.spmatrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the query's term ids, each with unit weight."""
+        query_vector = sparse.csr_matrix(query_vector)
+        return query_vector.indices, np.ones(len(query_vector.indices), dtype=np.float64)
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the sorted document ids and pseudo term frequencies of a term."""
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def impacts(self, term: int, weight: float, values: np.ndarray) -> np.ndarray:
+        """Return the saturated, idf-weighted BM25 contribution of the given postings."""
+        values = values.astype(np.float64)
+        return weight * self.idf[term] * values * (self.k1 + 1.0) / (values + self.k1)
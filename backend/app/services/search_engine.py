@@ -1,37 +1,259 @@
 """NLP-based search engine with TF-IDF and Word2Vec Skip-gram."""
 
+import contextlib
+import copy
 import json
+import logging
 import re
+import threading
 import time
+import uuid
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, Tuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from gensim.models import Word2Vec
 # import gensim.downloader as api  # Commented out - using Skip-gram instead of GloVe
 from app.core.config import settings
+from app.services import index_store
+from app.services.ann import IVFIndex
+from app.services.cache import QueryCache
+from app.services.categories import CategoryFilter
+from app.services.dates import DateRange, parse_day
+from app.services.document_store import DocumentStore
+from app.services.filters import REQUEST_OPTIONS as FILTER_REQUEST_OPTIONS, SearchFilter
+from app.services.fusion import (
+    REQUEST_OPTIONS as FUSION_REQUEST_OPTIONS,
+    FusionOptions,
+    aligned_scores,
+    candidate_union,
+    linear_fusion,
+    rank_fused,
+    reciprocal_rank_fusion,
+)
+from app.services.pagination import ResultSet, decode_cursor, encode_cursor, keep_served
+from app.services.preprocessing import TextPreprocessor, normalize_text
+from app.services.quantization import (
+    CompressedWordVectors,
+    EmbeddingMatrix,
+    agreement_report,
+    encode_embeddings,
+    load_embeddings,
+)
+from app.services.scoring import bm25_idf, bm25_postings
+from app.services.segments import BASE_SEGMENT, Segment, SegmentedIndex, reweight_tfidf
+from app.services.spelling import SPELLING_MODES, SpellCorrector, build_spell_corrector
+from app.services.suggest import KINDS as SUGGESTION_KINDS, SuggestIndex
+from app.services.tracing import SearchTrace
+
+logger = logging.getLogger(__name__)
+
+# Base index attributes a full merge replaces (published together once the merge succeeded)
+BASE_STATE = (
+    "documents", "tfidf_vectorizer", "tfidf_matrix", "base_idf", "bm25_postings", "bm25_doc_lengths",
+    "bm25_idf", "doc_embeddings", "embedding_matrix", "embedding_report", "ann_index",
+    "word_vectors", "spell_corrector", "suggest_index",
+)
+
+
+class SearchModeError(ValueError):
+    """Raised when the index cannot serve the requested search mode."""
+
+
+class QueryModels(NamedTuple):
+    """Models fitted with the base index that queries read; every view carries one set."""
+
+    preprocessor: TextPreprocessor  # Query normalization with the base's lemma table
+    spell_corrector: Optional[SpellCorrector]
+    suggest_index: Optional[SuggestIndex]
 
 
 class SearchEngine:
     """NLP search engine using TF-IDF and Word2Vec for semantic search."""
     
-    def __init__(self, documents_path: str = None):
-        """Initialize the search engine."""
+    def __init__(self, documents_path: str = None, index_path: str = None, rebuild: bool = False):
+        """
+        Initialize the search engine.
+
+        Attaches to the persisted index snapshot when it matches the current
+        corpus and settings; otherwise builds the models and writes a new
+        snapshot. The snapshot is memory-mapped read-only, so every worker
+        process serving the same snapshot shares one copy of the index.
+        Documents ingested later live in delta segments next to it.
+
+        Args:
+            documents_path: Path to the documents file
+            index_path: Path to the index snapshot directory
+            rebuild: Ignore any existing snapshot and rebuild the index
+        """
         self.documents_path = documents_path or settings.DOCUMENTS_PATH
+        self.index_path = index_path or settings.INDEX_PATH
         self.documents = []
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
+        self.base_idf = None
+        self.bm25_postings = None
+        self.bm25_doc_lengths = None
+        self.bm25_idf = None
+        self.word2vec_model = None
+        self.word_vectors = None
+        self.doc_embeddings = None
+        self.ann_index: Optional[IVFIndex] = None
+        self.embedding_matrix: Optional[EmbeddingMatrix] = None  # Encoded doc embeddings (None for float32)
+        self.embedding_report: Dict[str, Any] = {}  # Memory and ranking agreement of the encoding
+        self.spell_corrector: Optional[SpellCorrector] = None
+        self.suggest_index: Optional[SuggestIndex] = None
+        self.text_preprocessor = TextPreprocessor(
+            settings.PREPROCESSING,
+            spacy_model=settings.SPACY_MODEL,
+            cache_path=settings.PREPROCESS_CACHE_PATH,
+            batch_size=settings.PREPROCESS_BATCH_SIZE,
+            workers=settings.PREPROCESS_WORKERS
+        )
+        self.fingerprint = index_store.compute_fingerprint(self.documents_path)
+        self.base_created_at = None
+        self.result_cache = QueryCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+        self.result_sets = QueryCache(settings.RESULT_SET_CACHE_SIZE, settings.RESULT_SET_CACHE_TTL)
+        self.build_timings: Dict[str, float] = {}  # Seconds per model-building phase
+        
+        # Segments searched together: the base index plus ingested delta segments
+        self.view: Optional[SegmentedIndex] = None
+        self.segment_state: Dict[str, Any] = {}
+        self._base_segment: Optional[Segment] = None
+        self._document_ids: Dict[str, Dict[str, int]] = {}
+        self._state_mtime = None
+        self._last_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+        self._warned_volatile = False
+        
+        if not settings.PERSIST_INDEX:
+            self._load_documents()
+            self._initialize_models()
+        elif rebuild or not self._load_index():
+            # Only one worker builds; the others wait and attach to its snapshot
+            with index_store.build_lock(self.index_path):
+                if rebuild or not self._load_index():
+                    self._load_documents()
+                    # A rebuild starts from DOCUMENTS_PATH; ingested changes come from the journal
+                    self._apply_journal()
+                    self._initialize_models()
+                    self._save_index()
+                    # Re-attach so the builder also serves from the shared mapping
+                    self._load_index()
+        
+        if self.tfidf_matrix is not None:
+            self._reset_base()
+            self._refresh_segments(force=True)
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        """Changes whenever the searchable index changes; cached results are tied to it."""
+        return self.view.version if self.view is not None else None
+    
+    def index_stats(self) -> Dict[str, Any]:
+        """Index size counters for metrics."""
+        view = self.view
+        vocabulary = getattr(self.tfidf_vectorizer, "vocabulary_", None)
+        return {
+            "documents": view.num_live if view is not None else 0,
+            "deleted_documents": view.num_documents - view.num_live if view is not None else 0,
+            "segments": len(view.segments) if view is not None else 0,
+            "vocabulary_terms": len(vocabulary) if vocabulary is not None else 0,
+            "embedding_terms": len(self.word_vectors) if self.word_vectors is not None else None,
+            "embedding_bytes": sum(
+                segment.embedding_matrix.nbytes for segment in view.segments if segment.embedding_matrix is not None
+            ) if view is not None and view.doc_embeddings is not None else None,
+            "document_bytes": sum(segment.documents.nbytes for segment in view.segments) if view is not None else 0,
+            "cache_entries": self.result_cache.stats()["size"],
+            "spelling_terms": len(self.spell_corrector) if self.spell_corrector is not None else 0,
+            "suggestion_entries": len(self.suggest_index) if self.suggest_index is not None else 0,
+        }
+    
+    def _load_index(self) -> bool:
+        """Load the index snapshot; return False if it is missing or stale."""
+        try:
+            snapshot = index_store.load_index(self.index_path, self.fingerprint)
+        except Exception as e:
+            logger.warning(f"Could not load index snapshot: {e}")
+            return False
+        if snapshot is None:
+            return False
+        
+        arrays, matrices = snapshot["arrays"], snapshot["matrices"]
+        self.documents = snapshot["documents"]
+        vectorizer = self._create_vectorizer()
+        vectorizer.vocabulary_ = snapshot["vocabulary"]
+        vectorizer.idf_ = arrays["idf"]
+        self.tfidf_vectorizer = vectorizer
+        self.base_idf = arrays["idf"]
+        self.base_created_at = snapshot["manifest"]["created_at"]
+        self.tfidf_matrix = matrices["tfidf"]
+        self.bm25_postings = matrices.get("bm25_postings")
+        self.bm25_doc_lengths = arrays.get("bm25_doc_lengths")
+        self.bm25_idf = arrays.get("bm25_idf")
+        self.word_vectors = snapshot["word_vectors"]
+        self.doc_embeddings = arrays.get("doc_embeddings")
+        self.embedding_matrix = load_embeddings(arrays, "doc_embedding_")
+        self.ann_index = IVFIndex.from_arrays(arrays)
+        self.spell_corrector = SpellCorrector.from_arrays(arrays)
+        self.suggest_index = SuggestIndex.from_arrays(arrays)
+        # Views still serving the previous base keep its lemma table
+        preprocessor = copy.copy(self.text_preprocessor)
+        preprocessor.load_arrays(arrays)
+        self.text_preprocessor = preprocessor
+        # Training state is not needed for serving
         self.word2vec_model = None
-        self._load_documents()
-        self._initialize_models()
+        logger.info(f"✓ Attached index snapshot at {self.index_path}: {self.tfidf_matrix.shape}")
+        return True
+    
+    def _save_index(self) -> None:
+        """Write the built index to the snapshot directory."""
+        if self.tfidf_matrix is None:
+            return
+        try:
+            self._write_snapshot()
+            logger.info(f"✓ Index snapshot saved to {self.index_path}")
+        except Exception as e:
+            logger.warning(f"Could not save index snapshot: {e}")
+    
+    def _write_snapshot(self, segment_state: Optional[Dict[str, Any]] = None) -> None:
+        """Write the base index as a snapshot, raising on failure."""
+        index_store.save_index(
+            self.index_path,
+            self.fingerprint,
+            documents=self.documents,
+            vocabulary=self.tfidf_vectorizer.vocabulary_,
+            arrays={
+                "idf": self.base_idf,
+                "bm25_idf": self.bm25_idf,
+                "bm25_doc_lengths": self.bm25_doc_lengths,
+                # float32 embeddings stay in the snapshot for re-ranking and merges
+                "doc_embeddings": self.doc_embeddings,
+                **(self.embedding_matrix.arrays("doc_embedding_") if self.embedding_matrix is not None else {}),
+                **(self.ann_index.arrays() if self.ann_index is not None else {}),
+                **(self.spell_corrector.arrays() if self.spell_corrector is not None else {}),
+                **(self.suggest_index.arrays() if self.suggest_index is not None else {}),
+                **self.text_preprocessor.arrays(),
+            },
+            # Posting lists are stored column-major, as the scorers read them
+            matrices={
+                "tfidf": sparse.csc_matrix(self.tfidf_matrix),
+                "bm25_postings": self.bm25_postings,
+            },
+            word_vectors=self.word_vectors,
+            segment_state=segment_state,
+        )
     
     def _load_documents(self) -> None:
         """Load documents from JSON or JSONL file."""
         try:
             file_path = Path(self.documents_path)
             if not file_path.exists():
-                print(f"Warning: Documents file not found at {self.documents_path}")
+                logger.warning(f"Documents file not found at {self.documents_path}")
                 self.documents = self._get_sample_documents()
                 return
             
@@ -39,18 +261,13 @@ class SearchEngine:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     self.documents = [json.loads(line.strip()) for line in f if line.strip()]
-                print(f"Loaded {len(self.documents)} documents from JSONL format")
+                logger.info(f"Loaded {len(self.documents)} documents from JSONL format")
                 
                 # Normalize news article structure
-                normalized = []
-                for idx, doc in enumerate(self.documents):
-                    normalized.append({
-                        "id": str(idx + 1),
-                        "title": doc.get("headline", doc.get("title", f"Article {idx+1}"))[:200],
-                        "content": doc.get("short_description", doc.get("description", doc.get("content", "")))[:2000],
-                        "category": doc.get("category", "General")
-                    })
-                self.documents = normalized
+                self.documents = [
+                    self._normalize_document(doc, str(doc.get("id", idx + 1)))
+                    for idx, doc in enumerate(self.documents)
+                ]
                 return
             except json.JSONDecodeError:
                 # If JSONL fails, try regular JSON
@@ -68,12 +285,23 @@ class SearchEngine:
             else:
                 self.documents = []
             
-            print(f"Loaded {len(self.documents)} documents from JSON format")
+            logger.info(f"Loaded {len(self.documents)} documents from JSON format")
             
         except Exception as e:
-            print(f"Error loading documents: {e}")
+            logger.error(f"Error loading documents: {e}")
             self.documents = self._get_sample_documents()
     
+    @staticmethod
+    def _normalize_document(doc: Dict[str, Any], doc_id: str) -> Dict[str, Any]:
+        """Map a news article (or an already normalized document) to the stored fields."""
+        return {
+            "id": doc_id,
+            "title": doc.get("headline", doc.get("title", f"Article {doc_id}"))[:200],
+            "content": doc.get("short_description", doc.get("description", doc.get("content", "")))[:2000],
+            "category": doc.get("category", "General"),
+            "date": parse_day(doc.get("date"))
+        }
+    
     def _get_sample_documents(self) -> List[Dict[str, Any]]:
         """Return sample documents if main file is missing."""
         return [
@@ -97,15 +325,34 @@ class SearchEngine:
             }
         ]
     
-    def _preprocess_text(self, text: str) -> str:
-        """Preprocess text for NLP analysis."""
-        # Convert to lowercase
-        text = text.lower()
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        return text
+    @staticmethod
+    def _preprocess_text(view: SegmentedIndex, text: str) -> str:
+        """Preprocess a query the way the view's documents were (see ``PREPROCESSING``)."""
+        return view.models.preprocessor.normalize_query(text)
+    
+    def _preprocess_fields(
+        self,
+        documents: List[Dict[str, Any]],
+        prune: bool = False
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Preprocess the titles and contents of documents in one batch.
+        
+        Args:
+            documents: Documents to preprocess
+            prune: The documents are the whole corpus (see ``TextPreprocessor.process``)
+            
+        Returns:
+            Tuple of (titles, contents), preprocessed
+        """
+        texts = [doc.get(field, '') for field in ("title", "content") for doc in documents]
+        processed = self.text_preprocessor.process(texts, prune=prune)
+        return processed[:len(documents)], processed[len(documents):]
+    
+    @staticmethod
+    def _join_fields(fields: Tuple[List[str], List[str]]) -> List[str]:
+        """Whole-document texts from preprocessed titles and contents."""
+        return [f"{title} {content}".strip() for title, content in zip(*fields)]
     
     def _tokenize_sentences(self, texts: List[str]) -> List[List[str]]:
         """Convert texts to tokenized sentences for Word2Vec training."""
@@ -119,46 +366,118 @@ class SearchEngine:
                     sentences.append(tokens)
         return sentences
     
-    def _initialize_models(self) -> None:
-        """Initialize TF-IDF vectorizer and Word2Vec Skip-gram model."""
-        if not self.documents:
-            print("No documents to initialize models")
-            return
-        
-        # Prepare corpus
-        corpus = [
-            self._preprocess_text(f"{doc.get('title', '')} {doc.get('content', '')}")
-            for doc in self.documents
-        ]
-        
-        print(f"Initializing TF-IDF with {len(corpus)} documents...")
-        
-        # Initialize TF-IDF
-        self.tfidf_vectorizer = TfidfVectorizer(
+    def _create_vectorizer(self) -> TfidfVectorizer:
+        """Create an unfitted TF-IDF vectorizer with the index parameters."""
+        return TfidfVectorizer(
             max_features=settings.TFIDF_MAX_FEATURES,
             stop_words='english',
             ngram_range=(1, 2),
             min_df=2,  # Ignore terms that appear in less than 2 documents
             max_df=0.8  # Ignore terms that appear in more than 80% of documents
         )
+    
+    def _count_fields(self, fields: Tuple[List[str], List[str]]) -> Tuple[List[sparse.spmatrix], np.ndarray]:
+        """Count preprocessed title and content terms separately; return the counts and field lengths."""
+        # Reuse the fitted TF-IDF analyzer and vocabulary so both scorers share term ids
+        count_vectorizer = CountVectorizer(
+            analyzer=self.tfidf_vectorizer.build_analyzer(),
+            vocabulary=self.tfidf_vectorizer.vocabulary_,
+            dtype=np.float32
+        )
+        field_counts = [count_vectorizer.transform(texts) for texts in fields]
+        doc_lengths = np.column_stack([
+            np.asarray(counts.sum(axis=1)).ravel() for counts in field_counts
+        ]).astype(np.float32)
+        return field_counts, doc_lengths
+    
+    def _initialize_bm25(self, fields: Tuple[List[str], List[str]]) -> None:
+        """Count preprocessed title and content terms separately for BM25F scoring."""
+        field_counts, self.bm25_doc_lengths = self._count_fields(fields)
+        self.bm25_idf = bm25_idf(field_counts)
+        self.bm25_postings = bm25_postings(
+            field_counts,
+            self.bm25_doc_lengths,
+            field_weights=[settings.BM25_TITLE_WEIGHT, settings.BM25_CONTENT_WEIGHT],
+            b=settings.BM25_B
+        )
+        logger.info(f"✓ BM25 field statistics computed for {len(field_counts)} fields")
+    
+    def _fit_lexical_models(self, documents: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Fit the vocabulary, TF-IDF, BM25F, spelling and suggestion indexes on a whole corpus.
+        
+        Args:
+            documents: Every document of the base index
+            
+        Returns:
+            Preprocessed document texts
+        """
+        documents = list(documents)
+        phase_start = time.perf_counter()
+        fields = self._preprocess_fields(documents, prune=True)
+        corpus = self._join_fields(fields)
+        self.build_timings["preprocess"] = time.perf_counter() - phase_start
+        
+        logger.info(f"Initializing TF-IDF with {len(corpus)} documents...")
+        
+        # Initialize TF-IDF
+        phase_start = time.perf_counter()
+        self.tfidf_vectorizer = self._create_vectorizer()
         self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(corpus)
-        print(f"✓ TF-IDF initialized: {self.tfidf_matrix.shape}")
+        self.base_idf = np.array(self.tfidf_vectorizer.idf_)
+        # Fitted stop words are only kept for introspection and bloat the model
+        self.tfidf_vectorizer.stop_words_ = None
+        self.build_timings["tfidf_fit"] = time.perf_counter() - phase_start
+        logger.info(f"✓ TF-IDF initialized: {self.tfidf_matrix.shape}")
+        
+        phase_start = time.perf_counter()
+        self._initialize_bm25(fields)
+        self.build_timings["bm25"] = time.perf_counter() - phase_start
+        
+        phase_start = time.perf_counter()
+        self.spell_corrector = build_spell_corrector(
+            settings.SPELL_DICTIONARY_PATH,
+            {word for text in corpus for word in text.split()},
+            settings.SPELL_MAX_EDIT_DISTANCE,
+            settings.SPELL_PREFIX_LENGTH
+        )
+        self.build_timings["spelling"] = time.perf_counter() - phase_start
+        if self.spell_corrector is not None:
+            logger.info(
+                f"✓ Spelling index built: {len(self.spell_corrector)} words, "
+                f"{len(self.spell_corrector.delete_codes)} deletes"
+            )
+        
+        phase_start = time.perf_counter()
+        self.suggest_index = self._build_suggest_index(doc.get("title", "") for doc in documents)
+        self.build_timings["suggest"] = time.perf_counter() - phase_start
+        logger.info(f"✓ Suggestion index built: {len(self.suggest_index)} entries")
+        return corpus
+    
+    def _initialize_models(self) -> None:
+        """Initialize TF-IDF vectorizer and Word2Vec Skip-gram model."""
+        if not self.documents:
+            logger.warning("No documents to initialize models")
+            return
+        
+        corpus = self._fit_lexical_models(self.documents)
         
         # Train Word2Vec model with Skip-gram architecture
         if settings.USE_WORD2VEC:
             try:
-                print("Training Word2Vec Skip-gram model (this may take a moment)...")
+                logger.info("Training Word2Vec Skip-gram model (this may take a moment)...")
                 
                 # Tokenize corpus into sentences
                 sentences = self._tokenize_sentences(corpus)
                 
                 if len(sentences) < 2:
-                    print("Warning: Not enough sentences for Word2Vec training")
+                    logger.warning("Not enough sentences for Word2Vec training")
                     self.word2vec_model = None
                     return
                 
                 # Train Skip-gram model
                 # sg=1 means Skip-gram (sg=0 would be CBOW)
+                phase_start = time.perf_counter()
                 self.word2vec_model = Word2Vec(
                     sentences=sentences,
                     vector_size=100,           # Dimension of word vectors
@@ -168,163 +487,1591 @@ class SearchEngine:
                     sg=1,                      # 1 = Skip-gram, 0 = CBOW
                     epochs=5                   # Training epochs
                 )
-                print(f"✓ Word2Vec Skip-gram model trained successfully")
-                print(f"  Vocabulary size: {len(self.word2vec_model.wv)}")
-                print(f"  Vector dimension: {self.word2vec_model.vector_size}")
+                self.word_vectors = self.word2vec_model.wv
+                self.build_timings["word2vec_train"] = time.perf_counter() - phase_start
+                logger.info(
+                    "✓ Word2Vec Skip-gram model trained successfully",
+                    extra={"fields": {
+                        "vocabulary_size": len(self.word2vec_model.wv),
+                        "vector_size": self.word2vec_model.vector_size,
+                    }}
+                )
+                
+                # Precompute document embeddings for vectorized rescoring
+                phase_start = time.perf_counter()
+                self.doc_embeddings = self._compute_document_embeddings(corpus)
+                self.build_timings["document_embeddings"] = time.perf_counter() - phase_start
+                logger.info(f"✓ Document embeddings computed: {self.doc_embeddings.shape}")
+                
+                phase_start = time.perf_counter()
+                self._encode_embeddings()
+                self.build_timings["embedding_encoding"] = time.perf_counter() - phase_start
+                
+                phase_start = time.perf_counter()
+                self.ann_index = self._build_ann_index(self.doc_embeddings, vectors=self.embedding_matrix)
+                self.build_timings["ann_index"] = time.perf_counter() - phase_start
                 
             except Exception as e:
-                print(f"Warning: Could not train Word2Vec model: {e}")
-                print("Continuing with TF-IDF only...")
+                logger.warning(f"Could not train Word2Vec model: {e}; continuing with TF-IDF only")
                 self.word2vec_model = None
+                self.word_vectors = None
+                self.doc_embeddings = None
+                self.embedding_matrix = None
+                self.ann_index = None
         else:
-            print("Word2Vec disabled - using TF-IDF only")
+            logger.info("Word2Vec disabled - using TF-IDF only")
             self.word2vec_model = None
     
-    def _get_word2vec_similarity(self, query: str, document: str) -> float:
-        """Calculate semantic similarity using Word2Vec Skip-gram."""
-        if not self.word2vec_model:
-            return 0.0
+    def _build_suggest_index(self, titles: Iterable[str]) -> SuggestIndex:
+        """Index the vocabulary terms and phrases and the given document titles by document frequency."""
+        vocabulary = self.tfidf_vectorizer.vocabulary_
+        document_frequency = np.bincount(
+            sparse.csr_matrix(self.tfidf_matrix).indices, minlength=len(vocabulary)
+        )
+        entries = [
+            (term, int(document_frequency[column]), SUGGESTION_KINDS.index("phrase" if " " in term else "term"), None)
+            for term, column in vocabulary.items()
+        ]
+        titles = [title.strip() for title in titles]
+        keys = [normalize_text(title) for title in titles]
+        title_frequency = Counter(keys)
+        entries.extend(
+            (key, title_frequency[key], SUGGESTION_KINDS.index("title"), title)
+            for key, title in zip(keys, titles)
+        )
+        return SuggestIndex.build(entries, top_k=settings.SUGGEST_TOP_K)
+    
+    def _compute_document_embeddings(self, corpus: List[str]) -> np.ndarray:
+        """
+        Build the L2-normalized mean word vector of every document.
         
-        try:
-            query_words = query.split()
-            doc_words = document.split()
-            
-            # Get word vectors from trained Skip-gram model
-            query_vectors = [
-                self.word2vec_model.wv[word]
-                for word in query_words
-                if word in self.word2vec_model.wv
-            ]
-            doc_vectors = [
-                self.word2vec_model.wv[word]
-                for word in doc_words
-                if word in self.word2vec_model.wv
-            ]
-            
-            if not query_vectors or not doc_vectors:
-                return 0.0
-            
-            # Calculate average vectors
-            query_vec = np.mean(query_vectors, axis=0).reshape(1, -1)
-            doc_vec = np.mean(doc_vectors, axis=0).reshape(1, -1)
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(query_vec, doc_vec)[0][0]
-            return max(0.0, similarity)
+        Args:
+            corpus: Preprocessed document texts
             
-        except Exception as e:
-            print(f"Word2Vec similarity error: {e}")
-            return 0.0
+        Returns:
+            float32 matrix of shape (n_docs, vector_size); documents without
+            any in-vocabulary word get an all-zero row
+        """
+        key_to_index = self.word_vectors.key_to_index
+        rows, cols = [], []
+        for row, text in enumerate(corpus):
+            for word in text.split():
+                col = key_to_index.get(word)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        
+        # Sparse word-count matrix; duplicate (row, col) pairs are summed
+        counts = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(corpus), len(key_to_index))
+        )
+        if isinstance(self.word_vectors, CompressedWordVectors):
+            embeddings = self.word_vectors.matrix.left_multiply(counts)
+        else:
+            embeddings = np.asarray(counts @ self.word_vectors.vectors, dtype=np.float32)
+        
+        # The mean and the sum point the same way, so normalizing the sum is enough
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+    
+    def _encode_embeddings(self) -> None:
+        """
+        Encode the document embeddings and word vectors in ``EMBEDDING_STORAGE``.
+        
+        The float32 document embeddings are kept as well (on disk once the
+        snapshot is attached) for re-ranking and merges; the word vectors are
+        only kept encoded. Falls back to float32 if encoding fails.
+        """
+        self.embedding_matrix = None
+        self.embedding_report = {}
+        storage = settings.EMBEDDING_STORAGE
+        if storage == "float32" or self.doc_embeddings is None:
+            return
+        try:
+            self.embedding_matrix = encode_embeddings(self.doc_embeddings, storage, settings.PQ_SUBVECTORS)
+            if not isinstance(self.word_vectors, CompressedWordVectors):
+                self.word_vectors = CompressedWordVectors.from_keyed_vectors(
+                    self.word_vectors, storage, settings.PQ_SUBVECTORS
+                )
+        except ValueError as e:
+            logger.warning(f"Could not encode embeddings as {storage}: {e}; keeping float32")
+            self.embedding_matrix = None
+            return
+        self.embedding_report = agreement_report(
+            self.doc_embeddings, self.embedding_matrix, rerank=settings.EMBEDDING_RERANK
+        )
+        logger.info(
+            f"✓ Document embeddings encoded as {storage}",
+            extra={"fields": self.embedding_report}
+        )
+    
+    def _build_ann_index(
+        self,
+        doc_embeddings: Optional[np.ndarray],
+        centroids: Optional[np.ndarray] = None,
+        vectors: Optional[EmbeddingMatrix] = None
+    ) -> Optional[IVFIndex]:
+        """Build the nearest-neighbour index for semantic retrieval, if enabled."""
+        if not settings.ANN_INDEX or doc_embeddings is None:
+            return None
+        ann_index = IVFIndex.build(doc_embeddings, nlist=settings.ANN_NLIST, centroids=centroids, vectors=vectors)
+        if ann_index is not None:
+            logger.info(f"✓ ANN index built: {ann_index.nlist} lists over {len(ann_index.list_ids)} documents")
+        return ann_index
+    
+    def _get_query_embedding(self, processed_query: str) -> Optional[np.ndarray]:
+        """Return the L2-normalized mean word vector of a query, if any."""
+        if self.word_vectors is None:
+            return None
+        
+        query_vectors = [
+            self.word_vectors[word]
+            for word in processed_query.split()
+            if word in self.word_vectors
+        ]
+        if not query_vectors:
+            return None
+        
+        query_vec = np.mean(query_vectors, axis=0, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm == 0:
+            return None
+        return query_vec / norm
+    
+    def _get_word2vec_scores(
+        self,
+        view: SegmentedIndex,
+        query_embedding: Optional[np.ndarray],
+        indices: np.ndarray
+    ) -> np.ndarray:
+        """
+        Calculate semantic similarity for candidate documents using Word2Vec Skip-gram.
+        
+        Equivalent to the cosine similarity of the mean query and document word
+        vectors, clipped at zero, computed as one matrix-vector product.
+        """
+        if query_embedding is None or view.doc_embeddings is None or len(indices) == 0:
+            return np.zeros(len(indices), dtype=np.float32)
+        
+        scores = view.doc_embeddings[indices] @ query_embedding
+        return np.maximum(scores, 0.0)
     
-    def search(self, query: str, max_results: int = None) -> Dict[str, Any]:
+    def _get_word2vec_scores_batch(
+        self,
+        view: SegmentedIndex,
+        query_embeddings: List[Optional[np.ndarray]],
+        candidate_lists: List[np.ndarray]
+    ) -> List[np.ndarray]:
+        """
+        Calculate Word2Vec similarities for several queries at once.
+        
+        The embeddings of the union of all candidates are gathered once and
+        multiplied with all query embeddings in a single matrix product.
+        """
+        scores = [np.zeros(len(candidates), dtype=np.float32) for candidates in candidate_lists]
+        active = [i for i, embedding in enumerate(query_embeddings) if embedding is not None]
+        if view.doc_embeddings is None or not active:
+            return scores
+        
+        union = np.unique(np.concatenate([candidate_lists[i] for i in active]))
+        if len(union) == 0:
+            return scores
+        query_matrix = np.vstack([query_embeddings[i] for i in active])
+        union_scores = np.maximum(view.doc_embeddings[union] @ query_matrix.T, 0.0)
+        
+        for column, i in enumerate(active):
+            rows = np.searchsorted(union, candidate_lists[i])
+            scores[i] = union_scores[rows, column]
+        return scores
+    
+    def _lexical_min_score(self, view: SegmentedIndex, options: FusionOptions) -> float:
+        """Lowest lexical score a hybrid candidate can need (seeds dynamic pruning)."""
+        # Linear fusion keeps weak lexical matches: their semantic score may lift them over the threshold
+        if view.scorer.normalized and (options.method == "rrf" or options.semantic_weight == 0):
+            return settings.MIN_SIMILARITY_THRESHOLD
+        return 0.0
+    
+    def _normalize_lexical_scores(self, view: SegmentedIndex, top_scores: np.ndarray) -> np.ndarray:
+        """Scale unbounded scores (BM25) to [0, 1] relative to the best match."""
+        if not view.scorer.normalized and len(top_scores):
+            return top_scores / top_scores[0]
+        return top_scores
+    
+    def _filter_candidates(self, doc_indices: np.ndarray, scores: np.ndarray):
+        """Drop candidates below ``MIN_SIMILARITY_THRESHOLD``."""
+        keep = scores >= settings.MIN_SIMILARITY_THRESHOLD
+        return doc_indices[keep], scores[keep]
+    
+    def _lexical_candidates(
+        self,
+        view: SegmentedIndex,
+        top_indices: np.ndarray,
+        top_scores: np.ndarray,
+        options: FusionOptions
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Turn the best lexical matches into the lexical candidate list.
+        
+        Scores are normalized to [0, 1]. Reciprocal-rank fusion has no fused
+        score to threshold, so its list keeps only matches above
+        ``MIN_SIMILARITY_THRESHOLD``; linear fusion thresholds the fused score.
+        """
+        top_scores = self._normalize_lexical_scores(view, top_scores)
+        keep = top_scores > 0
+        if options.method == "rrf":
+            keep &= top_scores >= settings.MIN_SIMILARITY_THRESHOLD
+        return top_indices[keep][:options.lexical_depth], top_scores[keep][:options.lexical_depth]
+    
+    def _semantic_candidates_batch(
+        self,
+        view: SegmentedIndex,
+        query_embeddings: List[Optional[np.ndarray]],
+        options: List[FusionOptions],
+        nprobes: List[int],
+        search_filters: List[Optional[SearchFilter]],
+        filter_masks: Dict[Optional[SearchFilter], Optional[List[np.ndarray]]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Retrieve the semantic candidate list of every query, whatever their terms.
+        
+        Queries that share ``nprobe`` and category filter are retrieved
+        together at the largest depth among them and cut to their own depth.
+        Similarities are clipped to [0, 1] and matches below
+        ``MIN_SIMILARITY_THRESHOLD`` dropped.
+        
+        Args:
+            filter_masks: Per-segment masks of every category filter in use
+                (see ``SegmentedIndex.filter_masks``)
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        candidates = [empty] * len(query_embeddings)
+        if view.doc_embeddings is None:
+            return candidates
+        
+        groups: Dict[Tuple[int, Optional[SearchFilter]], List[int]] = {}
+        for i, (embedding, option) in enumerate(zip(query_embeddings, options)):
+            if embedding is not None and option.semantic_depth > 0 and option.semantic_weight > 0:
+                groups.setdefault((nprobes[i], search_filters[i]), []).append(i)
+        for (nprobe, search_filter), members in groups.items():
+            depth = max(options[i].semantic_depth for i in members)
+            nearest = view.nearest_batch(
+                np.vstack([query_embeddings[i] for i in members]), depth, nprobe, filter_masks[search_filter]
+            )
+            for i, (doc_indices, scores) in zip(members, nearest):
+                depth = options[i].semantic_depth
+                candidates[i] = self._filter_candidates(doc_indices[:depth], np.clip(scores[:depth], 0.0, 1.0))
+        return candidates
+    
+    def _fuse(
+        self,
+        view: SegmentedIndex,
+        options: FusionOptions,
+        lexical: Tuple[np.ndarray, np.ndarray],
+        semantic: Tuple[np.ndarray, np.ndarray],
+        union: np.ndarray,
+        union_semantic_scores: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, Tuple[np.ndarray, ...]]:
+        """
+        Merge the lexical and semantic candidate lists and rank the union.
+        
+        Linear fusion takes the weighted mean of every candidate's lexical
+        score (0 outside the lexical list) and its exact Word2Vec similarity
+        (``union_semantic_scores``) and drops fused scores below
+        ``MIN_SIMILARITY_THRESHOLD``. Reciprocal-rank fusion uses the ranks in
+        both lists. With a recency weight, the fused scores of the matches are
+        multiplied by their age decay in one vectorized step before ranking.
+        
+        Returns:
+            Tuple of (doc indices, fused scores) of every matching candidate,
+            best first, and the (lexical, semantic, fused) score columns of
+            the union for logging
+        """
+        weights = (options.lexical_weight, options.semantic_weight)
+        lexical_column = aligned_scores(union, *lexical)
+        if options.method == "rrf":
+            semantic_column = aligned_scores(union, *semantic)
+            union, fused = reciprocal_rank_fusion((lexical[0], semantic[0]), weights, settings.RRF_K)
+            min_score = 0.0
+        else:
+            semantic_column = union_semantic_scores
+            fused = linear_fusion((lexical_column, semantic_column), weights)
+            min_score = settings.MIN_SIMILARITY_THRESHOLD
+        boost = None
+        if options.recency_weight > 0:
+            boost = view.recency_boost(union, options.recency_weight, options.recency_half_life)
+        doc_indices, scores = rank_fused(union, fused, len(union), min_score, boost)
+        return doc_indices, scores, (lexical_column, semantic_column, fused)
+    
+    def _serialize_results(
+        self,
+        view: SegmentedIndex,
+        doc_indices: np.ndarray,
+        scores: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Fetch the ranked documents and assemble the result dictionaries."""
+        results = []
+        for idx, score in zip(doc_indices, scores):
+            doc = view.documents[idx]
+            results.append({
+                "id": doc["id"],
+                "title": doc["title"] or "Untitled",
+                "content": doc["content"],
+                "category": doc["category"],
+                "date": doc["date"],
+                "score": float(score)
+            })
+        return results
+    
+    def _log_candidates(self, union: np.ndarray, columns: Tuple[np.ndarray, ...]) -> None:
+        """Log the scores of every candidate (DEBUG only; callers check the level)."""
+        for idx, lexical_score, semantic_score, fused_score in zip(union, *columns):
+            logger.debug("candidate", extra={"fields": {
+                "doc": int(idx),
+                "lexical": float(lexical_score),
+                "semantic": float(semantic_score),
+                "fused": float(fused_score),
+            }})
+    
+    def _log_search(
+        self,
+        query: str,
+        processed_query: str,
+        results: List[Dict[str, Any]],
+        trace: SearchTrace,
+        **fields: Any
+    ) -> None:
+        """Log a finished search with its stage timings (DEBUG only; callers check the level)."""
+        logger.debug("search", extra={"fields": {
+            "query": query,
+            "processed_query": processed_query,
+            **fields,
+            "results": len(results),
+            "total_ms": round(1000 * trace.elapsed, 4),
+            **trace.as_fields(),
+        }})
+        for rank, result in enumerate(results, 1):
+            logger.debug("result", extra={"fields": {
+                "rank": rank,
+                "id": result["id"],
+                "score": result["score"],
+                "title": result["title"][:60],
+            }})
+    
+    def _semantic_retrieve(
+        self,
+        view: SegmentedIndex,
+        processed_query: str,
+        k: int,
+        nprobe: int,
+        trace: SearchTrace,
+        masks: Optional[List[np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retrieve the documents nearest to the query embedding, whatever their terms.
+        
+        ``masks`` restricts retrieval to the documents passing a category
+        filter (see ``SegmentedIndex.filter_masks``).
+        
+        Returns:
+            Tuple of (doc indices, cosine similarities clipped to [0, 1]),
+            best first and without matches below ``MIN_SIMILARITY_THRESHOLD``
+        """
+        if view.doc_embeddings is None:
+            raise SearchModeError("Semantic search needs document embeddings; enable USE_WORD2VEC and rebuild the index")
+        query_embedding = self._get_query_embedding(processed_query)
+        trace.mark("vectorize")
+        
+        if query_embedding is None:
+            doc_indices, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        else:
+            doc_indices, scores = view.nearest(query_embedding, k, nprobe, masks)
+        doc_indices, scores = self._filter_candidates(doc_indices, np.clip(scores, 0.0, 1.0))
+        trace.mark("semantic_retrieve")
+        return doc_indices, scores
+    
+    def search(
+        self,
+        query: str,
+        max_results: int = None,
+        mode: str = "hybrid",
+        nprobe: Optional[int] = None,
+        fusion: Optional[str] = None,
+        lexical_depth: Optional[int] = None,
+        semantic_depth: Optional[int] = None,
+        lexical_weight: Optional[float] = None,
+        semantic_weight: Optional[float] = None,
+        categories: Optional[List[str]] = None,
+        exclude_categories: Optional[List[str]] = None,
+        date_from: Optional[Any] = None,
+        date_to: Optional[Any] = None,
+        within_days: Optional[int] = None,
+        recency_weight: Optional[float] = None,
+        recency_half_life: Optional[float] = None,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        spelling: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Search documents using hybrid TF-IDF and Word2Vec approach.
         
+        Details are logged only when the ``app`` logger is at DEBUG level.
+        
         Args:
             query: Search query string
             max_results: Maximum number of results to return
+            mode: "hybrid" retrieves lexical and semantic candidates
+                separately and fuses them; "semantic" retrieves the nearest
+                documents by embedding alone, so matches need not share any
+                term with the query
+            nprobe: Inverted lists scanned by semantic retrieval
+                (``ANN_NPROBE`` if None, 0 for an exact scan)
+            fusion: Hybrid only: "linear" or "rrf" (``HYBRID_FUSION`` if None)
+            lexical_depth: Hybrid only: lexical candidates (``LEXICAL_DEPTH`` if None)
+            semantic_depth: Hybrid only: semantic candidates (``SEMANTIC_DEPTH`` if None)
+            lexical_weight: Hybrid only: weight of the lexical list (``LEXICAL_WEIGHT`` if None)
+            semantic_weight: Hybrid only: weight of the semantic list (``SEMANTIC_WEIGHT`` if None)
+            categories: Only return documents of these categories (case-insensitive)
+            exclude_categories: Never return documents of these categories
+            date_from: Only documents published on or after this date (date or "YYYY-MM-DD")
+            date_to: Only documents published on or before this date
+            within_days: Only documents of the last ``within_days`` days,
+                counted back from the newest document
+            recency_weight: Hybrid only: share of the score that decays with
+                document age (``RECENCY_WEIGHT`` if None, 0 disables)
+            recency_half_life: Hybrid only: days after which that share
+                halves (``RECENCY_HALF_LIFE_DAYS`` if None)
+            offset: Number of ranked matches to skip
+            cursor: ``next_cursor`` of the previous page of the same query
+                and options; overrides ``offset``
+            spelling: "off", "suggest" (report a correction of misspelled
+                words as ``did_you_mean``) or "auto" (also search the
+                correction instead); ``SPELL_CORRECTION`` if None
             
         Returns:
-            Dictionary with search results and metadata
+            Dictionary with search results and metadata, including the
+            spelling correction (``did_you_mean``, and ``corrected`` if the
+            results are for it), the
+            cursor of the following page (``next_cursor``, None on the last
+            page), the number of matching documents per category (``facets``), the
+            seconds spent per stage (``stage_timings``) and the number of
+            candidates scored (``candidates``) for metrics
+        
+        Raises:
+            SearchModeError: If semantic search is requested without
+                embeddings, or the fusion options, filters, cursor or
+                spelling mode are invalid
         """
-        start_time = time.time()
-        print(f"\n🔍 SEARCH STARTED - Query: '{query}'")
+        trace = SearchTrace()
         
         if not query or not query.strip():
-            print("❌ Empty query received")
+            logger.debug("Empty query received")
             return {
                 "query": query,
                 "results": [],
                 "total_results": 0,
-                "execution_time": 0.0
+                "offset": 0,
+                "next_cursor": None,
+                "facets": {},
+                "did_you_mean": None,
+                "corrected": False,
+                "execution_time": 0.0,
+                "stage_timings": {},
+                "candidates": 0,
+                "cached": False
             }
         
         max_results = max_results or settings.MAX_RESULTS
-        print(f"✓ Step 1: Query received - max_results: {max_results}")
+        nprobe = settings.ANN_NPROBE if nprobe is None else nprobe
+        options = self._fusion_options(
+            mode, fusion, lexical_depth, semantic_depth, lexical_weight, semantic_weight,
+            recency_weight, recency_half_life
+        )
+        debug = logger.isEnabledFor(logging.DEBUG)
         
-        processed_query = self._preprocess_text(query)
-        print(f"✓ Step 2: Query preprocessed - '{processed_query}'")
+        # Pick up segments ingested by other workers, then search one consistent view
+        self._refresh_segments()
+        view = self.view
+        search_filter = self._search_filter(
+            view, categories, exclude_categories, date_from, date_to, within_days
+        )
+        trace.skip()
         
-        # TF-IDF similarity (fast vectorized operation)
-        query_vector = self.tfidf_vectorizer.transform([processed_query])
-        tfidf_scores = cosine_similarity(query_vector, self.tfidf_matrix)[0]
-        print(f"✓ Step 3: TF-IDF vectorization complete - {len(tfidf_scores)} document scores calculated")
-        print(f"  TF-IDF scores: min={tfidf_scores.min():.4f}, max={tfidf_scores.max():.4f}, mean={tfidf_scores.mean():.4f}")
+        processed_query = self._preprocess_text(view, query)
+        trace.mark("preprocess")
         
-        # Get top candidates from TF-IDF (limit to top 100 for Word2Vec processing)
-        top_candidate_count = min(100, len(self.documents))
-        top_indices = np.argsort(tfidf_scores)[-top_candidate_count:][::-1]
-        print(f"✓ Step 4: Top {top_candidate_count} candidates selected from TF-IDF")
+        processed_query, correction = self._correct_query(view, processed_query, spelling)
+        trace.mark("spell_correct")
         
-        # Only calculate Word2Vec for top TF-IDF candidates
-        results = []
-        threshold_msg = f"Threshold: {settings.MIN_SIMILARITY_THRESHOLD}"
-        print(f"✓ Step 5: Processing candidates - {threshold_msg}")
+        # All pages of a query share one result set; a cursor carries the offset of its page
+        result_key = self._cache_key(processed_query, mode, nprobe, options, search_filter)
+        offset = self._page_offset(result_key, offset, cursor)
+        
+        # Serve repeated pages from the result cache without scoring
+        cache_key = (result_key, offset, max_results)
+        cached = self.result_cache.get(cache_key, view.version)
+        if cached is not None:
+            cached_results, facets, next_cursor = cached
+            execution_time = trace.elapsed
+            if debug:
+                self._log_search(query, processed_query, cached_results, trace, offset=offset, cached=True)
+            return {
+                "query": query,
+                "results": list(cached_results),
+                "total_results": len(cached_results),
+                "offset": offset,
+                "next_cursor": next_cursor,
+                "facets": dict(facets),
+                **correction,
+                "execution_time": round(execution_time, 4),
+                "stage_timings": trace.spans,
+                "candidates": 0,
+                "cached": True
+            }
+        
+        # Later pages are slices of the ranked result set; pages beyond it extend it
+        end = offset + max_results
+        previous = result_set = self.result_sets.get(result_key, view.version)
+        scored = result_set is None or not result_set.covers(end)
+        if scored:
+            # Documents outside the category and date filters are never scored
+            masks = view.filter_masks(search_filter)
+            if mode == "semantic":
+                result_set = self._semantic_result_set(
+                    view, processed_query, nprobe, masks, end, previous, trace
+                )
+            else:
+                result_set = self._hybrid_result_set(
+                    view, processed_query, options, nprobe, search_filter, masks, end, previous, trace
+                )
+            if previous is not None and offset:
+                result_set = keep_served(result_set, previous, offset)
+                result_set = result_set._replace(facets=view.facet_counts(result_set.doc_ids))
+            self.result_sets.put(result_key, result_set, view.version)
+        
+        # Only the returned documents are fetched from the document store
+        results, next_cursor = self._page(view, result_set, result_key, offset, max_results)
+        self.result_cache.put(cache_key, (tuple(results), result_set.facets, next_cursor), view.version)
+        trace.mark("serialize")
+        
+        execution_time = trace.elapsed
+        if debug:
+            self._log_search(
+                query, processed_query, results, trace,
+                max_results=max_results,
+                offset=offset,
+                mode=mode,
+                nprobe=nprobe,
+                scorer=settings.LEXICAL_SCORER,
+                matches=len(result_set.doc_ids),
+                candidates=result_set.candidates if scored else 0,
+                **(search_filter.as_fields() if search_filter else {}),
+                **(options.as_fields() if options else {})
+            )
+        
+        return {
+            "query": query,
+            "results": results,
+            "total_results": len(results),
+            "offset": offset,
+            "next_cursor": next_cursor,
+            "facets": result_set.facets,
+            **correction,
+            "execution_time": round(execution_time, 4),
+            "stage_timings": trace.spans,
+            "candidates": result_set.candidates if scored else 0,
+            "cached": not scored
+        }
+    
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Complete a partially typed query.
         
-        filtered_count = 0
-        processed_count = 0
+        Args:
+            prefix: Typed text; a trailing space completes the next word
+            limit: Number of completions (``SUGGEST_TOP_K`` if None, and at most that)
+            
+        Returns:
+            Dictionary with the completions, most frequent first, each with
+            its text, kind ("term", "phrase" or "title") and document frequency
+        """
+        start_time = time.perf_counter()
+        # Keys are normalized without stop-word removal or lemmas, so partial words stay intact
+        normalized = normalize_text(prefix)
+        if normalized and prefix[-1:].isspace():
+            normalized += " "
+        suggestions = []
+        suggest_index = self.view.models.suggest_index if self.view is not None else None
+        if normalized and suggest_index is not None:
+            suggestions = suggest_index.complete(normalized, limit or settings.SUGGEST_TOP_K)
+        return {
+            "prefix": prefix,
+            "suggestions": suggestions,
+            "execution_time": round(time.perf_counter() - start_time, 6)
+        }
+    
+    def _hybrid_result_set(
+        self,
+        view: SegmentedIndex,
+        processed_query: str,
+        options: FusionOptions,
+        nprobe: int,
+        search_filter: Optional[SearchFilter],
+        masks: Optional[List[np.ndarray]],
+        end: int,
+        previous: Optional[ResultSet],
+        trace: SearchTrace
+    ) -> ResultSet:
+        """
+        Rank the hybrid matches of a query at least ``end`` deep.
+        
+        The lexical and semantic depths are multiplied by a power of two
+        until the fused matches reach ``end`` or deeper lists cannot add any.
+        Extending ``previous`` keeps the Word2Vec similarity of every
+        candidate it already rescored, so only new candidates are rescored.
+        """
+        # Lexical similarity accumulated over the query terms' posting lists
+        query_vector = view.vectorizer.transform([processed_query])
+        use_word2vec = self.word_vectors is not None and settings.USE_WORD2VEC and options.semantic_weight > 0
+        query_embedding = self._get_query_embedding(processed_query) if use_word2vec else None
+        trace.mark("vectorize")
         
-        for idx in top_indices:
-            doc = self.documents[idx]
-            tfidf_score = float(tfidf_scores[idx])
+        scale = self._depth_scale(options, end, previous)
+        while True:
+            scaled = self._scaled_options(options, scale)
+            top_indices, top_scores = view.scorer.top_k(
+                query_vector,
+                scaled.lexical_depth,
+                prune=settings.USE_DYNAMIC_PRUNING,
+                min_score=self._lexical_min_score(view, scaled),
+                mask=masks
+            )
+            trace.mark("lexical_score")
+            
+            lexical = self._lexical_candidates(view, top_indices, top_scores, scaled)
+            trace.mark("candidate_selection")
+            
+            # Nearest documents by embedding, independent of the lexical matches
+            semantic = self._semantic_candidates_batch(
+                view, [query_embedding], [scaled], [nprobe], [search_filter], {search_filter: masks}
+            )[0]
+            trace.mark("semantic_retrieve")
+            
+            union = candidate_union(lexical[0], semantic[0])
+            union_semantic_scores = None
+            if options.method == "linear":
+                union_semantic_scores = self._rescore_union(view, query_embedding, union, previous)
+                trace.mark("semantic_rescore")
             
-            # Skip very low TF-IDF scores
-            if tfidf_score < settings.MIN_SIMILARITY_THRESHOLD:
-                filtered_count += 1
-                print(f"  ↩️  Skipping doc {idx+1} - TF-IDF score {tfidf_score:.4f} below threshold")
+            doc_indices, scores, columns = self._fuse(view, scaled, lexical, semantic, union, union_semantic_scores)
+            trace.mark("fusion")
+            
+            complete = self._retrieval_complete(view, scaled, lexical, semantic, query_embedding)
+            previous = ResultSet(
+                doc_indices, scores, {}, len(union), complete, scale, union, union_semantic_scores
+            )
+            if previous.covers(end):
                 break
+            scale *= 2
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            self._log_candidates(union, columns)
+            logger.debug("hybrid_retrieval", extra={"fields": {
+                "query_terms": query_vector.nnz,
+                "depth_scale": scale,
+                "lexical_candidates": len(lexical[0]),
+                "semantic_candidates": len(semantic[0]),
+                "candidates": len(union),
+                "matches": len(doc_indices),
+                "complete": complete,
+            }})
+        return previous._replace(facets=view.facet_counts(doc_indices))
+    
+    def _semantic_result_set(
+        self,
+        view: SegmentedIndex,
+        processed_query: str,
+        nprobe: int,
+        masks: Optional[List[np.ndarray]],
+        end: int,
+        previous: Optional[ResultSet],
+        trace: SearchTrace
+    ) -> ResultSet:
+        """
+        Retrieve at least ``end`` nearest documents (``SEMANTIC_DEPTH`` at first, doubling when extended).
+        """
+        k = max(end, settings.SEMANTIC_DEPTH, 2 * len(previous.doc_ids) if previous is not None else 0)
+        k = min(k, max(end, settings.MAX_RESULT_DEPTH))
+        doc_indices, scores = self._semantic_retrieve(view, processed_query, k, nprobe, trace, masks)
+        complete = len(doc_indices) < k or k >= settings.MAX_RESULT_DEPTH
+        return ResultSet(doc_indices, scores, view.facet_counts(doc_indices), len(doc_indices), complete)
+    
+    @staticmethod
+    def _depth_scale(options: FusionOptions, end: int, previous: Optional[ResultSet]) -> int:
+        """Smallest power-of-two depth multiple, above the previous one, whose candidates could fill ``end``."""
+        scale = 2 * previous.scale if previous is not None else 1
+        per_scale = max(1, options.lexical_depth + options.semantic_depth)
+        while scale * per_scale < end:
+            scale *= 2
+        return scale
+    
+    @staticmethod
+    def _scaled_options(options: FusionOptions, scale: int) -> FusionOptions:
+        """Options with both depths multiplied by ``scale``, up to ``MAX_RESULT_DEPTH``."""
+        if scale == 1:
+            return options
+        return options._replace(
+            lexical_depth=min(options.lexical_depth * scale, max(options.lexical_depth, settings.MAX_RESULT_DEPTH)),
+            semantic_depth=min(options.semantic_depth * scale, max(options.semantic_depth, settings.MAX_RESULT_DEPTH))
+        )
+    
+    @staticmethod
+    def _retrieval_complete(
+        view: SegmentedIndex,
+        options: FusionOptions,
+        lexical: Tuple[np.ndarray, np.ndarray],
+        semantic: Tuple[np.ndarray, np.ndarray],
+        query_embedding: Optional[np.ndarray]
+    ) -> bool:
+        """Whether deeper candidate lists could not add hybrid matches."""
+        lexical_done = options.lexical_depth == 0 or len(lexical[0]) < options.lexical_depth
+        semantic_done = (
+            query_embedding is None or view.doc_embeddings is None
+            or options.semantic_depth == 0 or options.semantic_weight == 0
+            or len(semantic[0]) < options.semantic_depth
+        )
+        at_limit = max(options.lexical_depth, options.semantic_depth) >= settings.MAX_RESULT_DEPTH
+        return (lexical_done and semantic_done) or at_limit
+    
+    def _rescore_union(
+        self,
+        view: SegmentedIndex,
+        query_embedding: Optional[np.ndarray],
+        union: np.ndarray,
+        previous: Optional[ResultSet]
+    ) -> np.ndarray:
+        """Word2Vec similarity of the candidate union, reusing the scores of a previous union."""
+        if previous is None or previous.union_semantic_scores is None:
+            return self._get_word2vec_scores(view, query_embedding, union)
+        scores = aligned_scores(union, previous.union, previous.union_semantic_scores)
+        new = ~np.isin(union, previous.union, assume_unique=True)
+        if new.any():
+            scores[new] = self._get_word2vec_scores(view, query_embedding, union[new])
+        return scores
+    
+    def _respond_page(
+        self,
+        responses: List[Optional[Dict[str, Any]]],
+        position: int,
+        query: str,
+        view: SegmentedIndex,
+        result_set: ResultSet,
+        result_key: Tuple,
+        max_results: int
+    ) -> None:
+        """Serve the first page of a freshly scored batch query and cache it."""
+        results, next_cursor = self._page(view, result_set, result_key, 0, max_results)
+        self.result_cache.put((result_key, 0, max_results), (tuple(results), result_set.facets, next_cursor), view.version)
+        responses[position] = {
+            "query": query,
+            "results": results,
+            "offset": 0,
+            "next_cursor": next_cursor,
+            "facets": result_set.facets,
+            "candidates": result_set.candidates,
+            "cached": False
+        }
+    
+    def _page(
+        self,
+        view: SegmentedIndex,
+        result_set: ResultSet,
+        result_key: Tuple,
+        offset: int,
+        max_results: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Serialize one page of a result set; return it with the cursor of the next page (None on the last)."""
+        end = offset + max_results
+        results = self._serialize_results(view, result_set.doc_ids[offset:end], result_set.scores[offset:end])
+        more = end < len(result_set.doc_ids) or not result_set.complete
+        next_cursor = encode_cursor(result_key, end) if more and end < settings.MAX_RESULT_DEPTH else None
+        return results, next_cursor
+    
+    @staticmethod
+    def _page_offset(result_key: Tuple, offset: Optional[int], cursor: Optional[str]) -> int:
+        """Offset of the requested page; a cursor takes precedence over ``offset``."""
+        if cursor:
+            try:
+                offset = decode_cursor(cursor, result_key)
+            except ValueError as e:
+                raise SearchModeError(str(e)) from e
+        offset = offset or 0
+        if not 0 <= offset < settings.MAX_RESULT_DEPTH:
+            raise SearchModeError(f"offset must be in [0, MAX_RESULT_DEPTH={settings.MAX_RESULT_DEPTH})")
+        return offset
+    
+    @staticmethod
+    def _correct_query(
+        view: SegmentedIndex,
+        processed_query: str,
+        spelling: Optional[str]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Spell-correct a preprocessed query.
+        
+        Returns:
+            Tuple of (query to search, ``did_you_mean`` and ``corrected``
+            response fields); the correction is only searched in "auto" mode
+        """
+        spelling = spelling or settings.SPELL_CORRECTION
+        if spelling not in SPELLING_MODES:
+            raise SearchModeError(f"spelling must be one of {', '.join(SPELLING_MODES)}")
+        correction = None
+        spell_corrector = view.models.spell_corrector
+        if spelling != "off" and spell_corrector is not None:
+            correction = spell_corrector.correct(processed_query)
+        corrected = correction is not None and spelling == "auto"
+        return (
+            correction if corrected else processed_query,
+            {"did_you_mean": correction, "corrected": corrected}
+        )
+    
+    @staticmethod
+    def _fusion_options(mode: str, *overrides: Any) -> Optional[FusionOptions]:
+        """Resolve the fusion options of a hybrid search (None for semantic searches)."""
+        if mode == "semantic":
+            return None
+        try:
+            return FusionOptions.resolve(*overrides)
+        except ValueError as e:
+            raise SearchModeError(str(e)) from e
+    
+    @staticmethod
+    def _search_filter(
+        view: SegmentedIndex,
+        categories: Optional[List[str]] = None,
+        exclude_categories: Optional[List[str]] = None,
+        date_from: Optional[Any] = None,
+        date_to: Optional[Any] = None,
+        within_days: Optional[int] = None
+    ) -> Optional[SearchFilter]:
+        """Resolve the requested category and date restrictions against the view."""
+        try:
+            date_range = DateRange.resolve(date_from, date_to, within_days, view.latest_day)
+        except ValueError as e:
+            raise SearchModeError(str(e)) from e
+        return SearchFilter.combine(CategoryFilter.resolve(categories, exclude_categories), date_range)
+    
+    @staticmethod
+    def _cache_key(
+        processed_query: str,
+        mode: str,
+        nprobe: int,
+        options: Optional[FusionOptions] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> Tuple:
+        """Result set cache key; nprobe only matters when semantic candidates are retrieved."""
+        retrieves_semantic = options is None or (options.semantic_depth > 0 and options.semantic_weight > 0)
+        return processed_query, mode, nprobe if retrieves_semantic else None, options, search_filter
+    
+    def search_batch(self, queries: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """
+        Search many queries at once.
+        
+        All uncached hybrid queries are vectorized in one ``transform`` call
+        and scored together (one sparse matrix product for TF-IDF); their
+        semantic candidates are retrieved per ``nprobe`` in one embedding
+        batch, and Word2Vec rescoring is batched over the union of their
+        candidates. Queries with different filters are scored in separate
+        lexical batches. Semantic queries are retrieved one by one, and so
+        are later pages (``offset`` or ``cursor``) that their result set
+        does not cover yet.
+        
+        Args:
+            queries: List of (query, max_results) pairs, optionally followed
+                by a dictionary of ``search`` keyword options (mode, nprobe,
+                fusion, depths, weights, filters, paging and spelling)
             
-            processed_count += 1
-            print(f"  📄 Processing doc {idx+1} - '{doc.get('title', 'Untitled')[:50]}...' (TF-IDF: {tfidf_score:.4f})")
+        Returns:
+            List of search result dictionaries in request order; each
+            ``execution_time`` and ``stage_timings`` is the batch time
+            amortized over the queries
+        """
+        trace = SearchTrace()
+        
+        self._refresh_segments()
+        view = self.view
+        trace.skip()
+        
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        corrections: List[Dict[str, Any]] = [{"did_you_mean": None, "corrected": False}] * len(queries)
+        pending, semantic_pending, paged = [], [], []
+        for position, (query, max_results, *extra) in enumerate(queries):
+            if not query or not query.strip():
+                responses[position] = {
+                    "query": query, "results": [], "offset": 0, "next_cursor": None, "facets": {},
+                    "candidates": 0, "cached": False
+                }
+                continue
             
-            # Word2Vec semantic similarity (only for top candidates)
-            word2vec_score = 0.0
-            if self.word2vec_model and settings.USE_WORD2VEC:
-                doc_text = self._preprocess_text(
-                    f"{doc.get('title', '')} {doc.get('content', '')}"
+            options = extra[0] if extra else {}
+            mode = options.get("mode", "hybrid")
+            nprobe = options.get("nprobe")
+            nprobe = settings.ANN_NPROBE if nprobe is None else nprobe
+            fusion_options = self._fusion_options(
+                mode, *(options.get(key) for key in FUSION_REQUEST_OPTIONS)
+            )
+            search_filter = self._search_filter(
+                view, *(options.get(key) for key in FILTER_REQUEST_OPTIONS)
+            )
+            max_results = max_results or settings.MAX_RESULTS
+            processed_query, corrections[position] = self._correct_query(
+                view, self._preprocess_text(view, query), options.get("spelling")
+            )
+            result_key = self._cache_key(processed_query, mode, nprobe, fusion_options, search_filter)
+            offset = self._page_offset(result_key, options.get("offset"), options.get("cursor"))
+            cached = self.result_cache.get((result_key, offset, max_results), view.version)
+            result_set = self.result_sets.get(result_key, view.version) if cached is None else None
+            if cached is not None:
+                cached_results, facets, next_cursor = cached
+                responses[position] = {
+                    "query": query, "results": list(cached_results), "offset": offset, "next_cursor": next_cursor,
+                    "facets": dict(facets), "candidates": 0, "cached": True
+                }
+            elif result_set is not None and result_set.covers(offset + max_results):
+                results, next_cursor = self._page(view, result_set, result_key, offset, max_results)
+                self.result_cache.put(
+                    (result_key, offset, max_results), (tuple(results), result_set.facets, next_cursor), view.version
+                )
+                responses[position] = {
+                    "query": query, "results": results, "offset": offset, "next_cursor": next_cursor,
+                    "facets": result_set.facets, "candidates": 0, "cached": True
+                }
+            elif offset:
+                paged.append((position, query, max_results, options))
+            elif mode == "semantic":
+                semantic_pending.append(
+                    (position, query, processed_query, max_results, result_key, nprobe, search_filter)
                 )
-                word2vec_score = self._get_word2vec_similarity(processed_query, doc_text)
-                print(f"     Word2Vec score: {word2vec_score:.4f}")
             else:
-                print(f"     Word2Vec disabled or unavailable")
+                pending.append(
+                    (position, query, processed_query, max_results, result_key, nprobe, fusion_options, search_filter)
+                )
+        trace.mark("preprocess")
+        
+        search_filters = {item[-1] for item in pending + semantic_pending}
+        filter_masks = {search_filter: view.filter_masks(search_filter) for search_filter in search_filters}
+        
+        if pending:
+            fusion_options = [item[6] for item in pending]
+            query_matrix = view.vectorizer.transform([item[2] for item in pending])
+            trace.mark("vectorize")
             
-            # Hybrid scoring (70% TF-IDF, 30% Word2Vec)
-            combined_score = (0.7 * tfidf_score) + (0.3 * word2vec_score)
-            print(f"     Combined score: {combined_score:.4f}")
+            # One lexical pass per category filter at the deepest requested depth;
+            # every query keeps its own depth
+            top_candidates: List[Any] = [None] * len(pending)
+            groups: Dict[Optional[SearchFilter], List[int]] = {}
+            for i, item in enumerate(pending):
+                groups.setdefault(item[7], []).append(i)
+            for search_filter, members in groups.items():
+                group_candidates = view.scorer.top_k_batch(
+                    query_matrix[members],
+                    max(fusion_options[i].lexical_depth for i in members),
+                    prune=settings.USE_DYNAMIC_PRUNING,
+                    min_score=min(self._lexical_min_score(view, fusion_options[i]) for i in members),
+                    mask=filter_masks[search_filter]
+                )
+                for i, candidates in zip(members, group_candidates):
+                    top_candidates[i] = candidates
+            trace.mark("lexical_score")
             
-            results.append({
-                "id": doc.get("id", str(idx)),
-                "title": doc.get("title", "Untitled"),
-                "content": doc.get("content", ""),
-                "category": doc.get("category"),
-                "score": float(combined_score)
-            })
+            lexical_lists = [
+                self._lexical_candidates(view, top_indices, top_scores, options)
+                for (top_indices, top_scores), options in zip(top_candidates, fusion_options)
+            ]
+            trace.mark("candidate_selection")
+            
+            use_word2vec = self.word_vectors is not None and settings.USE_WORD2VEC
+            query_embeddings = [
+                self._get_query_embedding(item[2]) if use_word2vec and item[6].semantic_weight > 0 else None
+                for item in pending
+            ]
+            semantic_lists = self._semantic_candidates_batch(
+                view, query_embeddings, fusion_options, [item[5] for item in pending],
+                [item[7] for item in pending], filter_masks
+            )
+            trace.mark("semantic_retrieve")
+            
+            unions = [
+                candidate_union(lexical[0], semantic[0])
+                for lexical, semantic in zip(lexical_lists, semantic_lists)
+            ]
+            linear = [i for i, options in enumerate(fusion_options) if options.method == "linear"]
+            union_semantic_scores: List[Optional[np.ndarray]] = [None] * len(pending)
+            if linear:
+                rescored = self._get_word2vec_scores_batch(
+                    view, [query_embeddings[i] for i in linear], [unions[i] for i in linear]
+                )
+                for i, scores in zip(linear, rescored):
+                    union_semantic_scores[i] = scores
+                trace.mark("semantic_rescore")
+            
+            for i, item in enumerate(pending):
+                position, query, processed_query, max_results, result_key, nprobe, options, search_filter = item
+                doc_indices, scores, _ = self._fuse(
+                    view, options, lexical_lists[i], semantic_lists[i], unions[i], union_semantic_scores[i]
+                )
+                complete = self._retrieval_complete(
+                    view, options, lexical_lists[i], semantic_lists[i], query_embeddings[i]
+                )
+                result_set = ResultSet(
+                    doc_indices, scores, {}, len(unions[i]), complete, 1, unions[i], union_semantic_scores[i]
+                )
+                if result_set.covers(max_results):
+                    result_set = result_set._replace(facets=view.facet_counts(doc_indices))
+                else:
+                    # Too few matches at the requested depths: deepen this query alone
+                    result_set = self._hybrid_result_set(
+                        view, processed_query, options, nprobe, search_filter,
+                        filter_masks[search_filter], max_results, result_set, trace
+                    )
+                self.result_sets.put(result_key, result_set, view.version)
+                trace.mark("fusion")
+                self._respond_page(responses, position, query, view, result_set, result_key, max_results)
+                trace.mark("serialize")
+        
+        for position, query, processed_query, max_results, result_key, nprobe, search_filter in semantic_pending:
+            result_set = self._semantic_result_set(
+                view, processed_query, nprobe, filter_masks[search_filter], max_results, None, trace
+            )
+            self.result_sets.put(result_key, result_set, view.version)
+            self._respond_page(responses, position, query, view, result_set, result_key, max_results)
+            trace.mark("serialize")
+        
+        for position, query, max_results, options in paged:
+            responses[position] = self.search(query, max_results, **options)
+        trace.skip()
+        
+        execution_time = trace.elapsed
+        per_query_time = execution_time / len(queries) if queries else 0.0
+        per_query_timings = {stage: seconds / len(queries) for stage, seconds in trace.spans.items()}
+        for response, correction in zip(responses, corrections):
+            response.update(correction)
+            response["total_results"] = len(response["results"])
+            response["execution_time"] = round(per_query_time, 4)
+            response["stage_timings"] = per_query_timings
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("search_batch", extra={"fields": {
+                "queries": len(queries),
+                "scored": len(pending) + len(semantic_pending),
+                "total_ms": round(1000 * execution_time, 4),
+                **trace.as_fields(),
+            }})
+        return responses
+
+    
+    def _reset_base(self) -> None:
+        """Wrap the (re)loaded base index as the first segment."""
+        if not isinstance(self.documents, DocumentStore):
+            # Without a snapshot the freshly loaded documents are encoded in memory
+            self.documents = DocumentStore.from_documents(self.documents)
+        self._base_segment = Segment(
+            BASE_SEGMENT,
+            self.documents,
+            self.tfidf_matrix,
+            self.base_idf,
+            bm25_postings=self.bm25_postings,
+            bm25_doc_lengths=self.bm25_doc_lengths,
+            doc_embeddings=self.doc_embeddings,
+            ann_index=self.ann_index,
+            embedding_matrix=self.embedding_matrix
+        )
+        self._document_ids.pop(BASE_SEGMENT, None)
+        if self.bm25_doc_lengths is not None and len(self.bm25_doc_lengths):
+            # Delta segments are length-normalized against the base averages
+            self.bm25_average_lengths = np.asarray(self.bm25_doc_lengths, dtype=np.float64).mean(axis=0)
+        else:
+            self.bm25_average_lengths = None
+    
+    def _set_view(self, segments: List[Segment], generation: int) -> None:
+        """Publish a new view of the segments (it derives its own query-time idf)."""
+        self.view = SegmentedIndex(
+            segments,
+            version=f"{self.fingerprint}:{generation}",
+            scorer_kind=settings.LEXICAL_SCORER,
+            k1=settings.BM25_K1,
+            rerank=settings.EMBEDDING_RERANK,
+            vectorizer=self.tfidf_vectorizer,
+            models=QueryModels(self.text_preprocessor, self.spell_corrector, self.suggest_index)
+        )
+    
+    def _load_segment(self, name: str) -> Segment:
+        """Attach to a persisted delta segment."""
+        data = index_store.load_segment(self.index_path, name)
+        arrays, matrices = data["arrays"], data["matrices"]
+        return Segment(
+            name,
+            data["documents"],
+            matrices["tfidf"],
+            arrays["tfidf_idf"],
+            bm25_postings=matrices.get("bm25_postings"),
+            bm25_doc_lengths=arrays.get("bm25_doc_lengths"),
+            doc_embeddings=arrays.get("doc_embeddings")
+        )
+    
+    def _apply_segment_state(self, state: Dict[str, Any]) -> None:
+        """Open the segments listed in a segment state, reusing those already attached."""
+        attached = {segment.name: segment for segment in self.view.segments[1:]} if self.view else {}
+        segments = []
+        for entry in state["segments"]:
+            name = entry["name"]
+            if name == BASE_SEGMENT:
+                segment = self._base_segment
+            else:
+                segment = attached.get(name) or self._load_segment(name)
+            deleted = np.zeros(segment.num_documents, dtype=bool)
+            deleted[entry["deleted"]] = True
+            if not np.array_equal(deleted, segment.deleted):
+                segment = segment.with_deleted(deleted)
+            segments.append(segment)
+        
+        for name in set(self._document_ids) - {entry["name"] for entry in state["segments"]}:
+            del self._document_ids[name]
+        self.segment_state = state
+        self._set_view(segments, state["generation"])
+    
+    def _refresh_segments(self, force: bool = False) -> None:
+        """
+        Follow segment changes made by other worker processes.
+        
+        The segment state file is polled at most every
+        ``SEGMENT_REFRESH_INTERVAL`` seconds; the index is only reopened when
+        it changed.
+        """
+        initial = self.view is None
+        if not initial and not settings.PERSIST_INDEX:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_refresh < settings.SEGMENT_REFRESH_INTERVAL:
+            return
+        # Another thread is already refreshing; keep searching the current view
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_refresh = now
+            mtime = index_store.segment_state_mtime(self.index_path) if settings.PERSIST_INDEX else None
+            if not initial and mtime == self._state_mtime:
+                return
+            state = index_store.read_segment_state(self.index_path) if mtime is not None else None
+            if state is None:
+                if not initial:
+                    # Mid-swap or removed; keep serving the current view
+                    return
+                state = {
+                    "generation": 0,
+                    "base_created_at": self.base_created_at,
+                    "next_segment": 1,
+                    "segments": [{"name": BASE_SEGMENT, "deleted": []}]
+                }
+            if state["base_created_at"] != self.base_created_at:
+                # Another worker merged everything into a new base snapshot
+                if not self._load_index():
+                    return
+                self._reset_base()
+            self._state_mtime = mtime
+            self._apply_segment_state(state)
+        finally:
+            self._refresh_lock.release()
+    
+    @contextlib.contextmanager
+    def _writing(self):
+        """Serialize index changes between threads and worker processes."""
+        with self._write_lock:
+            if settings.PERSIST_INDEX:
+                with index_store.build_lock(self.index_path):
+                    self._refresh_segments(force=True)
+                    yield
+            else:
+                yield
+    
+    def _commit_segments(self, segments: List[Segment], next_segment: int) -> None:
+        """Record the new segment list and deletions, then publish the new view."""
+        state = {
+            "generation": self.segment_state["generation"] + 1,
+            "base_created_at": self.base_created_at,
+            "next_segment": next_segment,
+            "segments": [
+                {"name": segment.name, "deleted": np.flatnonzero(segment.deleted).tolist()}
+                for segment in segments
+            ]
+        }
+        if settings.PERSIST_INDEX:
+            index_store.write_segment_state(self.index_path, state)
+            self._state_mtime = index_store.segment_state_mtime(self.index_path)
+        self.segment_state = state
+        self._set_view(segments, state["generation"])
+    
+    def _segment_document_ids(self, segment: Segment) -> Dict[str, int]:
+        """Map document ids to local positions within a segment (built on first use)."""
+        ids = self._document_ids.get(segment.name)
+        if ids is None:
+            ids = {doc_id: local for local, doc_id in enumerate(segment.documents.ids())}
+            self._document_ids[segment.name] = ids
+        return ids
+    
+    def _locate_documents(self, view: SegmentedIndex, doc_ids: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+        """Find the live copy of each document id as (segment position, local id)."""
+        doc_ids = list(doc_ids)
+        locations = {}
+        for position, segment in enumerate(view.segments):
+            segment_ids = self._segment_document_ids(segment)
+            for doc_id in doc_ids:
+                local = segment_ids.get(doc_id)
+                if local is not None and not segment.deleted[local]:
+                    locations[doc_id] = (position, local)
+        return locations
+    
+    @staticmethod
+    def _mark_deleted(segments: List[Segment], locations: Iterable[Tuple[int, int]]) -> List[Segment]:
+        """Return the segments with the given documents marked deleted."""
+        segments = list(segments)
+        masks = {}
+        for position, local in locations:
+            if position not in masks:
+                masks[position] = segments[position].deleted.copy()
+            masks[position][local] = True
+        for position, deleted in masks.items():
+            segments[position] = segments[position].with_deleted(deleted)
+        return segments
+    
+    def _create_segment(self, name: str, documents: List[Dict[str, Any]]) -> Segment:
+        """
+        Index new documents as a delta segment.
+        
+        Uses the fitted vocabulary, the current idf weights and the trained
+        word vectors, so nothing is refit; terms outside the vocabulary are
+        ignored until the next full rebuild.
+        """
+        fields = self._preprocess_fields(documents)
+        corpus = self._join_fields(fields)
+        view = self.view
+        tfidf_idf = np.asarray(view.tfidf_idf)
+        tfidf = view.vectorizer.transform(corpus)
+        
+        field_counts, doc_lengths = self._count_fields(fields)
+        postings = bm25_postings(
+            field_counts,
+            doc_lengths,
+            field_weights=[settings.BM25_TITLE_WEIGHT, settings.BM25_CONTENT_WEIGHT],
+            b=settings.BM25_B,
+            average_lengths=self.bm25_average_lengths
+        )
+        
+        doc_embeddings = None
+        if self.word_vectors is not None:
+            doc_embeddings = self._compute_document_embeddings(corpus)
+        
+        segment = Segment(
+            name,
+            DocumentStore.from_documents(documents),
+            sparse.csc_matrix(tfidf),
+            tfidf_idf,
+            bm25_postings=postings,
+            bm25_doc_lengths=doc_lengths,
+            doc_embeddings=doc_embeddings
+        )
+        if settings.PERSIST_INDEX:
+            self._save_segment(segment)
+        return segment
+    
+    def _save_segment(self, segment: Segment) -> None:
+        """Persist a delta segment so other workers and restarts can attach to it."""
+        index_store.save_segment(
+            self.index_path,
+            segment.name,
+            documents=segment.documents,
+            arrays={
+                "tfidf_idf": segment.tfidf_idf,
+                "bm25_doc_lengths": segment.bm25_doc_lengths,
+                "doc_embeddings": segment.doc_embeddings,
+            },
+            matrices={
+                "tfidf": segment.tfidf,
+                "bm25_postings": segment.bm25_postings,
+            }
+        )
+    
+    def upsert_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Add documents, replacing any existing document with the same id.
         
-        print(f"✓ Step 6: Candidate filtering complete - Processed: {processed_count}, Filtered: {filtered_count}")
+        The documents are written as one delta segment and are searchable as
+        soon as this returns (other workers pick them up within
+        ``SEGMENT_REFRESH_INTERVAL``). Replaced documents are marked deleted.
+        With ``PERSIST_INDEX`` the change is also appended to the ingestion
+        journal, which is folded into the documents of a rebuild.
         
-        # Sort by combined score and limit results
-        results.sort(key=lambda x: x["score"], reverse=True)
-        print(f"✓ Step 7: Results sorted by combined score")
+        Args:
+            documents: Documents with optional ``id``, ``title``, ``content``
+                and ``category``; documents without an id get a generated one
+            
+        Returns:
+            Dictionary with ingestion counts and throughput
+        """
+        start_time = time.time()
+        incoming: Dict[str, Dict[str, Any]] = {}
+        for doc in documents:
+            doc_id = str(doc.get("id") or uuid.uuid4().hex)
+            # A later copy of the same id in one request wins
+            incoming.pop(doc_id, None)
+            incoming[doc_id] = self._normalize_document(doc, doc_id)
         
-        results = results[:max_results]
-        print(f"✓ Step 8: Results limited to {len(results)} (max_results: {max_results})")
+        with self._writing():
+            view = self.view
+            locations = self._locate_documents(view, incoming)
+            segments = self._mark_deleted(view.segments, locations.values())
+            
+            next_segment = self.segment_state["next_segment"]
+            name = f"delta-{next_segment:06d}"
+            segment = self._create_segment(name, list(incoming.values()))
+            self._document_ids[name] = {doc_id: local for local, doc_id in enumerate(incoming)}
+            self._commit_segments(segments + [segment], next_segment + 1)
+            self._journal([{"upsert": doc} for doc in incoming.values()])
         
         execution_time = time.time() - start_time
-        print(f"✓ Step 9: Search complete!")
-        print(f"   Total results found: {len(results)}")
-        print(f"   Execution time: {execution_time:.4f} seconds")
-        print(f"   Results summary:")
-        for i, result in enumerate(results, 1):
-            print(f"     {i}. '{result['title'][:60]}...' (score: {result['score']:.4f})")
-        print()
+        docs_per_second = len(incoming) / execution_time if execution_time > 0 else 0.0
+        logger.info(
+            f"✓ Ingested {len(incoming)} documents into {name}",
+            extra={"fields": {"seconds": round(execution_time, 4), "docs_per_second": round(docs_per_second)}}
+        )
+        self._schedule_merge()
+        return self._ingest_summary(
+            added=len(incoming) - len(locations),
+            updated=len(locations),
+            deleted=0,
+            execution_time=execution_time
+        )
+    
+    def delete_documents(self, doc_ids: List[str]) -> Dict[str, Any]:
+        """
+        Delete documents by id.
+        
+        Args:
+            doc_ids: Ids of the documents to delete; unknown ids are ignored
+            
+        Returns:
+            Dictionary with the number of deleted documents
+        """
+        start_time = time.time()
+        with self._writing():
+            view = self.view
+            locations = self._locate_documents(view, doc_ids)
+            if locations:
+                segments = self._mark_deleted(view.segments, locations.values())
+                self._commit_segments(segments, self.segment_state["next_segment"])
+                self._journal([{"delete": doc_id} for doc_id in locations])
         
+        execution_time = time.time() - start_time
+        logger.info(f"✓ Deleted {len(locations)} documents", extra={"fields": {"seconds": round(execution_time, 4)}})
+        if locations:
+            self._schedule_merge()
+        return self._ingest_summary(
+            added=0,
+            updated=0,
+            deleted=len(locations),
+            execution_time=execution_time
+        )
+    
+    def _journal(self, entries: List[Dict[str, Any]]) -> None:
+        """Record ingestion changes so a rebuild of the base can re-apply them."""
+        if settings.PERSIST_INDEX:
+            index_store.append_journal(self.index_path, entries)
+        elif not self._warned_volatile:
+            self._warned_volatile = True
+            logger.warning(
+                "⚠ PERSIST_INDEX is off: ingested documents only live in this worker "
+                "and are lost on restart"
+            )
+    
+    def _apply_journal(self) -> None:
+        """Fold the ingestion journal into the documents loaded for a rebuild."""
+        documents, deleted = index_store.read_journal(self.index_path)
+        if not documents and not deleted:
+            return
+        # Ingested versions replace file versions; deletions drop them
+        replaced = {doc["id"] for doc in documents}.union(deleted)
+        self.documents = [doc for doc in self.documents if str(doc.get("id")) not in replaced] + documents
+        # Keep the journal bounded by its net effect
+        index_store.write_journal(self.index_path, documents, deleted)
+        logger.info(
+            f"✓ Applied ingestion journal: {len(documents)} documents, {len(deleted)} deletions",
+            extra={"fields": {"journal": str(index_store.journal_path(self.index_path))}}
+        )
+    
+    def _ingest_summary(self, added: int, updated: int, deleted: int, execution_time: float) -> Dict[str, Any]:
+        """Assemble the response of an ingestion request."""
+        changed = added + updated + deleted
         return {
-            "query": query,
-            "results": results,
-            "total_results": len(results),
-            "execution_time": round(execution_time, 4)
+            "added": added,
+            "updated": updated,
+            "deleted": deleted,
+            "total_documents": self.view.num_live,
+            "segments": len(self.view.segments),
+            "execution_time": round(execution_time, 4),
+            "docs_per_second": round(changed / execution_time, 1) if execution_time > 0 else 0.0
         }
-
+    
+    def _schedule_merge(self) -> None:
+        """
+        Start a background merge when the merge policy asks for one.
+        
+        Delta segments are merged into one when there are more than
+        ``SEGMENT_MERGE_FACTOR`` of them. Once delta and deleted documents
+        exceed ``SEGMENT_BASE_MERGE_RATIO`` of the base, everything is merged
+        into a new base snapshot, which also drops deleted documents from the
+        base and re-weights it with the current idf.
+        """
+        view = self.view
+        base, deltas = view.segments[0], view.segments[1:]
+        pending = sum(segment.num_documents for segment in deltas)
+        pending += sum(segment.num_deleted for segment in view.segments)
+        full = pending > settings.SEGMENT_BASE_MERGE_RATIO * base.num_documents
+        if not full and len(deltas) <= settings.SEGMENT_MERGE_FACTOR:
+            return
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+        self._merge_thread = threading.Thread(
+            target=self._merge_in_background, args=(full,), name="segment-merge", daemon=True
+        )
+        self._merge_thread.start()
+    
+    def _merge_in_background(self, full: bool) -> None:
+        """Merge thread body; failures leave the segments untouched."""
+        try:
+            self.merge_segments(full=full)
+        except Exception as e:
+            logger.warning(f"Segment merge failed: {e}")
+    
+    def merge_segments(self, full: bool = False) -> None:
+        """
+        Compact segments, dropping deleted documents.
+        
+        Merged delta segments keep the fitted vocabulary and have their TF-IDF
+        rows re-weighted with the current idf; a full merge refits the
+        vocabulary on all live documents (see ``_merge_into_base``).
+        
+        Args:
+            full: Merge the base as well and write a new base snapshot;
+                otherwise only the delta segments are merged into one
+        """
+        start_time = time.time()
+        with self._writing():
+            view = self.view
+            targets = view.segments if full else view.segments[1:]
+            if not full and len(targets) < 2:
+                return
+            
+            rows = [(segment.documents, segment.live_rows()) for segment in targets]
+            documents = DocumentStore.concatenate(rows)
+            next_segment = self.segment_state["next_segment"]
+            
+            if full:
+                if not documents:
+                    return
+                self._merge_into_base(documents)
+                segments = [self._base_segment]
+            elif documents:
+                name = f"delta-{next_segment:06d}"
+                next_segment += 1
+                merged = self._merge_deltas(name, targets, view)
+                if settings.PERSIST_INDEX:
+                    self._save_segment(merged)
+                segments = [view.segments[0], merged]
+            else:
+                segments = [view.segments[0]]
+            
+            self._commit_segments(segments, next_segment)
+            if settings.PERSIST_INDEX and not full:
+                index_store.remove_segments(self.index_path, [segment.name for segment in targets])
+        
+        logger.info(
+            f"✓ Merged {len(targets)} segments",
+            extra={"fields": {
+                "live_documents": len(documents),
+                "full": full,
+                "seconds": round(time.time() - start_time, 4),
+            }}
+        )
+    
+    @staticmethod
+    def _merge_deltas(name: str, targets: List[Segment], view: SegmentedIndex) -> Segment:
+        """Concatenate the live rows of delta segments, re-weighting TF-IDF with the current idf."""
+        tfidf_rows, bm25_rows, doc_lengths, doc_embeddings, rows = [], [], [], [], []
+        for segment in targets:
+            live = segment.live_rows()
+            rows.append((segment.documents, live))
+            tfidf_rows.append(reweight_tfidf(
+                sparse.csr_matrix(segment.tfidf)[live], segment.tfidf_idf, view.tfidf_idf
+            ))
+            bm25_rows.append(sparse.csr_matrix(segment.bm25_postings)[live])
+            doc_lengths.append(np.asarray(segment.bm25_doc_lengths)[live])
+            if segment.doc_embeddings is not None:
+                doc_embeddings.append(np.asarray(segment.doc_embeddings)[live])
+        return Segment(
+            name,
+            DocumentStore.concatenate(rows),
+            sparse.csc_matrix(sparse.vstack(tfidf_rows)),
+            np.asarray(view.tfidf_idf),
+            bm25_postings=sparse.csc_matrix(sparse.vstack(bm25_rows), dtype=np.float32),
+            bm25_doc_lengths=np.concatenate(doc_lengths).astype(np.float32),
+            doc_embeddings=np.concatenate(doc_embeddings) if len(doc_embeddings) == len(targets) else None
+        )
+    
+    def _merge_into_base(self, documents: DocumentStore) -> None:
+        """
+        Replace the base index with all live documents (and snapshot it when persisting).
+        
+        The vocabulary, TF-IDF, BM25F, spelling and suggestion indexes are
+        refit on the merged corpus, so terms first seen in ingested documents
+        become searchable. Word2Vec is not retrained: document embeddings are
+        recomputed from the trained vectors, and the documents are re-assigned
+        to the existing clusters; both rerun on a rebuild.
+        
+        Everything is built on a staged copy of the engine while searches keep
+        using the current view, and only published once complete; the caller
+        then swaps in the view over the new base. A failure leaves the engine
+        untouched.
+        """
+        staged = copy.copy(self)
+        # The lemma table is refit as well; the current one keeps serving queries
+        staged.text_preprocessor = copy.copy(self.text_preprocessor)
+        staged.documents = documents
+        corpus = staged._fit_lexical_models(documents)
+        if staged.word_vectors is not None:
+            staged.doc_embeddings = staged._compute_document_embeddings(corpus)
+            staged._encode_embeddings()
+            centroids = staged.ann_index.centroids if staged.ann_index is not None else None
+            staged.ann_index = staged._build_ann_index(
+                staged.doc_embeddings, centroids=centroids, vectors=staged.embedding_matrix
+            )
+        if settings.PERSIST_INDEX:
+            # The new snapshot starts with an empty segment list; other
+            # workers notice the new base in the state file and re-attach
+            staged._write_snapshot(segment_state={
+                "generation": self.segment_state["generation"] + 1,
+                "next_segment": self.segment_state["next_segment"],
+                "segments": [{"name": BASE_SEGMENT, "deleted": []}]
+            })
+        
+        # Searches only read the view, but refreshes build views from these attributes
+        with self._refresh_lock:
+            for name in BASE_STATE:
+                setattr(self, name, getattr(staged, name))
+            self.text_preprocessor = staged.text_preprocessor
+            if settings.PERSIST_INDEX:
+                self._load_index()
+            self._reset_base()
 
 # Global search engine instance
 search_engine = None
@@ -0,0 +1,554 @@
+"""Segmented index: the base snapshot plus delta segments of ingested documents."""
+
+import copy
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from app.services.ann import IVFIndex
+from app.services.categories import CategoryIndex, facet_counts, merge_categories
+from app.services.dates import DateIndex, merge_days, recency_boost
+from app.services.document_store import DocumentStore
+from app.services.filters import SearchFilter
+from app.services.quantization import EmbeddingMatrix, as_embedding_matrix
+from app.services.scoring import BM25Scorer, LexicalScorer, TfidfScorer, bm25_idf_weights, top_k
+
+BASE_SEGMENT = "base"
+
+
+def tfidf_idf_weights(document_frequency: np.ndarray, num_documents: int) -> np.ndarray:
+    """Compute TF-IDF idf weights the way ``TfidfVectorizer`` fits them (``smooth_idf=True``)."""
+    document_frequency = np.asarray(document_frequency, dtype=np.int64) + 1
+    return np.log((num_documents + 1) / document_frequency) + 1
+
+
+def live_document_frequency(matrix: sparse.csc_matrix, deleted: np.ndarray) -> np.ndarray:
+    """Count, per column of a CSC matrix, the rows that are not deleted."""
+    if not deleted.any():
+        return np.diff(matrix.indptr)
+    live = np.concatenate(([0], np.cumsum(~deleted[matrix.indices])))
+    return live[matrix.indptr[1:]] - live[matrix.indptr[:-1]]
+
+
+def vectorizer_with_idf(vectorizer: Any, idf: np.ndarray) -> Any:
+    """
+    Copy a fitted ``TfidfVectorizer`` with other idf weights, leaving it untouched.
+
+    The copy shares the vocabulary and analyzer; only the idf transformer is
+    duplicated, since setting ``idf_`` writes through to it.
+    """
+    copied = copy.copy(vectorizer)
+    copied._tfidf = copy.copy(vectorizer._tfidf)
+    copied.idf_ = idf
+    return copied
+
+
+def reweight_tfidf(rows: sparse.spmatrix, old_idf: np.ndarray, new_idf: np.ndarray) -> sparse.csr_matrix:
+    """
+    Re-weight L2-normalized TF-IDF rows with refreshed idf weights.
+
+    A stored value is ``tf * old_idf / norm``; scaling every column by
+    ``new_idf / old_idf`` and normalizing the rows again gives exactly the
+    rows ``TfidfVectorizer`` would produce with the new idf.
+    """
+    rows = sparse.csr_matrix(rows)
+    if rows.shape[0] == 0:
+        return rows
+    ratio = np.asarray(new_idf, dtype=np.float64) / np.asarray(old_idf, dtype=np.float64)
+    return normalize(rows @ sparse.diags(ratio), norm="l2", copy=False)
+
+
+class Segment:
+    """
+    An immutable slice of the index.
+
+    The base snapshot is the first segment; every ingestion writes a small
+    delta segment. Deleting or replacing a document only marks it in the
+    ``deleted`` mask of its segment until a merge drops it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documents: DocumentStore,
+        tfidf: sparse.spmatrix,
+        tfidf_idf: np.ndarray,
+        bm25_postings: Optional[sparse.spmatrix] = None,
+        bm25_doc_lengths: Optional[np.ndarray] = None,
+        doc_embeddings: Optional[np.ndarray] = None,
+        deleted: Optional[np.ndarray] = None,
+        ann_index: Optional[IVFIndex] = None,
+        embedding_matrix: Optional[EmbeddingMatrix] = None,
+    ):
+        """
+        Initialize a segment.
+
+        Args:
+            name: Segment name
+            documents: Documents of the segment
+            tfidf: Document-term TF-IDF matrix (CSC)
+            tfidf_idf: idf weights the TF-IDF rows were computed with
+            bm25_postings: Document-term BM25F pseudo term frequencies
+            bm25_doc_lengths: Per-document field lengths
+            doc_embeddings: Normalized float32 document embeddings
+            deleted: Mask of deleted documents
+            ann_index: Nearest-neighbour index over ``doc_embeddings``;
+                without one, semantic retrieval scans the segment exactly
+            embedding_matrix: Encoded copy of ``doc_embeddings`` that scoring
+                reads; the float32 embeddings themselves if None
+        """
+        self.name = name
+        self.documents = documents
+        self.tfidf = sparse.csc_matrix(tfidf)
+        self.tfidf_idf = tfidf_idf
+        self.bm25_postings = None if bm25_postings is None else sparse.csc_matrix(bm25_postings)
+        self.bm25_doc_lengths = bm25_doc_lengths
+        self.doc_embeddings = doc_embeddings
+        self.ann_index = ann_index
+        self.embedding_matrix = embedding_matrix or as_embedding_matrix(doc_embeddings)
+        self.num_documents = len(documents)
+        self.deleted = np.zeros(self.num_documents, dtype=bool) if deleted is None else deleted
+        self.num_deleted = int(self.deleted.sum())
+        self._scorers: Dict[str, LexicalScorer] = {}
+        self._categories: Optional[CategoryIndex] = None
+        self._dates: Optional[DateIndex] = None
+
+    def with_deleted(self, deleted: np.ndarray) -> "Segment":
+        """Return a copy of the segment with another deletion mask."""
+        segment = Segment(
+            self.name, self.documents, self.tfidf, self.tfidf_idf,
+            self.bm25_postings, self.bm25_doc_lengths, self.doc_embeddings, deleted, self.ann_index,
+            self.embedding_matrix
+        )
+        # Scorers, categories and dates only depend on the documents, so the copies share them
+        segment._scorers = self._scorers
+        segment._categories = self._categories
+        segment._dates = self._dates
+        return segment
+
+    @property
+    def categories(self) -> CategoryIndex:
+        """Category codes of the documents, built on first use."""
+        if self._categories is None:
+            self._categories = self.documents.categories()
+        return self._categories
+
+    @property
+    def dates(self) -> DateIndex:
+        """Publication days of the documents, built on first use."""
+        if self._dates is None:
+            self._dates = self.documents.dates()
+        return self._dates
+
+    def allowed(self, search_filter: SearchFilter) -> np.ndarray:
+        """Mask of the live documents that pass a category and date filter."""
+        if search_filter.categories is not None:
+            mask = self.categories.allowed(search_filter.categories)
+        else:
+            mask = np.ones(self.num_documents, dtype=bool)
+        if search_filter.dates is not None:
+            mask &= self.dates.allowed(search_filter.dates)
+        if self.num_deleted:
+            mask &= ~self.deleted
+        return mask
+
+    def scorer(self, kind: str, k1: float) -> LexicalScorer:
+        """Return the segment's lexical scorer, creating it on first use."""
+        if kind == "bm25" and self.bm25_postings is None:
+            kind = "tfidf"
+        if kind not in self._scorers:
+            if kind == "bm25":
+                # idf weights are global: every view scores with its own copy (see ``BM25Scorer.with_idf``)
+                idf = np.zeros(self.bm25_postings.shape[1], dtype=np.float32)
+                self._scorers[kind] = BM25Scorer(self.bm25_postings, idf, k1=k1)
+            else:
+                self._scorers[kind] = TfidfScorer(self.tfidf)
+        return self._scorers[kind]
+
+    def live_rows(self) -> np.ndarray:
+        """Local ids of the documents that are not deleted."""
+        return np.flatnonzero(~self.deleted)
+
+    def nearest_batch(
+        self,
+        query_matrix: np.ndarray,
+        k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Return the k most similar documents (local ids) of every query embedding.
+
+        Uses the nearest-neighbour index when there is one and ``nprobe`` is
+        positive; otherwise every document is scored. Either way scores come
+        from the (possibly encoded) ``embedding_matrix``. Documents outside
+        ``mask`` are never scored; when the mask allows fewer documents than
+        the probed lists would hold, those documents are scanned exactly
+        instead.
+        """
+        if mask is not None:
+            doc_ids = np.flatnonzero(mask)
+            if self.ann_index is None or nprobe <= 0 or len(doc_ids) <= self.ann_index.expected_scan(nprobe):
+                scores = self.embedding_matrix.dot_rows(query_matrix, doc_ids)
+                return [top_k(doc_ids, scores[:, column], k) for column in range(len(query_matrix))]
+        if self.ann_index is not None and nprobe > 0:
+            return self.ann_index.search_batch(query_matrix, k, nprobe, mask)
+        scores = self.embedding_matrix.dot(query_matrix)
+        doc_ids = np.arange(self.num_documents, dtype=np.int64)
+        return [top_k(doc_ids, scores[:, column], k) for column in range(len(query_matrix))]
+
+
+class SegmentedDocuments:
+    """Read-only sequence of the documents of all segments, by global document number."""
+
+    def __init__(self, segments: List[Segment], offsets: np.ndarray):
+        self.segments = segments
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = int(index)
+        position = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        if index < 0 or position >= len(self.segments):
+            raise IndexError("document index out of range")
+        return self.segments[position].documents[index - int(self.offsets[position])]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for segment in self.segments:
+            yield from segment.documents
+
+
+class SegmentedEmbeddings:
+    """Gathers document embedding rows across segments by global document number."""
+
+    def __init__(self, segments: List[Segment], offsets: np.ndarray, dimension: int, attribute: str = "embedding_matrix"):
+        """
+        Args:
+            segments: Segments of the view
+            offsets: Global number of every segment's first document
+            dimension: Embedding size
+            attribute: Segment attribute to read rows from: the scoring
+                ``embedding_matrix`` or the float32 ``doc_embeddings``
+        """
+        self.segments = segments
+        self.offsets = offsets
+        self.attribute = attribute
+        self.shape = (int(offsets[-1]), dimension)
+
+    def __getitem__(self, indices: np.ndarray) -> np.ndarray:
+        indices = np.asarray(indices)
+        rows = np.zeros((len(indices), self.shape[1]), dtype=np.float32)
+        positions = np.searchsorted(self.offsets, indices, side="right") - 1
+        for position in np.unique(positions):
+            embeddings = getattr(self.segments[position], self.attribute)
+            if embeddings is not None:
+                mask = positions == position
+                rows[mask] = embeddings[indices[mask] - self.offsets[position]]
+        return rows
+
+
+def _combine(parts: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the top k of per-segment candidates (each already ranked)."""
+    if len(parts) == 1:
+        # Already ranked; only deleted-document headroom has to go
+        doc_ids, scores = parts[0]
+        return doc_ids[:k], scores[:k]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    return top_k(
+        np.concatenate([doc_ids for doc_ids, _ in parts]),
+        np.concatenate([scores for _, scores in parts]),
+        k
+    )
+
+
+def _globalize(segment: Segment, offset: int, doc_ids: np.ndarray, scores: np.ndarray):
+    """Drop deleted documents and map local ids to global document numbers."""
+    if segment.num_deleted:
+        live = ~segment.deleted[doc_ids]
+        doc_ids, scores = doc_ids[live], scores[live]
+    return doc_ids.astype(np.int64) + offset, scores
+
+
+class SegmentedScorer(LexicalScorer):
+    """
+    Lexical scorer over all segments.
+
+    Every segment returns its own top candidates with global document
+    numbers; deleted documents are dropped before the overall top k is
+    selected. A segment asks its scorer for ``k`` plus its number of deleted
+    documents, so the result equals scoring the live documents alone.
+
+    The ``mask`` of ``top_k`` and ``top_k_batch`` is a list with one mask per
+    segment (see ``SegmentedIndex.filter_masks``), indexed by local id.
+    """
+
+    def __init__(self, segments: List[Segment], scorers: List[LexicalScorer], offsets: np.ndarray):
+        self.segments = segments
+        self.scorers = scorers
+        self.offsets = offsets
+        self.num_documents = int(offsets[-1])
+        self.normalized = all(scorer.normalized for scorer in scorers)
+
+    def _globalize(self, position: int, doc_ids: np.ndarray, scores: np.ndarray):
+        """Drop deleted documents and map local ids to global document numbers."""
+        return _globalize(self.segments[position], int(self.offsets[position]), doc_ids, scores)
+
+    def score(
+        self,
+        query_vector: sparse.spmatrix,
+        mask: Optional[List[np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every allowed live document that shares a term with the query.
+
+        Every segment returns its ids ascending and the segments cover
+        consecutive ranges of global ids, so concatenating them in segment
+        order merges them: the ids are ascending, as ``LexicalScorer.score``
+        promises.
+        """
+        parts = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))]
+        for position, (segment, scorer) in enumerate(zip(self.segments, self.scorers)):
+            if segment.num_deleted == segment.num_documents:
+                continue
+            doc_ids, scores = scorer.score(query_vector, None if mask is None else mask[position])
+            parts.append(self._globalize(position, doc_ids, scores))
+        return (
+            np.concatenate([doc_ids for doc_ids, _ in parts]),
+            np.concatenate([scores for _, scores in parts]),
+        )
+
+    def top_k(
+        self,
+        query_vector: sparse.spmatrix,
+        k: int,
+        prune: bool = False,
+        min_score: float = 0.0,
+        mask: Optional[List[np.ndarray]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k best-scoring live documents across all segments.
+
+        ``mask`` (one mask per segment, see ``SegmentedIndex.filter_masks``)
+        restricts scoring to the allowed live documents.
+        """
+        parts = []
+        for position, (segment, scorer) in enumerate(zip(self.segments, self.scorers)):
+            if segment.num_deleted == segment.num_documents:
+                continue
+            doc_ids, scores = scorer.top_k(
+                query_vector, k + segment.num_deleted, prune=prune, min_score=min_score,
+                mask=None if mask is None else mask[position]
+            )
+            parts.append(self._globalize(position, doc_ids, scores))
+        return _combine(parts, k)
+
+    def top_k_batch(
+        self,
+        query_matrix: sparse.spmatrix,
+        k: int,
+        prune: bool = False,
+        min_score: float = 0.0,
+        mask: Optional[List[np.ndarray]] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return the k best-scoring live documents for every query row (see ``top_k``)."""
+        per_segment = []
+        for position, (segment, scorer) in enumerate(zip(self.segments, self.scorers)):
+            if segment.num_deleted == segment.num_documents:
+                continue
+            results = scorer.top_k_batch(
+                query_matrix, k + segment.num_deleted, prune=prune, min_score=min_score,
+                mask=None if mask is None else mask[position]
+            )
+            per_segment.append([self._globalize(position, *result) for result in results])
+        return [
+            _combine([results[row] for results in per_segment], k)
+            for row in range(query_matrix.shape[0])
+        ]
+
+
+class SegmentedIndex:
+    """
+    Consistent, read-only view of the segments that searches run against.
+
+    Views are replaced as a whole when segments change, so a search that
+    captured a view never mixes document numbers of different views.
+    Document frequencies are summed over the live documents of all
+    segments, which keeps the idf weights current without refitting; each
+    view weights queries with its own idf, so a search still running on an
+    older view scores it consistently.
+    """
+
+    def __init__(
+        self,
+        segments: List[Segment],
+        version: str,
+        scorer_kind: str = "tfidf",
+        k1: float = 1.2,
+        rerank: int = 0,
+        vectorizer: Optional[Any] = None,
+        models: Optional[Any] = None
+    ):
+        """
+        Build the view.
+
+        Args:
+            segments: Base segment followed by the delta segments
+            version: Index version for result caching
+            scorer_kind: "tfidf" or "bm25"
+            k1: BM25 term-frequency saturation
+            rerank: When embeddings are encoded, semantic retrieval takes
+                ``rerank * k`` candidates by encoded score and re-ranks them
+                with the float32 embeddings (0 disables)
+            vectorizer: TF-IDF vectorizer fitted on the base segment, whose
+                vocabulary the segments' term columns follow; queries are
+                vectorized with a copy carrying the view's idf (with the
+                vectorizer itself while the view is the unchanged base)
+            models: Other query-time models fitted with the base segment
+                (lemma table, spelling, suggestions); they are published with
+                the view so a search never pairs them with another base
+        """
+        self.segments = segments
+        self.version = version
+        self.models = models
+        self.offsets = np.cumsum([0] + [segment.num_documents for segment in segments])
+        self.num_documents = int(self.offsets[-1])
+        self.num_live = self.num_documents - sum(segment.num_deleted for segment in segments)
+
+        self.tfidf_document_frequency = sum(
+            live_document_frequency(segment.tfidf, segment.deleted) for segment in segments
+        )
+        self.tfidf_idf = tfidf_idf_weights(self.tfidf_document_frequency, self.num_live)
+        if vectorizer is not None and (len(segments) > 1 or segments[0].num_deleted):
+            vectorizer = vectorizer_with_idf(vectorizer, self.tfidf_idf)
+        self.vectorizer = vectorizer
+
+        self.bm25_idf = None
+        if all(segment.bm25_postings is not None for segment in segments):
+            self.bm25_document_frequency = sum(
+                live_document_frequency(segment.bm25_postings, segment.deleted) for segment in segments
+            )
+            self.bm25_idf = bm25_idf_weights(self.bm25_document_frequency, self.num_live)
+
+        # Scorers cached by the segments are shared with older views and never modified
+        scorers = [segment.scorer(scorer_kind, k1) for segment in segments]
+        scorers = [
+            scorer.with_idf(self.bm25_idf) if isinstance(scorer, BM25Scorer) else scorer
+            for scorer in scorers
+        ]
+        self.scorer = SegmentedScorer(segments, scorers, self.offsets)
+        self.documents = SegmentedDocuments(segments, self.offsets)
+        self._category_names: List[str] = []
+        self._category_codes: Optional[np.ndarray] = None
+        self._days: Optional[np.ndarray] = None
+
+        # Scoring reads the encoded matrices; re-ranking the float32 embeddings
+        base_embeddings = segments[0].embedding_matrix
+        self.rerank = rerank if any(
+            segment.embedding_matrix is not None and segment.embedding_matrix.kind != "float32"
+            for segment in segments
+        ) else 0
+        if base_embeddings is None:
+            self.doc_embeddings = None
+            self.exact_embeddings = None
+        elif len(segments) == 1:
+            self.doc_embeddings = base_embeddings
+            self.exact_embeddings = segments[0].doc_embeddings
+        else:
+            self.doc_embeddings = SegmentedEmbeddings(segments, self.offsets, base_embeddings.shape[1])
+            self.exact_embeddings = SegmentedEmbeddings(
+                segments, self.offsets, base_embeddings.shape[1], attribute="doc_embeddings"
+            )
+
+    def nearest(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        nprobe: int,
+        masks: Optional[List[np.ndarray]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k live documents most similar to a query embedding.
+
+        Args:
+            query_embedding: L2-normalized query embedding
+            k: Number of documents to return
+            nprobe: Inverted lists scanned in segments with a nearest-neighbour
+                index; 0 scores every document exactly
+            masks: Per-segment masks of the documents that may be returned
+                (see ``filter_masks``); all live documents if None
+
+        Returns:
+            Tuple of (global doc ids, cosine similarities) sorted by descending similarity
+        """
+        return self.nearest_batch(query_embedding[np.newaxis, :], k, nprobe, masks)[0]
+
+    def nearest_batch(
+        self,
+        query_matrix: np.ndarray,
+        k: int,
+        nprobe: int,
+        masks: Optional[List[np.ndarray]] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return the k live documents most similar to every query embedding row (see ``nearest``)."""
+        query_matrix = np.asarray(query_matrix, dtype=np.float32)
+        depth = k * self.rerank if self.rerank else k
+        per_segment = []
+        for position, segment in enumerate(self.segments):
+            if segment.embedding_matrix is None or segment.num_deleted == segment.num_documents:
+                continue
+            # Ask for enough headroom that dropping deleted documents still leaves k
+            mask = None if masks is None else masks[position]
+            results = segment.nearest_batch(query_matrix, depth + segment.num_deleted, nprobe, mask)
+            offset = int(self.offsets[position])
+            per_segment.append([_globalize(segment, offset, *result) for result in results])
+        nearest = [
+            _combine([results[row] for results in per_segment], depth)
+            for row in range(len(query_matrix))
+        ]
+        if self.rerank:
+            nearest = [
+                self._rerank(query_embedding, doc_ids, k)
+                for query_embedding, (doc_ids, _) in zip(query_matrix, nearest)
+            ]
+        return nearest
+
+    def filter_masks(self, search_filter: Optional[SearchFilter]) -> Optional[List[np.ndarray]]:
+        """Per-segment masks of the live documents passing a filter (None without a filter)."""
+        if search_filter is None:
+            return None
+        return [segment.allowed(search_filter) for segment in self.segments]
+
+    @property
+    def latest_day(self) -> Optional[int]:
+        """Day number of the newest dated document of any segment."""
+        days = [segment.dates.latest_day for segment in self.segments]
+        days = [day for day in days if day is not None]
+        return max(days) if days else None
+
+    def recency_boost(self, doc_ids: np.ndarray, weight: float, half_life: float) -> np.ndarray:
+        """Score multipliers of the given documents by age (see ``dates.recency_boost``)."""
+        if self._days is None:
+            self._days = merge_days([segment.dates for segment in self.segments])
+        return recency_boost(self._days[doc_ids], self.latest_day, weight, half_life)
+
+    def facet_counts(self, doc_ids: np.ndarray) -> Dict[str, int]:
+        """Number of the given documents per category, most frequent first."""
+        if self._category_codes is None:
+            # Built on first use, so views that never facet skip the pass over all documents
+            self._category_names, self._category_codes = merge_categories(
+                [segment.categories for segment in self.segments]
+            )
+        return facet_counts(self._category_names, self._category_codes, doc_ids)
+
+    def _rerank(self, query_embedding: np.ndarray, doc_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score a short list with the float32 embeddings and keep the top k."""
+        if len(doc_ids) == 0:
+            return doc_ids, np.empty(0, dtype=np.float32)
+        # Reading rows in document order keeps the page accesses sequential
+        rows = np.sort(doc_ids)
+        return top_k(rows, np.asarray(self.exact_embeddings[rows], dtype=np.float32) @ query_embedding, k)
@@ -0,0 +1,290 @@
+"""Query spell correction with a symmetric-delete (SymSpell) index."""
+
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Characters left by query preprocessing; every word is encoded over them
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+_CHAR_CODES = {char: code for code, char in enumerate(ALPHABET, 1)}
+_BASE = len(ALPHABET) + 1
+
+# Words up to this length get an exact, collision-free code (37 ** 12 < 2 ** 63)
+EXACT_LENGTH = 12
+
+# Values of the ``spelling`` search option (see ``SPELL_CORRECTION``)
+SPELLING_MODES = ("off", "suggest", "auto")
+
+# Shorter words and words with digits are never corrected
+MIN_WORD_LENGTH = 3
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def word_code(word: str) -> int:
+    """
+    Integer code of a word over ``ALPHABET``.
+
+    Words up to ``EXACT_LENGTH`` characters are encoded exactly in base 37;
+    longer words get a negative 63-bit hash, so they never collide with
+    exact codes.
+    """
+    if len(word) <= EXACT_LENGTH:
+        code = 0
+        for char in word:
+            code = code * _BASE + _CHAR_CODES[char]
+        return code
+    digest = hashlib.blake2b(word.encode("ascii"), digest_size=8).digest()
+    return -(int.from_bytes(digest, "little") >> 1) - 1
+
+
+def deletes(word: str, max_distance: int) -> Dict[str, int]:
+    """Every non-empty string left by deleting up to ``max_distance`` characters, with the fewest deletions."""
+    found = {word: 0}
+    frontier = [word]
+    for distance in range(1, max_distance + 1):
+        next_frontier = []
+        for item in frontier:
+            if len(item) < 2:
+                continue
+            for position in range(len(item)):
+                shorter = item[:position] + item[position + 1:]
+                if shorter not in found:
+                    found[shorter] = distance
+                    next_frontier.append(shorter)
+        frontier = next_frontier
+    return found
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Damerau-Levenshtein without repeated edits).
+
+    Returns ``max_distance + 1`` as soon as the distance is known to exceed
+    ``max_distance``.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # Common prefixes and suffixes do not change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    # Keep one matching character before the difference for transpositions
+    start = max(0, start - 1)
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        distance = max(len(a), len(b))
+        return distance if distance <= max_distance else max_distance + 1
+
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        char = a[i - 1]
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != b[j - 1]))
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def load_frequency_dictionary(path: str) -> List[Tuple[str, int]]:
+    """Read ``word count`` lines; words outside ``ALPHABET`` are skipped."""
+    entries = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit() and all(char in _CHAR_CODES for char in parts[0]):
+                entries.append((parts[0], int(parts[1])))
+    return entries
+
+
+class SpellCorrector:
+    """
+    Symmetric-delete spelling index.
+
+    Correction targets are the dictionary words that also occur in the
+    corpus, ordered by descending dictionary frequency. Every target is
+    indexed under the codes of the strings left by deleting up to
+    ``max_distance`` characters from its first ``prefix_length``
+    characters, so candidates for a misspelling are found by deleting from
+    the misspelling too and binary-searching its codes in one sorted
+    array. Only the few candidates are compared character by character.
+
+    Everything is held in flat arrays (no per-delete Python objects), which
+    are persisted with the index snapshot and memory-mapped on load.
+    """
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        delete_codes: np.ndarray,
+        delete_terms: np.ndarray,
+        known_codes: np.ndarray,
+        max_distance: int = 2,
+        prefix_length: int = 7
+    ):
+        """
+        Args:
+            terms: Correction targets (byte strings), most frequent first
+            delete_codes: Sorted ``word_code`` of every delete of every target
+            delete_terms: Target id of every entry of ``delete_codes``
+            known_codes: Sorted codes of every correctly spelled word
+                (dictionary and corpus), which is never corrected
+            max_distance: Largest edit distance corrected
+            prefix_length: Characters of a word that deletes are generated from
+        """
+        self.terms = terms
+        self.delete_codes = delete_codes
+        self.delete_terms = delete_terms
+        self.known_codes = known_codes
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._term_lengths = np.char.str_len(terms).astype(np.int16) if len(terms) else np.empty(0, np.int16)
+
+    @classmethod
+    def build(
+        cls,
+        dictionary: Iterable[Tuple[str, int]],
+        corpus_words: Iterable[str],
+        max_distance: int = 2,
+        prefix_length: int = 7
+    ) -> "SpellCorrector":
+        """
+        Index the dictionary words that occur in the corpus.
+
+        Args:
+            dictionary: (word, frequency) pairs
+            corpus_words: Distinct words of the corpus
+            max_distance: Largest edit distance corrected
+            prefix_length: Characters of a word that deletes are generated from
+        """
+        dictionary = dict(dictionary)
+        corpus_words = {word for word in corpus_words if all(char in _CHAR_CODES for char in word)}
+        targets = sorted(
+            (word for word in corpus_words if word in dictionary),
+            key=lambda word: (-dictionary[word], word)
+        )
+
+        codes: List[int] = []
+        term_ids: List[int] = []
+        for term_id, term in enumerate(targets):
+            for shorter in deletes(term[:prefix_length], max_distance):
+                codes.append(word_code(shorter))
+                term_ids.append(term_id)
+        codes = np.asarray(codes, dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+
+        known = np.unique(np.fromiter(
+            (word_code(word) for word in corpus_words.union(dictionary)), dtype=np.int64
+        ))
+        return cls(
+            np.array([term.encode("ascii") for term in targets], dtype="S"),
+            codes[order],
+            np.asarray(term_ids, dtype=np.int32)[order],
+            known,
+            max_distance,
+            prefix_length
+        )
+
+    def arrays(self, prefix: str = "spell_") -> Dict[str, np.ndarray]:
+        """Arrays to persist the index with (see ``from_arrays``)."""
+        return {
+            f"{prefix}terms": self.terms,
+            f"{prefix}delete_codes": self.delete_codes,
+            f"{prefix}delete_terms": self.delete_terms,
+            f"{prefix}known_codes": self.known_codes,
+            f"{prefix}params": np.array([self.max_distance, self.prefix_length], dtype=np.int32),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "spell_") -> Optional["SpellCorrector"]:
+        """Attach to persisted index arrays; None if the snapshot has no spelling index."""
+        if f"{prefix}terms" not in arrays:
+            return None
+        max_distance, prefix_length = (int(value) for value in arrays[f"{prefix}params"])
+        return cls(
+            np.asarray(arrays[f"{prefix}terms"]),
+            np.asarray(arrays[f"{prefix}delete_codes"]),
+            np.asarray(arrays[f"{prefix}delete_terms"]),
+            np.asarray(arrays[f"{prefix}known_codes"]),
+            max_distance,
+            prefix_length
+        )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def is_known(self, word: str) -> bool:
+        """Whether the word is spelled correctly (in the dictionary or the corpus)."""
+        code = word_code(word)
+        position = np.searchsorted(self.known_codes, code)
+        return position < len(self.known_codes) and self.known_codes[position] == code
+
+    def correct_word(self, word: str) -> Optional[str]:
+        """
+        Return the closest target of a misspelled word, None if the word is known or too far from all.
+
+        The smallest edit distance wins; ties go to the most frequent target.
+        """
+        if len(word) < MIN_WORD_LENGTH or not _WORD.fullmatch(word) or self.is_known(word):
+            return None
+        codes = np.fromiter(
+            (word_code(shorter) for shorter in deletes(word[:self.prefix_length], self.max_distance)),
+            dtype=np.int64
+        )
+        lo = np.searchsorted(self.delete_codes, codes, side="left")
+        hi = np.searchsorted(self.delete_codes, codes, side="right")
+        hits = np.flatnonzero(hi > lo)
+        if not len(hits):
+            return None
+        candidates = np.concatenate([self.delete_terms[lo[i]:hi[i]] for i in hits])
+        # Unique ids come out sorted, i.e. most frequent target first
+        candidates = np.unique(candidates)
+        candidates = candidates[np.abs(self._term_lengths[candidates] - len(word)) <= self.max_distance]
+
+        best, best_distance = None, self.max_distance + 1
+        for term_id in candidates:
+            term = self.terms[term_id].decode("ascii")
+            # A less frequent target has to be strictly closer
+            distance = edit_distance(word, term, best_distance - 1)
+            if distance < best_distance:
+                best, best_distance = term, distance
+                if distance == 1:
+                    break
+        return best
+
+    def correct(self, text: str) -> Optional[str]:
+        """Correct every misspelled word of a preprocessed query; None if nothing changed."""
+        words = text.split()
+        corrected = [self.correct_word(word) or word for word in words]
+        return " ".join(corrected) if corrected != words else None
+
+
+def build_spell_corrector(
+    dictionary_path: str,
+    corpus_words: Iterable[str],
+    max_distance: int,
+    prefix_length: int
+) -> Optional[SpellCorrector]:
+    """Build the corrector from a frequency dictionary file; None (with a warning) if it is missing."""
+    if not Path(dictionary_path).exists():
+        logger.warning(f"⚠ Spelling dictionary not found at {dictionary_path}; queries are not corrected")
+        return None
+    return SpellCorrector.build(
+        load_frequency_dictionary(dictionary_path), corpus_words, max_distance, prefix_length
+    )
@@ -0,0 +1,214 @@
+"""Prefix completions over corpus terms, phrases and titles."""
+
+from bisect import bisect_left
+from os.path import commonprefix
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.packed_strings import pack_strings, unpack_string
+
+# Kinds of completion, by precedence when the same text occurs as several
+KINDS = ("term", "phrase", "title")
+
+
+def lcp_intervals(keys: List[str], min_size: int) -> Iterable[Tuple[int, int]]:
+    """
+    Yield the ranges [lo, hi) of sorted keys that share a prefix, larger than ``min_size``.
+
+    Every prefix selects one contiguous range of the sorted keys, and the
+    ranges of at least two keys are exactly the intervals of the LCP array
+    (the trie nodes where keys branch or end), found with one stack pass.
+    """
+    stack = [(0, 0)]  # (common prefix length, lo)
+    last = None
+    for i in range(1, len(keys) + 1):
+        # -1 past the last key closes every open interval, the root included
+        lcp = len(commonprefix((keys[i - 1], keys[i]))) if i < len(keys) else -1
+        lo = i - 1
+        while stack and lcp < stack[-1][0]:
+            _, lo = stack.pop()
+            # Nested prefixes selecting the same keys share one range
+            if i - lo > min_size and (lo, i) != last:
+                last = (lo, i)
+                yield last
+        if not stack or lcp > stack[-1][0]:
+            stack.append((lcp, lo))
+
+
+class SuggestIndex:
+    """
+    Prefix completions from one sorted array of normalized keys.
+
+    The keys are stored as one byte buffer with offsets, so a prefix is two
+    binary searches over them. The best ``top_k`` completions of every
+    prefix matching more than ``top_k`` keys are precomputed and keyed by
+    the range the prefix selects; smaller ranges are ranked on the fly.
+    A lookup therefore costs two binary searches plus either one more over
+    the precomputed ranges or a sort of at most ``top_k`` weights.
+    """
+
+    def __init__(
+        self,
+        key_buffer: np.ndarray,
+        key_offsets: np.ndarray,
+        weights: np.ndarray,
+        kinds: np.ndarray,
+        titles: np.ndarray,
+        title_buffer: np.ndarray,
+        title_offsets: np.ndarray,
+        node_ranges: np.ndarray,
+        node_top: np.ndarray
+    ):
+        """
+        Args:
+            key_buffer: UTF-8 bytes of the sorted, normalized keys
+            key_offsets: Start of every key in ``key_buffer`` (plus the end)
+            weights: Document frequency of every key
+            kinds: Index into ``KINDS`` of every key
+            titles: Position of a key's original title in the title buffer
+                (-1 for terms and phrases)
+            title_buffer: UTF-8 bytes of the original titles
+            title_offsets: Start of every title (plus the end)
+            node_ranges: Sorted ``lo * (len + 1) + hi`` of every precomputed range
+            node_top: Key ids of the best completions of every precomputed
+                range, best first, padded with -1
+        """
+        self.key_buffer = key_buffer
+        self.key_offsets = key_offsets
+        self.weights = weights
+        self.kinds = kinds
+        self.titles = titles
+        self.title_buffer = title_buffer
+        self.title_offsets = title_offsets
+        self.node_ranges = node_ranges
+        self.node_top = node_top
+        self._range_base = len(weights) + 1
+
+    @property
+    def top_k(self) -> int:
+        """Completions precomputed per prefix (the most a lookup returns)."""
+        return self.node_top.shape[1]
+
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[Tuple[str, int, int, Optional[str]]],
+        top_k: int = 10
+    ) -> "SuggestIndex":
+        """
+        Sort the entries and precompute the completions of the shared prefixes.
+
+        Args:
+            entries: (normalized key, document frequency, kind, original
+                title or None); a key given more than once keeps its
+                highest frequency and the first kind in ``KINDS`` order
+            top_k: Completions kept per prefix
+        """
+        merged: Dict[str, Tuple[int, int, Optional[str]]] = {}
+        for key, weight, kind, title in entries:
+            if not key:
+                continue
+            current = merged.get(key)
+            if current is None:
+                merged[key] = (weight, kind, title)
+            else:
+                merged[key] = (max(current[0], weight), min(current[1], kind), title if kind < current[1] else current[2])
+
+        keys = sorted(merged)
+        weights = np.array([merged[key][0] for key in keys], dtype=np.int32)
+        kinds = np.array([merged[key][1] for key in keys], dtype=np.uint8)
+        title_keys = [key for key in keys if merged[key][2] is not None]
+        titles = np.full(len(keys), -1, dtype=np.int32)
+        titles[[i for i, key in enumerate(keys) if merged[key][2] is not None]] = np.arange(len(title_keys))
+        title_buffer, title_offsets = pack_strings(merged[key][2] for key in title_keys)
+        key_buffer, key_offsets = pack_strings(keys)
+
+        ranges, top = [], []
+        for lo, hi in lcp_intervals(keys, top_k):
+            ranges.append(lo * (len(keys) + 1) + hi)
+            top.append(_best(weights, lo, hi, top_k))
+        order = np.argsort(np.asarray(ranges, dtype=np.int64), kind="stable")
+        node_top = np.full((len(ranges), top_k), -1, dtype=np.int32)
+        for row, i in enumerate(order):
+            node_top[row, :len(top[i])] = top[i]
+        return cls(
+            key_buffer, key_offsets, weights, kinds, titles, title_buffer, title_offsets,
+            np.asarray(ranges, dtype=np.int64)[order], node_top
+        )
+
+    def arrays(self, prefix: str = "suggest_") -> Dict[str, np.ndarray]:
+        """Arrays to persist the index with (see ``from_arrays``)."""
+        return {
+            f"{prefix}key_buffer": self.key_buffer,
+            f"{prefix}key_offsets": self.key_offsets,
+            f"{prefix}weights": self.weights,
+            f"{prefix}kinds": self.kinds,
+            f"{prefix}titles": self.titles,
+            f"{prefix}title_buffer": self.title_buffer,
+            f"{prefix}title_offsets": self.title_offsets,
+            f"{prefix}node_ranges": self.node_ranges,
+            f"{prefix}node_top": self.node_top,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "suggest_") -> Optional["SuggestIndex"]:
+        """Attach to persisted index arrays; None if the snapshot has no suggestion index."""
+        if f"{prefix}key_offsets" not in arrays:
+            return None
+        return cls(*(np.asarray(arrays[f"{prefix}{name}"]) for name in (
+            "key_buffer", "key_offsets", "weights", "kinds", "titles",
+            "title_buffer", "title_offsets", "node_ranges", "node_top",
+        )))
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def key(self, i: int) -> str:
+        """Normalized key of entry ``i``."""
+        return unpack_string(self.key_buffer, self.key_offsets, i)
+
+    def text(self, i: int) -> str:
+        """Text to suggest for entry ``i``: the original title, or the key itself."""
+        title = self.titles[i]
+        if title < 0:
+            return self.key(i)
+        return unpack_string(self.title_buffer, self.title_offsets, title)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Range [lo, hi) of the sorted keys starting with ``prefix``."""
+        lo = bisect_left(range(len(self)), prefix, key=self.key)
+        # Keys are ASCII, so every key continuing the prefix sorts below this bound
+        hi = bisect_left(range(lo, len(self)), prefix + "\uffff", key=self.key) + lo
+        return lo, hi
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, object]]:
+        """
+        Return the most frequent completions of a normalized prefix.
+
+        Args:
+            prefix: Normalized prefix (as the keys were normalized)
+            limit: Number of completions, at most ``top_k``
+
+        Returns:
+            Completions best first, each with its text, kind and document frequency
+        """
+        lo, hi = self.prefix_range(prefix)
+        if hi <= lo:
+            return []
+        if hi - lo > self.top_k:
+            row = np.searchsorted(self.node_ranges, lo * self._range_base + hi)
+            best = self.node_top[row]
+            best = best[best >= 0]
+        else:
+            best = _best(self.weights, lo, hi, self.top_k)
+        return [
+            {"text": self.text(i), "kind": KINDS[self.kinds[i]], "weight": int(self.weights[i])}
+            for i in best[:limit]
+        ]
+
+
+def _best(weights: np.ndarray, lo: int, hi: int, k: int) -> np.ndarray:
+    """Ids of the ``k`` heaviest keys in [lo, hi), heaviest first; ties go to the key sorting first."""
+    ids = np.argsort(-np.asarray(weights[lo:hi]), kind="stable")[:k]
+    return (ids + lo).astype(np.int32)
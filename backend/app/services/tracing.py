@@ -0,0 +1,149 @@
+"""Per-stage search timings aggregated into latency histograms."""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Tuple
+
+# Search stages, in pipeline order
+STAGES = (
+    "preprocess",
+    "spell_correct",
+    "vectorize",
+    "lexical_score",
+    "candidate_selection",
+    "semantic_retrieve",
+    "semantic_rescore",
+    "fusion",
+    "serialize",
+)
+
+# Upper bucket bounds in seconds (roughly 1-2.5-5 steps from 50 µs to 10 s)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Observing is a bisect plus a few integer updates; quantiles are
+    estimated by linear interpolation inside the bucket they fall in.
+    Callers serialize updates (see ``StageTimings``).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One extra bucket for observations above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Add one observation."""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile (0 < q < 1) in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[position - 1] if position else 0.0
+                if position == len(self.buckets):
+                    return lower
+                upper = self.buckets[position]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean and p50/p95/p99 in milliseconds."""
+        return {
+            "count": self.count,
+            "mean_ms": round(1000 * self.sum / self.count, 4) if self.count else 0.0,
+            "p50_ms": round(1000 * self.quantile(0.50), 4),
+            "p95_ms": round(1000 * self.quantile(0.95), 4),
+            "p99_ms": round(1000 * self.quantile(0.99), 4),
+        }
+
+
+class SearchTrace:
+    """
+    Lap timer for one search.
+
+    ``mark(stage)`` charges the time since the previous mark to ``stage``,
+    so a search costs one clock read per stage and nothing else.
+    """
+
+    __slots__ = ("start", "spans", "_last")
+
+    def __init__(self):
+        self.start = self._last = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        """End the current span and attribute it to ``stage``."""
+        now = time.perf_counter()
+        self.spans[stage] = self.spans.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def skip(self) -> None:
+        """Start the next span now without charging the elapsed time to any stage."""
+        self._last = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the trace started."""
+        return time.perf_counter() - self.start
+
+    def as_fields(self) -> Dict[str, float]:
+        """Span durations in milliseconds, for structured log records."""
+        return {f"{stage}_ms": round(1000 * seconds, 4) for stage, seconds in self.spans.items()}
+
+
+class StageTimings:
+    """
+    Latency histograms per search stage plus end-to-end search latency.
+
+    A finished search is recorded under one short lock acquisition, so the
+    histograms can stay on at full load.
+    """
+
+    def __init__(self, stages: Iterable[str] = STAGES):
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in stages}
+        self.total = LatencyHistogram()
+        # Held for every update; hold it too while reading the histograms
+        self.lock = threading.Lock()
+
+    def record(self, spans: Dict[str, float], total: float) -> None:
+        """
+        Add a finished search.
+
+        Args:
+            spans: Seconds per stage (``SearchTrace.spans``)
+            total: End-to-end seconds
+        """
+        with self.lock:
+            for stage, seconds in spans.items():
+                histogram = self.histograms.get(stage)
+                if histogram is not None:
+                    histogram.observe(seconds)
+            self.total.observe(total)
+
+    def stats(self) -> Dict[str, Any]:
+        """Summaries of the end-to-end and per-stage histograms."""
+        with self.lock:
+            return {
+                "search": self.total.summary(),
+                "stages": {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+            }
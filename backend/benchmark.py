@@ -0,0 +1,455 @@
+"""Benchmark index build and query latency on synthetic news corpora."""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DICTIONARY = Path(__file__).resolve().parent.parent / "frequency_dictionary_en_82_765.txt"
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CATEGORIES = (
+    "POLITICS", "WELLNESS", "ENTERTAINMENT", "TRAVEL", "STYLE & BEAUTY",
+    "PARENTING", "FOOD & DRINK", "BUSINESS", "SPORTS", "TECH",
+)
+CATEGORY_WEIGHTS = (0.22, 0.14, 0.12, 0.08, 0.08, 0.07, 0.07, 0.08, 0.07, 0.07)
+
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {
+    "tfidf_fit_seconds": False,
+    "word2vec_train_seconds": False,
+    "build_seconds": False,
+    "build_peak_rss_bytes": False,
+    "snapshot_bytes": False,
+    "index_rss_bytes": False,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "batch_queries_per_second": True,
+}
+
+
+def load_vocabulary(path: Path, size: int) -> Tuple[List[str], np.ndarray]:
+    """
+    Read the most frequent alphabetic words of a SymSpell frequency dictionary.
+
+    Args:
+        path: Dictionary with one ``word count`` pair per line
+        size: Number of words to keep
+
+    Returns:
+        Tuple of (words, counts), most frequent first
+    """
+    words, counts = [], []
+    # The dictionary starts with a UTF-8 byte order mark
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and parts[0].isalpha():
+                words.append(parts[0])
+                counts.append(int(parts[1]))
+                if len(words) >= size:
+                    break
+    return words, np.asarray(counts, dtype=np.float64)
+
+
+def _sample_words(rng: np.random.Generator, cumulative: np.ndarray, lengths: np.ndarray) -> List[np.ndarray]:
+    """Draw word ids by frequency and split them into runs of the given lengths."""
+    ids = np.searchsorted(cumulative, rng.random(int(lengths.sum())))
+    np.minimum(ids, len(cumulative) - 1, out=ids)
+    return np.split(ids, np.cumsum(lengths)[:-1])
+
+
+def generate_corpus(path: Path, num_documents: int, words: List[str], counts: np.ndarray, seed: int = 42) -> None:
+    """
+    Write a synthetic news corpus in the HuffPost JSONL layout.
+
+    Headlines and descriptions draw words by their corpus frequency, so
+    term statistics (and posting list lengths) follow real English.
+    Generation is deterministic for a given seed and vocabulary.
+    """
+    rng = np.random.default_rng(seed)
+    cumulative = np.cumsum(counts / counts.sum())
+    vocabulary = np.asarray(words, dtype=object)
+    category_weights = np.asarray(CATEGORY_WEIGHTS) / sum(CATEGORY_WEIGHTS)
+    staging = path.with_name(f".{path.name}.tmp")
+
+    with open(staging, "w", encoding="utf-8") as f:
+        for start in range(0, num_documents, 10_000):
+            size = min(10_000, num_documents - start)
+            headlines = _sample_words(rng, cumulative, rng.integers(5, 13, size))
+            descriptions = _sample_words(rng, cumulative, rng.integers(10, 41, size))
+            categories = rng.choice(len(CATEGORIES), size=size, p=category_weights)
+            days = rng.integers(0, 3650, size)
+            lines = []
+            for headline, description, category, day in zip(headlines, descriptions, categories, days):
+                date = np.datetime64("2012-01-28") + np.timedelta64(int(day), "D")
+                lines.append(json.dumps({
+                    "link": "",
+                    "headline": " ".join(vocabulary[headline]).capitalize(),
+                    "category": CATEGORIES[category],
+                    "short_description": " ".join(vocabulary[description]).capitalize() + ".",
+                    "authors": "",
+                    "date": str(date),
+                }))
+            f.write("\n".join(lines))
+            f.write("\n")
+    staging.replace(path)
+
+
+def generate_queries(words: List[str], counts: np.ndarray, num_queries: int, seed: int = 7) -> List[str]:
+    """
+    Build a fixed query set of 1-4 content words.
+
+    The ~50 most frequent (function) words are skipped and the rest are
+    drawn with a flattened frequency weighting, like real search terms.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = np.arange(50, min(len(words), 5000))
+    weights = np.sqrt(counts[candidates])
+    weights /= weights.sum()
+    queries = []
+    for length in rng.integers(1, 5, num_queries):
+        terms = rng.choice(candidates, size=length, replace=False, p=weights)
+        queries.append(" ".join(words[term] for term in terms))
+    return queries
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (0 if unknown)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of this process (0 if unknown)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_bytes(path: Path) -> int:
+    """Total size of the files below a directory."""
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def _percentile_ms(latencies: np.ndarray, q: float) -> float:
+    """q-th percentile of latencies in seconds, in milliseconds."""
+    return round(float(np.percentile(latencies, q)) * 1000, 4) if len(latencies) else 0.0
+
+
+def _configure(config: Dict[str, Any]) -> None:
+    """Configure settings, logging and BLAS threads of a benchmark process."""
+    # Settings are read on import, so set them first
+    os.environ["PERSIST_INDEX"] = "true"
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    os.environ["RESULT_SET_CACHE_SIZE"] = "0"
+    os.environ["USE_WORD2VEC"] = "true" if config["word2vec"] else "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app.core.config import settings
+    from app.core.log import configure_logging
+    from app.services.executor import limit_blas_threads
+
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    limit_blas_threads(settings.BLAS_THREADS)
+
+
+def run_build(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build and persist the index of one corpus (runs in a fresh process).
+
+    Returns:
+        Build timings, snapshot size and peak build memory
+    """
+    _configure(config)
+    from app.services.search_engine import SearchEngine
+
+    index_path = Path(config["index_path"])
+    shutil.rmtree(index_path, ignore_errors=True)
+
+    start_time = time.perf_counter()
+    engine = SearchEngine(config["corpus_path"], str(index_path), rebuild=True)
+    build_seconds = time.perf_counter() - start_time
+    timings = engine.build_timings
+
+    return {
+        "documents": len(engine.documents),
+        "vocabulary_terms": len(engine.tfidf_vectorizer.vocabulary_),
+        "embedding_terms": len(engine.word_vectors) if engine.word_vectors is not None else 0,
+        "build_seconds": round(build_seconds, 3),
+        "preprocess_seconds": round(timings.get("preprocess", 0.0), 3),
+        "tfidf_fit_seconds": round(timings.get("tfidf_fit", 0.0), 3),
+        "bm25_seconds": round(timings.get("bm25", 0.0), 3),
+        "word2vec_train_seconds": round(timings.get("word2vec_train", 0.0), 3),
+        "document_embeddings_seconds": round(timings.get("document_embeddings", 0.0), 3),
+        "embedding_encoding_seconds": round(timings.get("embedding_encoding", 0.0), 3),
+        "ann_index_seconds": round(timings.get("ann_index", 0.0), 3),
+        "embedding_bytes": engine.index_stats()["embedding_bytes"],
+        "document_bytes": engine.index_stats()["document_bytes"],
+        "embedding_agreement": engine.embedding_report,
+        "build_peak_rss_bytes": _peak_rss_bytes(),
+        "snapshot_bytes": _directory_bytes(index_path),
+    }
+
+
+def semantic_sweep(engine, queries: List[str], nprobes: List[int], k: int = 10) -> Dict[str, Any]:
+    """
+    Measure semantic search latency and recall@k against an exact scan per ``nprobe``.
+
+    Returns an empty dictionary when the index has no document embeddings.
+    """
+    if engine.view.doc_embeddings is None:
+        return {}
+    exact = [
+        {result["id"] for result in engine.search(query, k, mode="semantic", nprobe=0)["results"]}
+        for query in queries
+    ]
+    expected = sum(len(ids) for ids in exact)
+
+    sweep = {}
+    for nprobe in nprobes:
+        latencies = np.empty(len(queries))
+        found = 0
+        for position, query in enumerate(queries):
+            query_start = time.perf_counter()
+            result = engine.search(query, k, mode="semantic", nprobe=nprobe)
+            latencies[position] = time.perf_counter() - query_start
+            found += len(exact[position].intersection(item["id"] for item in result["results"]))
+        sweep[str(nprobe)] = {
+            f"recall_at_{k}": round(found / expected, 4) if expected else 0.0,
+            "latency_p50_ms": _percentile_ms(latencies, 50),
+            "latency_p99_ms": _percentile_ms(latencies, 99),
+        }
+    return sweep
+
+
+def run_queries(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Attach to a built snapshot and time the query set (runs in a fresh process).
+
+    Returns:
+        Serving memory, single-query latency percentiles and batch throughput
+    """
+    _configure(config)
+    from app.services.search_engine import SearchEngine
+
+    rss_before = _rss_bytes()
+    engine = SearchEngine(config["corpus_path"], config["index_path"])
+
+    queries = config["queries"]
+    for query in queries[:config["warmup"]]:
+        engine.search(query)
+
+    latencies = np.empty(len(queries))
+    stage_totals: Dict[str, float] = {}
+    candidates = 0
+    for position, query in enumerate(queries):
+        query_start = time.perf_counter()
+        result = engine.search(query)
+        latencies[position] = time.perf_counter() - query_start
+        candidates += result["candidates"]
+        for stage, seconds in result["stage_timings"].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    # Snapshot pages touched by the queries count too, as they would in a worker
+    index_rss_bytes = _rss_bytes() - rss_before
+
+    batch_size = config["batch_size"]
+    batch_start = time.perf_counter()
+    for start in range(0, len(queries), batch_size):
+        engine.search_batch([(query, None) for query in queries[start:start + batch_size]])
+    batch_seconds = time.perf_counter() - batch_start
+
+    return {
+        "index_rss_bytes": index_rss_bytes,
+        "queries": len(queries),
+        "mean_candidates": round(candidates / len(queries), 2) if queries else 0.0,
+        "latency_mean_ms": round(float(latencies.mean()) * 1000, 4) if len(latencies) else 0.0,
+        "latency_p50_ms": _percentile_ms(latencies, 50),
+        "latency_p95_ms": _percentile_ms(latencies, 95),
+        "latency_p99_ms": _percentile_ms(latencies, 99),
+        "stage_mean_ms": {
+            stage: round(1000 * seconds / len(queries), 4) for stage, seconds in stage_totals.items()
+        },
+        "batch_size": batch_size,
+        "batch_queries_per_second": round(len(queries) / batch_seconds, 1) if batch_seconds else 0.0,
+        "semantic": semantic_sweep(engine, queries, config["nprobe"]),
+    }
+
+
+def _in_fresh_process(func, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run ``func(config)`` in a newly spawned process so memory measurements stay independent."""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(func, config).result()
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print the change of every compared metric against a baseline run.
+
+    Returns:
+        Descriptions of the metrics that regressed by more than ``threshold``
+    """
+    regressions = []
+    print(f"\nComparison with baseline ({baseline.get('meta', {}).get('timestamp', 'unknown')}):")
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if previous is None or "error" in previous:
+            print(f"  {scale}: no baseline measurements")
+            continue
+        if "error" in current:
+            regressions.append(f"{scale} failed")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = (-change if higher_is_better else change) > threshold
+            marker = "  ⚠ regression" if regressed else ""
+            print(f"  {scale:>5} {metric:<26} {old:>14,.4g} -> {new:>14,.4g} ({change:+.1%}){marker}")
+            if regressed:
+                regressions.append(f"{scale} {metric} {change:+.1%}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", default="10k,100k,1m",
+                        help="Comma-separated corpus sizes: 10k, 100k, 1m or a document count")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries in the fixed query set")
+    parser.add_argument("--warmup", type=int, default=100, help="Queries run before timing")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batch for throughput")
+    parser.add_argument("--no-word2vec", action="store_true", help="Benchmark TF-IDF only")
+    parser.add_argument("--nprobe", default="0,8,32,128",
+                        help="Comma-separated ANN probe counts for the semantic recall/latency sweep (0 = exact)")
+    parser.add_argument("--data-dir", default="data/benchmark", help="Where corpora and indexes are kept")
+    parser.add_argument("--dictionary", default=str(DEFAULT_DICTIONARY), help="Word frequency dictionary")
+    parser.add_argument("--vocabulary", type=int, default=30000, help="Dictionary words used for the corpora")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus generation seed")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change counted as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    from app.core.config import settings
+
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    words, counts = load_vocabulary(Path(args.dictionary), args.vocabulary)
+    queries = generate_queries(words, counts, args.queries)
+    print(f"Vocabulary: {len(words):,} words, {len(queries):,} fixed queries")
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "vocabulary": len(words),
+            "query_set": hashlib.sha256("\n".join(queries).encode("utf-8")).hexdigest()[:16],
+            "word2vec": not args.no_word2vec,
+            "settings": {
+                key: getattr(settings, key) for key in (
+                    "TFIDF_MAX_FEATURES", "MIN_SIMILARITY_THRESHOLD", "LEXICAL_SCORER",
+                    "USE_DYNAMIC_PRUNING", "BLAS_THREADS", "HYBRID_FUSION", "LEXICAL_DEPTH", "SEMANTIC_DEPTH",
+                    "ANN_INDEX", "ANN_NLIST",
+                    "EMBEDDING_STORAGE", "PQ_SUBVECTORS", "EMBEDDING_RERANK",
+                )
+            },
+        },
+        "scales": {},
+    }
+
+    for scale in args.scales.split(","):
+        scale = scale.strip().lower()
+        num_documents = SCALES.get(scale) or int(scale)
+        corpus_path = data_dir / f"news_{scale}_seed{args.seed}.jsonl"
+        if not corpus_path.exists():
+            print(f"Generating {num_documents:,} documents -> {corpus_path}")
+            start_time = time.time()
+            generate_corpus(corpus_path, num_documents, words, counts, args.seed)
+            print(f"  done in {time.time() - start_time:.1f}s")
+
+        print(f"Benchmarking {scale} ({num_documents:,} documents)...")
+        config = {
+            "corpus_path": str(corpus_path),
+            "index_path": str(data_dir / f"index_{scale}"),
+            "queries": queries,
+            "warmup": args.warmup,
+            "batch_size": args.batch_size,
+            "word2vec": not args.no_word2vec,
+            "nprobe": [int(nprobe) for nprobe in args.nprobe.split(",")],
+        }
+        try:
+            measurements = _in_fresh_process(run_build, config)
+            measurements.update(_in_fresh_process(run_queries, config))
+        except Exception as e:
+            # e.g. the build process was killed for running out of memory
+            results["scales"][scale] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"  ❌ {scale} failed: {type(e).__name__}: {e}")
+            continue
+        results["scales"][scale] = measurements
+        print(
+            f"  build {measurements['build_seconds']}s "
+            f"(tfidf {measurements['tfidf_fit_seconds']}s, word2vec {measurements['word2vec_train_seconds']}s), "
+            f"peak {measurements['build_peak_rss_bytes'] / (1024 * 1024):.0f} MB, "
+            f"snapshot {measurements['snapshot_bytes'] / (1024 * 1024):.1f} MB, "
+            f"p50/p95/p99 {measurements['latency_p50_ms']}/{measurements['latency_p95_ms']}/"
+            f"{measurements['latency_p99_ms']} ms, batch {measurements['batch_queries_per_second']:,} q/s"
+        )
+        agreement = measurements["embedding_agreement"]
+        if agreement:
+            print(
+                f"  embeddings {agreement['storage']}: {agreement['compression']}x smaller, "
+                f"recall@10 {agreement['recall_at_10']} vs float32"
+            )
+        for nprobe, sweep in measurements["semantic"].items():
+            print(
+                f"  semantic nprobe={nprobe}: recall@10 {sweep['recall_at_10']}, "
+                f"p50/p99 {sweep['latency_p50_ms']}/{sweep['latency_p99_ms']} ms"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("query_set") != results["meta"]["query_set"]:
+            print("Warning: the baseline used a different query set")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regressions beyond {args.threshold:.0%}: " + "; ".join(regressions))
+            return 1
+        print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Script to build the search index snapshot ahead of serving."""
+
+import sys
+import time
+
+from app.core.config import settings
+from app.core.log import configure_logging
+from app.services.search_engine import SearchEngine
+
+
+def build_index(documents_path: str, index_path: str) -> None:
+    """
+    Build the TF-IDF/Word2Vec index and write it as a snapshot.
+
+    Args:
+        documents_path: Path to the documents file
+        index_path: Snapshot directory to write
+    """
+    print(f"Building index from: {documents_path}")
+    start_time = time.time()
+    engine = SearchEngine(documents_path=documents_path, index_path=index_path, rebuild=True)
+    elapsed = time.time() - start_time
+
+    print(f"\n{'='*60}")
+    print(f"✓ Indexed {len(engine.documents):,} documents in {elapsed:.1f}s")
+    print(f"✓ Snapshot: {index_path}")
+    print(f"✓ Fingerprint: {engine.fingerprint[:16]}")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    documents = settings.DOCUMENTS_PATH
+    index = settings.INDEX_PATH
+
+    if len(sys.argv) > 1:
+        documents = sys.argv[1]
+    if len(sys.argv) > 2:
+        index = sys.argv[2]
+
+    if not settings.PERSIST_INDEX:
+        print("Warning: PERSIST_INDEX is disabled; the server will not use this snapshot")
+
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    build_index(documents, index)
+
+    print("📋 Usage:")
+    print("  python build_index.py [documents] [index_dir]")
+    print()
@@ -1,8 +1,68 @@
 """Script to load large dataset_news.json into backend data folder."""
 
 import json
+import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Keys that may hold the article list when the source is a JSON object
+ARTICLE_KEYS = ('articles', 'documents', 'news', 'data')
+READ_CHUNK_SIZE = 1 << 20
+PROGRESS_INTERVAL = 2.0
+
+
+def normalize_document(doc: Dict[str, Any], idx: int) -> Optional[Dict[str, Any]]:
+    """
+    Map a news article to our document schema.
+    
+    Args:
+        doc: Raw article
+        idx: Position of the article in the source
+        
+    Returns:
+        Normalized document, or None if the article has no content
+    """
+    # Map news article fields to our schema
+    title = (
+        doc.get("headline") or 
+        doc.get("title") or 
+        doc.get("heading") or
+        f"Article {idx + 1}"
+    )
+    
+    content = (
+        doc.get("description") or 
+        doc.get("short_description") or
+        doc.get("content") or 
+        doc.get("text") or 
+        doc.get("body") or
+        doc.get("summary") or
+        ""
+    )
+    
+    # Skip documents with no content
+    if not content or not content.strip():
+        return None
+    
+    # Combine headline and description for better search
+    full_content = f"{title}. {content}".strip()
+    
+    return {
+        "id": str(doc.get("id", idx + 1)),
+        "title": title[:200],  # Limit title length
+        "content": full_content[:2000],  # Limit content for performance
+        "category": doc.get("category") or doc.get("topic") or doc.get("section") or "News",
+        "date": doc.get("date") or doc.get("published_at") or doc.get("publishedAt")
+    }
 
 
 def load_large_dataset(source_path: str, output_path: str, max_documents: int = None):
@@ -52,37 +112,10 @@ def load_large_dataset(source_path: str, output_path: str, max_documents: int =
         skipped = 0
         
         for idx, doc in enumerate(raw_documents):
-            # Map news article fields to our schema
-            title = (
-                doc.get("headline") or 
-                doc.get("title") or 
-                doc.get("heading") or
-                f"Article {idx + 1}"
-            )
-            
-            content = (
-                doc.get("description") or 
-                doc.get("content") or 
-                doc.get("text") or 
-                doc.get("body") or
-                doc.get("summary") or
-                ""
-            )
-            
-            # Skip documents with no content
-            if not content or not content.strip():
+            normalized_doc = normalize_document(doc, idx)
+            if normalized_doc is None:
                 skipped += 1
                 continue
-            
-            # Combine headline and description for better search
-            full_content = f"{title}. {content}".strip()
-            
-            normalized_doc = {
-                "id": str(doc.get("id", idx + 1)),
-                "title": title[:200],  # Limit title length
-                "content": full_content[:2000],  # Limit content for performance
-                "category": doc.get("category") or doc.get("topic") or doc.get("section") or "News"
-            }
             normalized_docs.append(normalized_doc)
             
             # Progress indicator
@@ -116,17 +149,305 @@ def load_large_dataset(source_path: str, output_path: str, max_documents: int =
     except json.JSONDecodeError as e:
         print(f"❌ Error: Invalid JSON format - {e}")
     except MemoryError:
-        print(f"❌ Error: File too large for memory. Try using max_documents parameter.")
-        print(f"   Example: python load_dataset.py {source_path} {output_path} 50000")
+        print(f"❌ Error: File too large for memory. Write JSONL output to stream it instead.")
+        print(f"   Example: python load_dataset.py {source_path} data/documents.jsonl")
     except Exception as e:
         print(f"❌ Error: {e}")
 
 
+class _SourceReader:
+    """Incremental reader over a JSONL file or a (possibly wrapped) JSON array."""
+    
+    def __init__(self, f):
+        self.f = f
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    @property
+    def bytes_read(self) -> int:
+        """Bytes consumed from the underlying file so far."""
+        return self.f.buffer.tell()
+    
+    def _fill(self) -> bool:
+        """Read another chunk into the buffer; return False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what was already parsed so the buffer stays one chunk or so
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at end)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+    
+    def _decode(self) -> Any:
+        """Decode the next JSON value, reading more input while it is incomplete."""
+        # raw_decode does not skip leading whitespace
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number could continue in the next chunk
+                if end < len(self.buffer) or self.eof or not isinstance(value, (int, float)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+    
+    def _iter_array(self) -> Iterator[Dict[str, Any]]:
+        """Yield the elements of the array whose '[' is the next character."""
+        self.pos += 1
+        while True:
+            char = self._peek()
+            if char == "]":
+                self.pos += 1
+                return
+            if char == ",":
+                self.pos += 1
+                continue
+            if char == "":
+                raise json.JSONDecodeError("Unterminated array", self.buffer, self.pos)
+            yield self._decode()
+    
+    def _iter_object(self) -> Iterator[Union[str, Dict[str, Any]]]:
+        """
+        Yield the records of input starting with the object whose '{' is the next character.
+        
+        The object is read key by key, so only a bounded prefix is buffered.
+        An array under one of ``ARTICLE_KEYS`` makes it a wrapper like
+        ``{"articles": [...]}``, whose elements are streamed from there;
+        otherwise the object was the first record of a JSONL file.
+        """
+        self.pos += 1
+        record = {}
+        while True:
+            char = self._peek()
+            if char == "}":
+                self.pos += 1
+                break
+            if char == "":
+                raise json.JSONDecodeError("Unterminated object", self.buffer, self.pos)
+            if char == ",":
+                self.pos += 1
+                continue
+            key = self._decode()
+            if self._peek() != ":":
+                raise json.JSONDecodeError("Expected ':'", self.buffer, self.pos)
+            self.pos += 1
+            if key in ARTICLE_KEYS and self._peek() == "[":
+                yield from self._iter_array()
+                return
+            record[key] = self._decode()
+        yield record
+        yield from self._iter_lines()
+    
+    def _iter_lines(self) -> Iterator[str]:
+        """Yield the remaining non-empty lines as raw strings."""
+        scanned = self.pos
+        while True:
+            line_end = self.buffer.find("\n", scanned)
+            if line_end == -1:
+                searched = len(self.buffer) - self.pos
+                if self._fill():
+                    # The buffer now starts at the line; skip the part already searched
+                    scanned = self.pos + searched
+                    continue
+                line_end = len(self.buffer)
+            line = self.buffer[self.pos:line_end]
+            self.pos = min(line_end + 1, len(self.buffer))
+            if line.strip():
+                yield line
+            if self.pos >= len(self.buffer) and not self._fill():
+                return
+            scanned = self.pos
+    
+    def records(self) -> Iterator[Union[str, Dict[str, Any]]]:
+        """
+        Yield the source records.
+        
+        JSONL lines are yielded as raw strings so workers can parse them in
+        parallel; array elements (and the first JSONL record, read while
+        telling JSONL from a wrapper) are yielded as parsed objects.
+        """
+        first = self._peek()
+        if first == "[":
+            yield from self._iter_array()
+            return
+        if first != "{":
+            raise json.JSONDecodeError("Expected a JSON array or object", self.buffer, self.pos)
+        yield from self._iter_object()
+
+
+def _normalize_chunk(chunk: List[Tuple[int, Union[str, Dict[str, Any]]]]) -> Tuple[List[str], int, int]:
+    """
+    Normalize a chunk of records into compact JSONL lines (runs in a worker).
+    
+    Returns:
+        Tuple of (lines, skipped count, invalid count)
+    """
+    lines = []
+    skipped = invalid = 0
+    for idx, record in chunk:
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except json.JSONDecodeError:
+                invalid += 1
+                continue
+        if not isinstance(record, dict):
+            invalid += 1
+            continue
+        doc = normalize_document(record, idx)
+        if doc is None:
+            skipped += 1
+            continue
+        lines.append(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+    return lines, skipped, invalid
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stream_dataset(
+    source_path: str,
+    output_path: str,
+    max_documents: int = None,
+    workers: int = None,
+    chunk_size: int = 2000
+):
+    """
+    Convert a news dataset to compact JSONL with bounded memory.
+    
+    The source (JSONL, a JSON array, or an object wrapping an article array)
+    is read incrementally, records are normalized in chunks by worker
+    processes, and the output is written in source order as chunks finish.
+    At most ``2 * workers`` chunks are in flight, so memory does not grow
+    with the input size.
+    
+    Args:
+        source_path: Path to the source dataset
+        output_path: Path to the output .jsonl file
+        max_documents: Maximum source records to read (None = all)
+        workers: Worker processes (default: CPU count; 1 runs inline)
+        chunk_size: Records per work unit
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"Streaming dataset from: {source_path} ({workers} workers)")
+    
+    output = Path(output_path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    staging = output.with_name(f".{output.name}.tmp")
+    source_size = Path(source_path).stat().st_size if Path(source_path).exists() else 0
+    
+    start_time = time.time()
+    last_report = start_time
+    read = written = skipped = invalid = 0
+    
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = deque()
+    
+    def drain(limit: int) -> None:
+        """Write finished chunks, in order, until at most ``limit`` are in flight."""
+        nonlocal written, skipped, invalid, last_report
+        while len(pending) > limit:
+            lines, chunk_skipped, chunk_invalid = pending.popleft().result()
+            if lines:
+                out.write("\n".join(lines))
+                out.write("\n")
+            written += len(lines)
+            skipped += chunk_skipped
+            invalid += chunk_invalid
+            
+            now = time.time()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                elapsed = now - start_time
+                progress = f" ({reader.bytes_read / source_size:.0%})" if source_size else ""
+                print(f"  Processed {read:,} records{progress} - "
+                      f"{read / elapsed:,.0f} docs/sec, {reader.bytes_read / elapsed / (1024 * 1024):.1f} MB/s")
+    
+    try:
+        with open(source_path, 'r', encoding='utf-8-sig') as f, open(staging, 'w', encoding='utf-8') as out:
+            reader = _SourceReader(f)
+            chunk = []
+            for record in reader.records():
+                if max_documents and read >= max_documents:
+                    break
+                chunk.append((read, record))
+                read += 1
+                if len(chunk) >= chunk_size:
+                    pending.append(pool.submit(_normalize_chunk, chunk) if pool else _InlineResult(chunk))
+                    chunk = []
+                    drain(2 * workers)
+            if chunk:
+                pending.append(pool.submit(_normalize_chunk, chunk) if pool else _InlineResult(chunk))
+            drain(0)
+        staging.replace(output)
+        
+    except FileNotFoundError:
+        print(f"❌ Error: File not found at {source_path}")
+        return
+    except json.JSONDecodeError as e:
+        print(f"❌ Error: Invalid JSON format - {e}")
+        staging.unlink(missing_ok=True)
+        return
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    
+    elapsed = time.time() - start_time
+    print(f"\n{'='*60}")
+    print(f"✓ SUCCESS! Processed {read:,} records in {elapsed:.1f}s ({read / max(elapsed, 1e-9):,.0f} docs/sec)")
+    print(f"✓ Wrote {written:,} documents to: {output_path}")
+    if skipped:
+        print(f"  Skipped {skipped:,} documents with no content")
+    if invalid:
+        print(f"  Skipped {invalid:,} invalid records")
+    file_size = output.stat().st_size / (1024 * 1024)
+    print(f"✓ File size: {file_size:.2f} MB")
+    peak = _peak_memory_mb()
+    if peak is not None:
+        print(f"✓ Peak memory: {peak:.0f} MB")
+    print(f"{'='*60}\n")
+
+
+class _InlineResult:
+    """Future-like wrapper that normalizes a chunk in-process (single worker)."""
+    
+    def __init__(self, chunk):
+        self.chunk = chunk
+    
+    def result(self):
+        return _normalize_chunk(self.chunk)
+
+
 if __name__ == "__main__":
     # Default paths
     source = "../dataset_news.json"
     output = "data/documents.json"
     max_docs = None  # Process all by default
+    workers = None  # Streaming mode: one worker per CPU by default
     
     # Command line arguments
     if len(sys.argv) > 1:
@@ -134,22 +455,30 @@ if __name__ == "__main__":
     if len(sys.argv) > 2:
         output = sys.argv[2]
     if len(sys.argv) > 3:
-        max_docs = int(sys.argv[3])
+        max_docs = int(sys.argv[3]) or None
+    if len(sys.argv) > 4:
+        workers = int(sys.argv[4])
     
     print("\n" + "=" * 60)
     print("📰 News Dataset Loader for NLP Search Engine")
     print("=" * 60 + "\n")
     
-    load_large_dataset(source, output, max_docs)
+    # JSONL output is written incrementally with bounded memory
+    if output.endswith(".jsonl"):
+        stream_dataset(source, output, max_docs, workers)
+    else:
+        load_large_dataset(source, output, max_docs)
     
     print("\n📋 Usage:")
-    print("  python load_dataset.py [source] [output] [max_docs]")
+    print("  python load_dataset.py [source] [output] [max_docs] [workers]")
     print("\n📝 Examples:")
     print("  # Load all articles:")
     print("  python load_dataset.py ../dataset_news.json data/documents.json")
     print("\n  # Load first 50,000 articles:")
     print("  python load_dataset.py ../dataset_news.json data/documents.json 50000")
-    print("\n  # Recommended for 200k+ articles:")
-    print("  python load_dataset.py ../dataset_news.json data/documents.json 100000")
+    print("\n  # Recommended for 200k+ articles (streams to compact JSONL):")
+    print("  python load_dataset.py ../dataset_news.json data/documents.jsonl")
+    print("\n  # Stream all articles with 4 worker processes:")
+    print("  python load_dataset.py ../dataset_news.json data/documents.jsonl 0 4")
     print()
 
@@ -0,0 +1,398 @@
+"""HTTP load test: start the API and replay queries against POST /api/search."""
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.tracing import LatencyHistogram, STAGES
+from benchmark import DEFAULT_DICTIONARY, generate_queries, load_vocabulary
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def read_query_log(path: Path) -> List[str]:
+    """
+    Read queries to replay, in order.
+
+    Accepts plain text (one query per line) or JSONL with a ``query`` field.
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    line = json.loads(line).get("query", "")
+                except json.JSONDecodeError:
+                    pass
+            if line:
+                queries.append(line)
+    return queries
+
+
+def zipfian_queries(distinct: List[str], exponent: float, seed: int) -> Iterator[str]:
+    """Endless stream drawing from ``distinct`` with Zipf-distributed popularity."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(distinct) + 1) ** exponent
+    cumulative = np.cumsum(weights / weights.sum())
+    while True:
+        for rank in np.searchsorted(cumulative, rng.random(4096)):
+            yield distinct[min(int(rank), len(distinct) - 1)]
+
+
+def replayed_queries(queries: List[str]) -> Iterator[str]:
+    """Endless stream repeating a query log in order."""
+    while True:
+        yield from queries
+
+
+def _free_port() -> int:
+    """Ask the OS for an unused TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(host: str, port: int, path: str, timeout: float = 10.0) -> Tuple[int, str]:
+    """Issue a GET request and return (status, body)."""
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read().decode("utf-8")
+    finally:
+        connection.close()
+
+
+def start_server(port: int, workers: int, log_path: Path, timeout: float) -> subprocess.Popen:
+    """
+    Start ``app.main:app`` under uvicorn and wait until it answers /api/health.
+
+    The server inherits the environment, so settings such as SEARCH_EXECUTOR
+    or DOCUMENTS_PATH apply as usual.
+    """
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+    ]
+    log_file = open(log_path, "w")
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log_file, stderr=subprocess.STDOUT)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}; see {log_path}")
+        try:
+            if _get("127.0.0.1", port, "/api/health", timeout=1.0)[0] == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError(f"Server did not become healthy within {timeout:.0f}s; see {log_path}")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    """Terminate the server and wait for it to exit."""
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    """Parse Prometheus text samples into ``{(name, sorted labels): value}``."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_part, _, value = line.rpartition(" ")
+        labels: Tuple[Tuple[str, str], ...] = ()
+        if "{" in name_part:
+            name, _, label_text = name_part.partition("{")
+            pairs = []
+            for item in label_text.rstrip("}").split('",'):
+                key, _, label_value = item.partition("=")
+                pairs.append((key, label_value.strip('"')))
+            labels = tuple(sorted(pairs))
+        else:
+            name = name_part
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def stage_report(before: Dict, after: Dict) -> Dict[str, Any]:
+    """
+    Server-side search metrics accumulated between two metric scrapes.
+
+    Returns:
+        Mean and estimated p50/p95/p99 per stage plus cache hit ratio
+    """
+    def delta(name: str, labels: Tuple = ()) -> float:
+        return after.get((name, labels), 0.0) - before.get((name, labels), 0.0)
+
+    def histogram(name: str, extra_labels: Tuple = ()) -> Optional[LatencyHistogram]:
+        # Bucket samples keyed by their own "le" label text
+        buckets = sorted(
+            (float(dict(labels)["le"]), labels) for (sample, labels) in after
+            if sample == f"{name}_bucket" and dict(labels)["le"] != "+Inf"
+            and all(label in labels for label in extra_labels)
+        )
+        if not buckets:
+            return None
+        result = LatencyHistogram(tuple(bound for bound, _ in buckets))
+        previous = 0
+        for position, (_, labels) in enumerate(buckets):
+            cumulative = int(delta(f"{name}_bucket", labels))
+            result.counts[position] = cumulative - previous
+            previous = cumulative
+        result.count = int(delta(f"{name}_count", extra_labels))
+        result.counts[-1] = max(result.count - previous, 0)
+        result.sum = delta(f"{name}_sum", extra_labels)
+        return result
+
+    report: Dict[str, Any] = {"stages": {}}
+    total = histogram("search_query_duration_seconds")
+    if total is not None:
+        report["search"] = total.summary()
+    for stage in STAGES:
+        stage_histogram = histogram("search_stage_duration_seconds", (("stage", stage),))
+        if stage_histogram is not None and stage_histogram.count:
+            report["stages"][stage] = stage_histogram.summary()
+    queries = delta("search_queries_total")
+    if queries:
+        report["cache_hit_ratio"] = round(delta("search_cache_hits_total") / queries, 4)
+    rss = after.get(("process_resident_memory_bytes", ()))
+    if rss:
+        report["server_rss_bytes"] = int(rss)
+    return report
+
+
+class LoadGenerator:
+    """
+    Sends search requests from a fixed number of client threads.
+
+    Without a target rate every thread sends back-to-back (closed loop).
+    With one, request i is scheduled at ``start + i / rate`` and latency is
+    measured from that scheduled time, so a stalled server shows up as
+    latency instead of silently lowering the offered load.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        queries: Iterator[str],
+        concurrency: int,
+        duration: float,
+        warmup: float,
+        rate: Optional[float] = None,
+        max_results: int = 10,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.queries = queries
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.rate = rate
+        self.max_results = max_results
+        self.timeout = timeout
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.late_starts = 0
+        self._sent = 0
+        self._lock = threading.Lock()
+
+    def _next_job(self) -> Optional[Tuple[float, str]]:
+        """Return the next (scheduled time, query), or None once the run is over."""
+        with self._lock:
+            if self.rate:
+                scheduled = self.start_time + self._sent / self.rate
+            else:
+                scheduled = time.perf_counter()
+            if scheduled >= self.end_time:
+                return None
+            self._sent += 1
+            return scheduled, next(self.queries)
+
+    def _record(self, scheduled: float, finished: float, status: Any, late: bool) -> None:
+        """Record one request unless it belongs to the warmup."""
+        if scheduled < self.measure_from:
+            return
+        with self._lock:
+            self.latencies.append(finished - scheduled)
+            self.statuses[status] += 1
+            if late:
+                self.late_starts += 1
+
+    def _client(self) -> None:
+        """Client thread: one keep-alive connection, requests until the run ends."""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {"Content-Type": "application/json"}
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            scheduled, query = job
+            delay = scheduled - time.perf_counter()
+            # Already overdue when a client became free
+            late = bool(self.rate) and delay < -0.001
+            if delay > 0:
+                time.sleep(delay)
+            body = json.dumps({"query": query, "max_results": self.max_results})
+            try:
+                connection.request("POST", "/api/search", body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status: Any = response.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._record(scheduled, time.perf_counter(), status, late)
+        connection.close()
+
+    def run(self) -> Dict[str, Any]:
+        """Run the load and return client-side results."""
+        self.start_time = time.perf_counter()
+        self.measure_from = self.start_time + self.warmup
+        self.end_time = self.measure_from + self.duration
+        threads = [threading.Thread(target=self._client, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - self.measure_from
+
+        latencies = np.asarray(self.latencies)
+        total = len(latencies)
+        errors = sum(count for status, count in self.statuses.items() if status != 200)
+
+        def percentile(q: float) -> float:
+            return round(float(np.percentile(latencies, q)) * 1000, 3) if total else 0.0
+
+        return {
+            "requests": total,
+            "seconds": round(elapsed, 3),
+            "achieved_qps": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+            "target_qps": self.rate,
+            "concurrency": self.concurrency,
+            "latency_ms": {
+                "mean": round(float(latencies.mean()) * 1000, 3) if total else 0.0,
+                "p50": percentile(50),
+                "p90": percentile(90),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": round(float(latencies.max()) * 1000, 3) if total else 0.0,
+            },
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            # Requests that could not start on time because every client was busy
+            "late_starts": self.late_starts,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Target a running server (e.g. http://127.0.0.1:8000) instead of starting one")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes to start")
+    parser.add_argument("--startup-timeout", type=float, default=600, help="Seconds to wait for the server")
+    parser.add_argument("--query-log", help="Replay these queries (text or JSONL) instead of a Zipfian mix")
+    parser.add_argument("--distinct", type=int, default=10000, help="Distinct queries in the Zipfian mix")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of query popularity")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads / connections")
+    parser.add_argument("--rate", type=float, help="Target requests per second (default: as fast as possible)")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before the run")
+    parser.add_argument("--max-results", type=int, default=10, help="max_results of every request")
+    parser.add_argument("--seed", type=int, default=7, help="Query mix seed")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.query_log:
+        log = read_query_log(Path(args.query_log))
+        if not log:
+            print(f"❌ No queries in {args.query_log}")
+            return 1
+        queries = replayed_queries(log)
+        source = f"query log {args.query_log} ({len(log):,} queries)"
+    else:
+        words, counts = load_vocabulary(DEFAULT_DICTIONARY, 30000)
+        distinct = generate_queries(words, counts, args.distinct, seed=args.seed)
+        random.Random(args.seed).shuffle(distinct)
+        queries = zipfian_queries(distinct, args.zipf, args.seed)
+        source = f"Zipfian mix of {len(distinct):,} queries (s={args.zipf})"
+
+    server = None
+    if args.url:
+        target = args.url.split("://", 1)[-1].rstrip("/")
+        host, _, port = target.partition(":")
+        port = int(port or 80)
+    else:
+        host, port = "127.0.0.1", _free_port()
+        log_path = BACKEND_DIR / "loadtest_server.log"
+        print(f"Starting app.main on port {port} ({args.server_workers} workers, log: {log_path})...")
+        server = start_server(port, args.server_workers, log_path, args.startup_timeout)
+
+    try:
+        load = "as fast as possible" if not args.rate else f"{args.rate:g} req/s"
+        print(f"Load: {source}, {args.concurrency} connections, {load}, {args.warmup:g}s warmup + {args.duration:g}s")
+        metrics_before = parse_metrics(_get(host, port, "/api/metrics")[1])
+        report = LoadGenerator(
+            host, port, queries, args.concurrency, args.duration, args.warmup,
+            rate=args.rate, max_results=args.max_results,
+        ).run()
+        metrics_after = parse_metrics(_get(host, port, "/api/metrics")[1])
+        # Includes the warmup requests
+        report["server"] = stage_report(metrics_before, metrics_after)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    latency = report["latency_ms"]
+    print(f"\n{'='*60}")
+    print(f"Requests: {report['requests']:,} in {report['seconds']}s - {report['achieved_qps']:,} QPS"
+          + (f" (target {args.rate:g})" if args.rate else ""))
+    print(f"Latency ms: mean {latency['mean']}  p50 {latency['p50']}  p90 {latency['p90']}  "
+          f"p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"Errors: {report['errors']:,} ({report['error_rate']:.2%})  statuses: {report['statuses']}")
+    if report["late_starts"]:
+        print(f"⚠ {report['late_starts']:,} requests started late; raise --concurrency to hold the target rate")
+    server_report = report["server"]
+    if server_report.get("stages"):
+        print("Server stages (mean / p95 ms):")
+        for stage, summary in server_report["stages"].items():
+            print(f"  {stage:<20} {summary['mean_ms']:>9.3f} / {summary['p95_ms']:.3f}")
+    if "cache_hit_ratio" in server_report:
+        print(f"Result cache hit ratio: {server_report['cache_hit_ratio']:.1%}")
+    if "server_rss_bytes" in server_report:
+        print(f"Server RSS: {server_report['server_rss_bytes'] / (1024 * 1024):.0f} MB")
+    print(f"{'='*60}\n")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
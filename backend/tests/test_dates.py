@@ -0,0 +1,31 @@
+"""Date filters agree on which documents they can match."""
+
+import numpy as np
+
+from app.services.dates import MISSING_DAY, DateIndex, DateRange, day_number
+
+
+def test_within_days_counts_back_from_latest_day():
+    latest = day_number("2018-05-26")
+    date_range = DateRange.resolve(within_days=7, latest_day=latest)
+    assert date_range == DateRange(latest - 6, None)
+
+    days = np.array([latest, latest - 6, latest - 7, MISSING_DAY], dtype=np.int32)
+    np.testing.assert_array_equal(DateIndex(days).allowed(date_range), [True, True, False, False])
+
+
+def test_within_days_without_dated_documents_matches_nothing():
+    undated = DateIndex(np.full(5, MISSING_DAY, dtype=np.int32))
+    assert undated.latest_day is None
+
+    for date_range in (
+        DateRange.resolve(within_days=7, latest_day=undated.latest_day),
+        DateRange.resolve(date_from="2000-01-01", latest_day=undated.latest_day),
+    ):
+        assert date_range is not None
+        assert not undated.allowed(date_range).any()
+
+
+def test_no_bounds_filter_nothing():
+    assert DateRange.resolve(latest_day=day_number("2018-05-26")) is None
+    assert DateRange.resolve() is None
@@ -0,0 +1,139 @@
+"""Dynamic pruning and segmented scoring return what exhaustive scoring would."""
+
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from app.services.document_store import DocumentStore
+from app.services.scoring import BM25Scorer, TfidfScorer, top_k
+from app.services.segments import Segment, SegmentedIndex
+
+NUM_TERMS = 60
+
+
+def random_postings(rng: np.random.Generator, num_documents: int, density: float = 0.08) -> sparse.csc_matrix:
+    """Random non-negative document-term matrix with L2-normalized rows."""
+    matrix = sparse.random(
+        num_documents, NUM_TERMS, density=density, format="csr", dtype=np.float64,
+        random_state=rng, data_rvs=lambda size: rng.uniform(0.1, 3.0, size)
+    )
+    return sparse.csc_matrix(normalize(matrix), dtype=np.float32)
+
+
+def random_queries(rng: np.random.Generator, count: int) -> sparse.csr_matrix:
+    """Queries of one to five terms with positive weights."""
+    rows = []
+    for _ in range(count):
+        terms = rng.choice(NUM_TERMS, size=rng.integers(1, 6), replace=False)
+        row = np.zeros(NUM_TERMS)
+        row[terms] = rng.uniform(0.2, 1.0, len(terms))
+        rows.append(row)
+    return normalize(sparse.csr_matrix(np.vstack(rows)))
+
+
+def make_segment(name: str, postings: sparse.csc_matrix, deleted: np.ndarray) -> Segment:
+    """Segment over random postings, used for both its TF-IDF and its BM25 posting lists."""
+    documents = DocumentStore.from_documents({"id": f"{name}-{i}"} for i in range(postings.shape[0]))
+    return Segment(
+        name, documents, postings, np.ones(NUM_TERMS),
+        bm25_postings=postings, bm25_doc_lengths=np.ones((postings.shape[0], 2), dtype=np.float32),
+        deleted=deleted
+    )
+
+
+def make_scorer(kind: str, postings: sparse.csc_matrix, idf: np.ndarray = None):
+    """Single scorer over a posting matrix (BM25 with the given or made-up idf)."""
+    if kind == "bm25":
+        return BM25Scorer(postings, idf if idf is not None else np.linspace(0.5, 3.0, NUM_TERMS))
+    return TfidfScorer(postings)
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(7)
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "bm25"])
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_max_score_equals_exhaustive(rng, kind, k):
+    scorer = make_scorer(kind, random_postings(rng, 400))
+    mask = rng.random(400) < 0.6
+    for query in random_queries(rng, 100):
+        for allowed in (None, mask):
+            pruned = scorer.top_k(query, k, prune=True, mask=allowed)
+            exhaustive = scorer.top_k(query, k, mask=allowed)
+            np.testing.assert_array_equal(pruned[0], exhaustive[0])
+            np.testing.assert_array_equal(pruned[1], exhaustive[1])
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "bm25"])
+@pytest.mark.parametrize("prune", [False, True])
+def test_batch_equals_single_queries(rng, kind, prune):
+    scorer = make_scorer(kind, random_postings(rng, 300))
+    queries = random_queries(rng, 30)
+    batch = scorer.top_k_batch(queries, 10, prune=prune)
+    for row, (doc_ids, scores) in enumerate(batch):
+        single = scorer.top_k(queries[row], 10, prune=prune)
+        np.testing.assert_array_equal(doc_ids, single[0])
+        # The unpruned TF-IDF batch is one float32 sparse product
+        np.testing.assert_allclose(scores, single[1], rtol=1e-6)
+
+
+def segmented_view(rng: np.random.Generator, kind: str):
+    """A view of three segments with deleted documents, and the postings of its live documents."""
+    segments, live_rows, live_ids = [], [], []
+    offset = 0
+    for name, size in (("base", 300), ("delta-000001", 40), ("delta-000002", 25)):
+        postings = random_postings(rng, size)
+        deleted = rng.random(size) < 0.15
+        segments.append(make_segment(name, postings, deleted))
+        live_rows.append(sparse.csr_matrix(postings)[~deleted])
+        live_ids.append(offset + np.flatnonzero(~deleted))
+        offset += size
+    view = SegmentedIndex(segments, version="test", scorer_kind=kind)
+    return view, sparse.csc_matrix(sparse.vstack(live_rows)), np.concatenate(live_ids)
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "bm25"])
+@pytest.mark.parametrize("prune", [False, True])
+def test_segments_equal_scoring_live_documents_alone(rng, kind, prune):
+    view, live_postings, live_ids = segmented_view(rng, kind)
+    reference = make_scorer(kind, live_postings, view.bm25_idf)
+    for query in random_queries(rng, 60):
+        doc_ids, scores = view.scorer.top_k(query, 10, prune=prune)
+        local_ids, expected_scores = reference.top_k(query, 10)
+        np.testing.assert_array_equal(doc_ids, live_ids[local_ids])
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-12)
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "bm25"])
+def test_segmented_score_is_ascending_and_masked(rng, kind):
+    view, _, live_ids = segmented_view(rng, kind)
+    masks = [~segment.deleted & (rng.random(segment.num_documents) < 0.5) for segment in view.segments]
+    allowed = np.concatenate(masks)
+    for query in random_queries(rng, 30):
+        doc_ids, scores = view.scorer.score(query, mask=masks)
+        assert np.all(np.diff(doc_ids) > 0)
+        assert allowed[doc_ids].all()
+        np.testing.assert_array_equal(
+            top_k(doc_ids, scores, 10)[0], view.scorer.top_k(query, 10, mask=masks)[0]
+        )
+        assert np.isin(view.scorer.score(query)[0], live_ids).all()
+
+
+def test_new_view_leaves_older_views_scoring_unchanged(rng):
+    view, _, _ = segmented_view(rng, "bm25")
+    queries = random_queries(rng, 20)
+    before = [view.scorer.top_k(query, 10, prune=True) for query in queries]
+
+    # Deleting most of the base changes the idf of every later view
+    base = view.segments[0]
+    deleted = base.deleted | (rng.random(base.num_documents) < 0.7)
+    newer = SegmentedIndex([base.with_deleted(deleted)] + view.segments[1:], version="newer", scorer_kind="bm25")
+    assert not np.allclose(newer.bm25_idf, view.bm25_idf)
+
+    for query, (doc_ids, scores) in zip(queries, before):
+        again = view.scorer.top_k(query, 10, prune=True)
+        np.testing.assert_array_equal(again[0], doc_ids)
+        np.testing.assert_array_equal(again[1], scores)
@@ -1,7 +1,54 @@
+import { useEffect, useState } from "react";
+import { suggestQueries } from "../services/api";
+
+// Wait this long after the last keystroke before asking for suggestions
+const SUGGEST_DELAY_MS = 120;
+
 export default function SearchBar({ query, setQuery, onSearch, loading }) {
-  const handleKeyPress = (e) => {
-    if (e.key === 'Enter' && !loading) {
-      onSearch();
+  const [suggestions, setSuggestions] = useState([]);
+  const [highlighted, setHighlighted] = useState(-1);
+  const [open, setOpen] = useState(false);
+
+  useEffect(() => {
+    if (!query.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      suggestQueries(query, 8, controller.signal)
+        .then((items) => {
+          setSuggestions(items);
+          setHighlighted(-1);
+        })
+        .catch(() => {});
+    }, SUGGEST_DELAY_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query]);
+
+  const submit = (text) => {
+    setOpen(false);
+    if (text !== query) {
+      setQuery(text);
+    }
+    onSearch(text);
+  };
+
+  const handleKeyDown = (e) => {
+    if (e.key === 'ArrowDown' && suggestions.length) {
+      e.preventDefault();
+      setOpen(true);
+      setHighlighted((highlighted + 1) % suggestions.length);
+    } else if (e.key === 'ArrowUp' && suggestions.length) {
+      e.preventDefault();
+      setHighlighted(highlighted <= 0 ? suggestions.length - 1 : highlighted - 1);
+    } else if (e.key === 'Escape') {
+      setOpen(false);
+    } else if (e.key === 'Enter' && !loading) {
+      submit(open && highlighted >= 0 ? suggestions[highlighted].text : query);
     }
   };
 
@@ -11,8 +58,12 @@ export default function SearchBar({ query, setQuery, onSearch, loading }) {
         <input
           type="text"
           value={query}
-          onChange={(e) => setQuery(e.target.value)}
-          onKeyPress={handleKeyPress}
+          onChange={(e) => {
+            setQuery(e.target.value);
+            setOpen(true);
+          }}
+          onKeyDown={handleKeyDown}
+          onBlur={() => setOpen(false)}
           placeholder="Search documents..."
           className="w-full px-6 py-4 rounded-full border border-gray-300 
                      text-gray-700 text-lg
@@ -21,7 +72,7 @@ export default function SearchBar({ query, setQuery, onSearch, loading }) {
                      transition-all duration-200"
         />
         <button
-          onClick={onSearch}
+          onClick={() => submit(query)}
           disabled={loading}
           className="absolute right-2 top-1/2 -translate-y-1/2
                      px-6 py-2 rounded-full 
@@ -33,6 +84,27 @@ export default function SearchBar({ query, setQuery, onSearch, loading }) {
         >
           {loading ? "Searching..." : "Search"}
         </button>
+        {open && suggestions.length > 0 && (
+          <ul className="absolute z-10 left-0 right-0 mt-2 py-2 bg-white
+                         border border-gray-200 rounded-2xl shadow-lg">
+            {suggestions.map((suggestion, index) => (
+              <li
+                key={`${suggestion.kind}-${suggestion.text}`}
+                // Select before the input's blur closes the list
+                onMouseDown={(e) => {
+                  e.preventDefault();
+                  submit(suggestion.text);
+                }}
+                onMouseEnter={() => setHighlighted(index)}
+                className={`px-6 py-2 cursor-pointer flex justify-between text-gray-700
+                            ${index === highlighted ? 'bg-gray-100' : ''}`}
+              >
+                <span className="truncate">{suggestion.text}</span>
+                <span className="ml-4 text-xs text-gray-400">{suggestion.kind}</span>
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
     </div>
   );
@@ -89,8 +89,8 @@ export default function SearchPage() {
   const [error, setError] = useState("");
   const [searchPerformed, setSearchPerformed] = useState(false);
 
-  const handleSearch = async () => {
-    if (!query.trim()) return;
+  const handleSearch = async (text = query) => {
+    if (!text.trim()) return;
 
     setLoading(true);
     setError("");
@@ -98,7 +98,7 @@ export default function SearchPage() {
     setSearchPerformed(true);
 
     try {
-      const data = await searchDocuments(query);
+      const data = await searchDocuments(text);
       setResults(data.results || []);
     } catch {
       setError("Failed to fetch results. Please try again.");
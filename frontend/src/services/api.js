@@ -24,6 +24,18 @@ export async function searchDocuments(query, maxResults = 10) {
   }
 }
 
+export async function suggestQueries(prefix, limit = 8, signal) {
+  const params = new URLSearchParams({ prefix, limit: String(limit) });
+  const response = await fetch(`${API_BASE_URL}/suggest?${params}`, { signal });
+
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const data = await response.json();
+  return data.suggestions || [];
+}
+
 export async function checkHealth() {
   try {
     const response = await fetch(`${API_BASE_URL}/health`);